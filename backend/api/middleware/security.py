@@ -8,6 +8,7 @@ from flask_limiter.util import get_remote_address
 from functools import wraps
 from flask import request
 import logging
+from api.utils.audit import log_audit_event
 
 logger = logging.getLogger(__name__)
 
@@ -57,10 +58,26 @@ def audit_log(action: str):
             result = f(*args, **kwargs)
             
             # Log após a ação (apenas se sucesso)
-            if isinstance(result, tuple) and result[1] == 200:
+            status_code = result[1] if isinstance(result, tuple) and len(result) > 1 else getattr(result, 'status_code', 200)
+            if status_code == 200:
                 logger.info(f"✅ AUDIT: {action} | Success")
-            elif isinstance(result, tuple):
-                logger.warning(f"⚠️ AUDIT: {action} | Failed with status {result[1]}")
+            else:
+                logger.warning(f"⚠️ AUDIT: {action} | Failed with status {status_code}")
+            
+            # Registro persistente, gravado em lote pelo audit_writer (não bloqueia a resposta)
+            user_id = getattr(request, 'user_id', None)
+            log_audit_event(
+                event_type=action,
+                user_id=user_id if isinstance(user_id, int) else None,
+                payload={
+                    'user_id': str(user_id) if user_id is not None else None,
+                    'ip': request.remote_addr,
+                    'user_agent': request.headers.get('User-Agent', '')[:100],
+                    'endpoint': request.path,
+                    'status_code': status_code
+                },
+                status='success' if status_code == 200 else 'error'
+            )
             
             return result
         return decorated
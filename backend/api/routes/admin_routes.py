@@ -13,6 +13,7 @@ from api.utils.jwt_utils import (
     log_audit
 )
 import bcrypt
+from api.utils.crypto_pool import crypto_pool, CryptoPoolBusy
 import os
 from datetime import datetime
 
@@ -56,7 +57,7 @@ def admin_login():
             return jsonify({'error': 'Invalid credentials'}), 401
         
         # Verify password
-        if not bcrypt.checkpw(password.encode('utf-8'), user['password_hash'].encode('utf-8')):
+        if not crypto_pool.checkpw(password, user['password_hash']):
             return jsonify({'error': 'Invalid credentials'}), 401
         
         # Check if user is admin or superadmin
@@ -89,6 +90,8 @@ def admin_login():
             'refresh_token': refresh_token
         }), 200
         
+    except CryptoPoolBusy:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -219,11 +222,15 @@ def get_audit_logs():
 def get_users():
     """
     Get all users
-    GET /api/admin/users?limit=50&offset=0
+    GET /api/admin/users?limit=50&offset=0&onchain=false
+    
+    onchain=true adds each user's on-chain NFT status, read for the whole
+    page in one batched RPC round trip
     """
     try:
         limit = request.args.get('limit', 50, type=int)
         offset = request.args.get('offset', 0, type=int)
+        onchain = request.args.get('onchain', 'false').lower() == 'true'
         
         conn = get_db_connection()
         cur = conn.cursor()
@@ -231,7 +238,7 @@ def get_users():
         cur.execute("""
             SELECT 
                 id, email, name, role, kyc_status, liveness_status,
-                created_at, kyc_updated_at
+                created_at, kyc_updated_at, wallet_address
             FROM users
             ORDER BY created_at DESC
             LIMIT %s OFFSET %s
@@ -256,12 +263,25 @@ def get_users():
             user_agent=request.headers.get('User-Agent')
         )
         
+        users = [dict(user) for user in users]
+        
+        if onchain:
+            from api.utils.nft import nft_manager
+            from api.utils.nft_state_cache import nft_state_cache
+            wallets = [user['wallet_address'] for user in users if user['wallet_address']]
+            statuses = nft_state_cache.get_status_batch(wallets, nft_manager.get_nft_status_batch)
+            for user in users:
+                user['nft_onchain'] = statuses.get(user['wallet_address'])
+        else:
+            for user in users:
+                user.pop('wallet_address')
+        
         return jsonify({
             'status': 'success',
             'total': total,
             'limit': limit,
             'offset': offset,
-            'users': [dict(user) for user in users]
+            'users': users
         }), 200
         
     except Exception as e:
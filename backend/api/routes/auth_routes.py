@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-import bcrypt
+from api.utils.crypto_pool import crypto_pool, bcrypt_hashpw
 import re
 from api.auth import generate_token, token_required
 from api.utils.db import get_db_connection
@@ -64,9 +64,11 @@ def register():
         conn.close()
         return jsonify({'error': 'Email já cadastrado'}), 409
     
-    # Hash das senhas (normal e de coação)
-    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-    coercion_hash = bcrypt.hashpw(coercion_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    # Hash das senhas (normal e de coação), em paralelo no pool de criptografia
+    password_future = crypto_pool.submit(bcrypt_hashpw, password)
+    coercion_future = crypto_pool.submit(bcrypt_hashpw, coercion_password)
+    password_hash = password_future.result()
+    coercion_hash = coercion_future.result()
     
     # Inserir usuário com ambas as senhas
     cur.execute(
@@ -118,7 +120,7 @@ def login():
     password_hash = user['password_hash']
     role = user['role']
     
-    if not bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8')):
+    if not crypto_pool.checkpw(password, password_hash):
         return jsonify({'error': 'Credenciais inválidas'}), 401
     
     token = generate_token(user_id, email, role)
@@ -3,17 +3,147 @@ Rotas de API para registro e verificação de documentos na blockchain
 Substitui as antigas rotas /api/proxy/* (Toolblox deprecated na v1.4)
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+import os
+import json
 import logging
+from psycopg2.extras import execute_values
 from api.auth import token_required
 from api.utils.db import get_db_connection
 from api.utils.nft import nft_manager
 from api.utils.wallet import wallet_manager
+from api.utils.signing_session import WALLET_SESSION_HEADER
+from api.utils.crypto_pool import CryptoPoolBusy
+from api.utils.document_anchor import batch_mode_enabled, document_batcher, find_batched_registrations
+from api.utils.proof_index import PROOF_MIN_CONFIRMATIONS, find_proofs
 
 logger = logging.getLogger(__name__)
 
 document_bp = Blueprint('document', __name__)
 
+DOCUMENT_BULK_MAX_ITEMS = int(os.getenv('DOCUMENT_BULK_MAX_ITEMS', '10000'))  # hashes por chamada de register-batch/verify-batch
+DOCUMENT_BULK_CHUNK_SIZE = 1000  # itens por INSERT/consulta dentro de uma chamada em lote
+
+@document_bp.before_app_request
+def start_document_batcher():
+    # Ancora os registros enfileirados (ex: após restart) mesmo sem novos registros neste processo
+    if batch_mode_enabled():
+        document_batcher.start_worker()
+
+def normalize_doc_hash(value):
+    """
+    Normaliza um hash de documento para 0x + 64 hex minúsculos
+
+    Returns:
+        Hash normalizado ou None se inválido
+    """
+    if not isinstance(value, str):
+        return None
+
+    value = value.strip().lower()
+    if not value.startswith('0x'):
+        value = '0x' + value
+
+    if len(value) != 66:
+        return None
+
+    try:
+        bytes.fromhex(value[2:])
+    except ValueError:
+        return None
+
+    return value
+
+def _ndjson(item):
+    return json.dumps(item, default=str) + '\n'
+
+def hash_variants(value, doc_hash):
+    """
+    Formas em que um documento pode ter sido registrado
+
+    Antes da normalização, hashes com 0x eram registrados como digitados; no
+    contrato a chave é o keccak256 do texto exato, então um hash com
+    maiúsculas também é consultado na forma original.
+    """
+    variants = [doc_hash]
+    if isinstance(value, str) and value.startswith('0x') and value != doc_hash:
+        variants.append(value)
+    return variants
+
+def lookup_documents(cur, requested, min_confirmations):
+    """
+    Verificação comum a /verify e /verify-batch
+
+    Documentos ancorados em lote valem pela prova de Merkle (verificada
+    localmente) com a raiz confirmada; os demais pelo índice local de provas
+    do ProofRegistry, com as confirmações pedidas.
+
+    Args:
+        cur: Cursor aberto (RealDictCursor)
+        requested: Lista de (hash normalizado, variantes de hash_variants)
+        min_confirmations: Blocos exigidos acima do registro
+
+    Returns:
+        Dict hash normalizado -> resultado (registered, on_blockchain e
+        anchor ou proof, registration_info e message quando houver)
+    """
+    variants = list({variant for _, candidates in requested for variant in candidates})
+    batched = find_batched_registrations(cur, variants)
+    proofs = find_proofs(cur, [variant for variant in variants if variant not in batched], min_confirmations)
+
+    cur.execute("""
+        SELECT DISTINCT ON (dr.file_hash)
+            dr.file_hash, u.email, dr.document_name, dr.document_url, dr.registered_at, dr.blockchain_tx
+        FROM document_registrations dr
+        JOIN users u ON dr.user_id = u.id
+        WHERE dr.file_hash = ANY(%s)
+        ORDER BY dr.file_hash, dr.registered_at DESC
+    """, (variants,))
+    records = {row['file_hash']: row for row in cur.fetchall()}
+
+    results = {}
+    for doc_hash, candidates in requested:
+        anchor = next((batched[variant] for variant in candidates if variant in batched), None)
+
+        if anchor:
+            registered = anchor['proof_valid'] and anchor['anchored']
+            result = {'registered': registered, 'on_blockchain': registered, 'anchor': anchor}
+            if not registered:
+                result['message'] = 'Documento aguardando ancoragem do lote na blockchain'
+            results[doc_hash] = result
+            continue
+
+        # Uma prova válida em qualquer das formas vale
+        found = [(variant, proofs[variant]) for variant in candidates if variant in proofs]
+        variant, proof = next((item for item in found if item[1]['valid']), found[0] if found else (None, None))
+
+        if not proof or not proof['valid']:
+            result = {'registered': False, 'on_blockchain': False}
+            if not proof:
+                result['message'] = 'Documento não encontrado na blockchain'
+            elif proof['revoked']:
+                result['message'] = 'Prova do documento revogada na blockchain'
+                result['proof'] = proof
+            else:
+                result['message'] = f"Registro com {proof['confirmations']} de {min_confirmations} confirmações exigidas"
+                result['proof'] = proof
+            results[doc_hash] = result
+            continue
+
+        result = {'registered': True, 'on_blockchain': True, 'proof': proof}
+        record = records.get(variant) or next((records[other] for other in candidates if other in records), None)
+        if record:
+            result['registration_info'] = {
+                'registered_by': record['email'],
+                'document_name': record['document_name'],
+                'document_url': record['document_url'],
+                'registered_at': record['registered_at'].isoformat() if record['registered_at'] else None,
+                'blockchain_tx': record['blockchain_tx']
+            }
+        results[doc_hash] = result
+
+    return results
+
 @document_bp.route('/register', methods=['POST'])
 @token_required
 def register_document(current_user):
@@ -24,11 +154,15 @@ def register_document(current_user):
         {
             "hash": "0x...",  // Hash do documento (bytes32)
             "document_name": "documento.pdf",  // opcional
-            "document_url": "https://..."  // opcional
+            "document_url": "https://...",  // opcional
+            "password": "..."  // obrigatória no modo direct, salvo com header X-Signing-Session
         }
     
+    Com DOCUMENT_ANCHOR_MODE=batch o documento é enfileirado (202) e ancorado
+    na próxima raiz de Merkle; a prova de inclusão fica em document_registrations.
+    
     Returns:
-        JSON com success, tx_hash, message
+        JSON com success, tx_hash (None enquanto enfileirado), message
     """
     try:
         data = request.get_json()
@@ -39,12 +173,9 @@ def register_document(current_user):
         if not doc_hash:
             return jsonify({'error': 'Hash do documento é obrigatório'}), 400
         
-        # Normalizar hash (adicionar 0x se necessário)
-        if not doc_hash.startswith('0x'):
-            doc_hash = '0x' + doc_hash.strip().lower()
-        
-        # Validar comprimento (66 caracteres: 0x + 64 hex)
-        if len(doc_hash) != 66:
+        # Normalizar hash (0x + 64 hex minúsculos, como nas rotas em lote)
+        doc_hash = normalize_doc_hash(doc_hash)
+        if not doc_hash:
             return jsonify({'error': 'Hash inválido (deve ter 64 caracteres hexadecimais)'}), 400
         
         user_id = current_user['user_id']
@@ -61,15 +192,16 @@ def register_document(current_user):
         
         result = cur.fetchone()
         
-        if not result or not result[0]:
+        if not result or not result['wallet_address']:
             cur.close()
             conn.close()
             return jsonify({'error': 'Usuário não possui carteira'}), 404
         
-        wallet_address, encrypted_private_key, salt, nft_active = result
+        encrypted_private_key = result['encrypted_private_key']
+        salt = result['wallet_salt']
         
         # Verificar se tem NFT ativo
-        if not nft_active:
+        if not result['nft_active']:
             cur.close()
             conn.close()
             return jsonify({
@@ -77,25 +209,54 @@ def register_document(current_user):
                 'message': 'É necessário ter um NFT ativo para registrar documentos'
             }), 403
         
-        # Obter senha do usuário (será solicitada no frontend)
+        # Modo em lote: o documento entra na fila e é ancorado junto com os
+        # demais na próxima raiz de Merkle (assinada pela conta do deployer)
+        if batch_mode_enabled():
+            cur.execute("""
+                INSERT INTO document_registrations 
+                (user_id, file_hash, document_name, document_url, anchor_status, registered_at)
+                VALUES (%s, %s, %s, %s, 'queued', NOW())
+            """, (user_id, doc_hash, document_name, document_url))
+            
+            conn.commit()
+            cur.close()
+            conn.close()
+            
+            document_batcher.notify_queued()
+            
+            logger.info(f"📥 Documento {doc_hash} enfileirado para ancoragem em lote")
+            
+            return jsonify({
+                'success': True,
+                'tx_hash': None,
+                'anchor_status': 'queued',
+                'message': 'Documento enfileirado; será ancorado na blockchain no próximo lote',
+                'document_hash': doc_hash,
+                'document_name': document_name
+            }), 202
+        
+        # Obter senha do usuário (será solicitada no frontend) ou sessão de assinatura
         password = data.get('password')
+        session_token = request.headers.get(WALLET_SESSION_HEADER)
         
-        if not password:
+        if not password and not session_token:
             cur.close()
             conn.close()
             return jsonify({'error': 'Senha é obrigatória para registrar documento'}), 400
         
         # Descriptografar chave privada
         try:
-            private_key = wallet_manager.decrypt_private_key(
+            private_key = wallet_manager.unlock_private_key(
+                user_id,
                 encrypted_private_key,
+                salt,
                 password,
-                salt
+                session_token
             )
-        except ValueError:
+        except ValueError as e:
             cur.close()
             conn.close()
-            return jsonify({'error': 'Senha incorreta'}), 401
+            return jsonify({'error': 'Senha incorreta' if password else str(e)}), 401
         
         # Registrar prova na blockchain
         try:
@@ -146,6 +307,8 @@ def register_document(current_user):
             'document_name': document_name
         }), 200
         
+    except CryptoPoolBusy:
+        raise
     except Exception as e:
         logger.error(f"❌ Erro ao registrar documento: {str(e)}")
         return jsonify({
@@ -160,77 +323,41 @@ def verify_document():
     
     Request Body:
         {
-            "hash": "0x..."  // Hash do documento (bytes32)
+            "hash": "0x...",  // Hash do documento (bytes32)
+            "confirmations": 0  // opcional: blocos exigidos acima do registro
         }
     
     Returns:
-        JSON com registered, proof_data, registration_info
+        JSON com registered, proof (signer, bloco, tx, confirmações),
+        registration_info ou anchor (raiz, prova e estado do lote, para
+        documentos ancorados em lote); a mesma consulta de /verify-batch
     """
     try:
         data = request.get_json()
-        doc_hash = data.get('hash') or data.get('documentHash')
+        value = data.get('hash') or data.get('documentHash')
         
-        if not doc_hash:
+        if not value:
             return jsonify({'error': 'Hash do documento é obrigatório'}), 400
         
-        # Normalizar hash
-        if not doc_hash.startswith('0x'):
-            doc_hash = '0x' + doc_hash.strip().lower()
-        
-        # Validar comprimento
-        if len(doc_hash) != 66:
+        # Normalizar hash (0x + 64 hex minúsculos, como nas rotas em lote)
+        doc_hash = normalize_doc_hash(value)
+        if not doc_hash:
             return jsonify({'error': 'Hash inválido (deve ter 64 caracteres hexadecimais)'}), 400
         
-        # Verificar na blockchain
         try:
-            is_registered = nft_manager.verify_proof(doc_hash)
-            
-            if not is_registered:
-                return jsonify({
-                    'registered': False,
-                    'message': 'Documento não encontrado na blockchain'
-                }), 200
-            
-        except Exception as e:
-            logger.error(f"❌ Erro ao verificar documento na blockchain: {str(e)}")
-            return jsonify({
-                'error': 'Falha ao verificar documento na blockchain',
-                'details': str(e)
-            }), 500
+            min_confirmations = int(data.get('confirmations', PROOF_MIN_CONFIRMATIONS))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'confirmations deve ser um inteiro'}), 400
         
-        # Buscar informações no banco de dados
         conn = get_db_connection()
         cur = conn.cursor()
         
-        cur.execute("""
-            SELECT u.email, dr.document_name, dr.document_url, dr.registered_at, dr.blockchain_tx
-            FROM document_registrations dr
-            JOIN users u ON dr.user_id = u.id
-            WHERE dr.file_hash = %s
-            ORDER BY dr.registered_at DESC
-            LIMIT 1
-        """, (doc_hash,))
-        
-        db_record = cur.fetchone()
+        result = lookup_documents(cur, [(doc_hash, hash_variants(value, doc_hash))], min_confirmations)[doc_hash]
+        
         cur.close()
         conn.close()
         
-        result = {
-            'registered': True,
-            'on_blockchain': True,
-            'document_hash': doc_hash
-        }
-        
-        if db_record:
-            result['registration_info'] = {
-                'registered_by': db_record[0],
-                'document_name': db_record[1],
-                'document_url': db_record[2],
-                'registered_at': db_record[3].isoformat() if db_record[3] else None,
-                'blockchain_tx': db_record[4]
-            }
-        
-        return jsonify(result), 200
+        return jsonify({'document_hash': doc_hash, **result}), 200
         
     except Exception as e:
         logger.error(f"❌ Erro ao verificar documento: {str(e)}")
@@ -255,7 +382,7 @@ def document_history(current_user):
         cur = conn.cursor()
         
         cur.execute("""
-            SELECT file_hash, document_name, document_url, blockchain_tx, registered_at
+            SELECT file_hash, document_name, document_url, blockchain_tx, registered_at, anchor_status, batch_id
             FROM document_registrations
             WHERE user_id = %s
             ORDER BY registered_at DESC
@@ -268,11 +395,13 @@ def document_history(current_user):
         documents = []
         for record in records:
             documents.append({
-                'file_hash': record[0],
-                'document_name': record[1],
-                'document_url': record[2],
-                'blockchain_tx': record[3],
-                'registered_at': record[4].isoformat() if record[4] else None
+                'file_hash': record['file_hash'],
+                'document_name': record['document_name'],
+                'document_url': record['document_url'],
+                'blockchain_tx': record['blockchain_tx'],
+                'registered_at': record['registered_at'].isoformat() if record['registered_at'] else None,
+                'anchor_status': record['anchor_status'] or 'direct',
+                'batch_id': record['batch_id']
             })
         
         return jsonify({
@@ -288,3 +417,263 @@ def document_history(current_user):
             'details': str(e)
         }), 500
 
+
+@document_bp.route('/register-batch', methods=['POST'])
+@token_required
+def register_documents_batch(current_user):
+    """
+    Registra vários documentos em uma única chamada
+    
+    A carteira é consultada e descriptografada uma única vez; no modo batch
+    (DOCUMENT_ANCHOR_MODE=batch) os documentos apenas entram na fila da
+    próxima raiz de Merkle e a senha não é necessária.
+    
+    Request Body:
+        {
+            "documents": [
+                {"hash": "0x...", "document_name": "a.pdf", "document_url": "https://..."},
+                ...
+            ],
+            "password": "..."  // obrigatória no modo direct, salvo com header X-Signing-Session
+        }
+    
+    Returns:
+        Stream NDJSON: uma linha por documento ({"index", "hash", "success", ...})
+        e uma linha final {"summary": {...}}
+    """
+    data = request.get_json() or {}
+    documents = data.get('documents') or [{'hash': doc_hash} for doc_hash in data.get('hashes', [])]
+    
+    if not documents:
+        return jsonify({'error': 'Lista de documentos é obrigatória'}), 400
+    
+    if len(documents) > DOCUMENT_BULK_MAX_ITEMS:
+        return jsonify({'error': f'Máximo de {DOCUMENT_BULK_MAX_ITEMS} documentos por chamada'}), 400
+    
+    user_id = current_user['user_id']
+    batch_mode = batch_mode_enabled()
+    
+    # Carteira consultada (e descriptografada) uma única vez para o lote inteiro
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    cur.execute("""
+        SELECT wallet_address, encrypted_private_key, wallet_salt, nft_active
+        FROM users
+        WHERE id = %s
+    """, (user_id,))
+    
+    result = cur.fetchone()
+    cur.close()
+    conn.close()
+    
+    if not result or not result['wallet_address']:
+        return jsonify({'error': 'Usuário não possui carteira'}), 404
+    
+    if not result['nft_active']:
+        return jsonify({
+            'error': 'NFT inativo ou não existente',
+            'message': 'É necessário ter um NFT ativo para registrar documentos'
+        }), 403
+    
+    private_key = None
+    if not batch_mode:
+        password = data.get('password')
+        session_token = request.headers.get(WALLET_SESSION_HEADER)
+        
+        if not password and not session_token:
+            return jsonify({'error': 'Senha é obrigatória para registrar documentos'}), 400
+        
+        try:
+            private_key = wallet_manager.unlock_private_key(
+                user_id,
+                result['encrypted_private_key'],
+                result['wallet_salt'],
+                password,
+                session_token
+            )
+        except ValueError as e:
+            return jsonify({'error': 'Senha incorreta' if password else str(e)}), 401
+    
+    def generate():
+        registered = 0
+        failed = 0
+        pending_rows = []
+        pending_items = []  # linhas ainda não enviadas: um sucesso só sai depois de gravado
+        error = None
+        
+        conn = get_db_connection()
+        cur = conn.cursor()
+        
+        def persist():
+            nonlocal registered
+            if not pending_rows:
+                return
+            execute_values(
+                cur,
+                """
+                INSERT INTO document_registrations
+                (user_id, file_hash, document_name, document_url, blockchain_tx, anchor_status, registered_at)
+                VALUES %s
+                """,
+                pending_rows,
+                template="(%s, %s, %s, %s, %s, %s, NOW())"
+            )
+            conn.commit()
+            registered += len(pending_rows)
+            pending_rows.clear()
+        
+        def drain():
+            lines = ''.join(_ndjson(item) for item in pending_items)
+            pending_items.clear()
+            return lines
+        
+        try:
+            for index, document in enumerate(documents):
+                document = document if isinstance(document, dict) else {'hash': document}
+                doc_hash = normalize_doc_hash(document.get('hash') or document.get('documentHash'))
+                document_name = document.get('document_name', 'Documento sem nome')
+                document_url = document.get('document_url')
+                
+                if not doc_hash:
+                    failed += 1
+                    pending_items.append({'index': index, 'hash': document.get('hash'), 'success': False,
+                                          'error': 'Hash inválido (deve ter 64 caracteres hexadecimais)'})
+                    continue
+                
+                if batch_mode:
+                    pending_rows.append((user_id, doc_hash, document_name, document_url, None, 'queued'))
+                    pending_items.append({'index': index, 'hash': doc_hash, 'success': True, 'anchor_status': 'queued'})
+                else:
+                    try:
+                        proof_result = nft_manager.register_proof(
+                            doc_hash,
+                            document_url or f"ipfs://blocktrust/{doc_hash}",
+                            private_key
+                        )
+                    except Exception as e:
+                        failed += 1
+                        pending_items.append({'index': index, 'hash': doc_hash, 'success': False, 'error': str(e)})
+                        continue
+                    
+                    pending_rows.append((user_id, doc_hash, document_name, document_url, proof_result['transaction_hash'], None))
+                    pending_items.append({'index': index, 'hash': doc_hash, 'success': True,
+                                          'tx_hash': proof_result['transaction_hash'], 'tx_id': proof_result.get('tx_id')})
+                
+                # No modo direct a transação já foi enviada: o registro é gravado antes do próximo envio
+                if not batch_mode or len(pending_rows) >= DOCUMENT_BULK_CHUNK_SIZE:
+                    persist()
+                    yield drain()
+            
+            persist()
+            
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Erro no registro em lote: {str(e)}")
+            error = str(e)
+        
+        finally:
+            # Também quando o cliente desconecta (GeneratorExit): o que já foi
+            # processado é gravado, e as transações enviadas não ficam sem registro
+            try:
+                persist()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"❌ Registros em lote não gravados ({len(pending_rows)}): {str(e)}")
+                for item in pending_items:
+                    if item['success']:
+                        item.update(success=False, error='Registro não gravado')
+                        failed += 1
+                pending_rows.clear()
+            cur.close()
+            conn.close()
+            
+            if batch_mode and registered:
+                document_batcher.notify_queued(registered)
+        
+        logger.info(f"✅ Registro em lote do usuário {user_id}: {registered} registrados, {failed} com erro")
+        
+        lines = drain()
+        if error:
+            lines += _ndjson({'error': 'Erro ao registrar documentos', 'details': error})
+        yield lines + _ndjson({'summary': {'total': len(documents), 'registered': registered, 'failed': failed,
+                                           'anchor_mode': 'batch' if batch_mode else 'direct'}})
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@document_bp.route('/verify-batch', methods=['POST'])
+def verify_documents_batch():
+    """
+    Verifica vários documentos com uma consulta por bloco de hashes
+    
+    Cada hash recebe a mesma resposta de /verify: registros em lote valem
+    pela prova de Merkle com a raiz confirmada e os demais pelo índice local
+    de provas do ProofRegistry.
+    
+    Request Body:
+        {
+            "hashes": ["0x...", ...],
+            "confirmations": 0  // opcional: blocos exigidos acima do registro
+        }
+    
+    Returns:
+        Stream NDJSON: uma linha por hash ({"index", "hash", "registered", ...})
+        e uma linha final {"summary": {...}}
+    """
+    data = request.get_json() or {}
+    hashes = data.get('hashes') or []
+    
+    if not hashes:
+        return jsonify({'error': 'Lista de hashes é obrigatória'}), 400
+    
+    if len(hashes) > DOCUMENT_BULK_MAX_ITEMS:
+        return jsonify({'error': f'Máximo de {DOCUMENT_BULK_MAX_ITEMS} hashes por chamada'}), 400
+    
+    try:
+        min_confirmations = int(data.get('confirmations', PROOF_MIN_CONFIRMATIONS))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'confirmations deve ser um inteiro'}), 400
+    
+    def generate():
+        found = 0
+        
+        conn = get_db_connection()
+        cur = conn.cursor()
+        
+        try:
+            for start in range(0, len(hashes), DOCUMENT_BULK_CHUNK_SIZE):
+                chunk = hashes[start:start + DOCUMENT_BULK_CHUNK_SIZE]
+                normalized = [normalize_doc_hash(value) for value in chunk]
+                
+                results = lookup_documents(
+                    cur,
+                    [(doc_hash, hash_variants(value, doc_hash)) for value, doc_hash in zip(chunk, normalized) if doc_hash],
+                    min_confirmations
+                )
+                conn.commit()
+                
+                lines = []
+                for offset, doc_hash in enumerate(normalized):
+                    index = start + offset
+                    
+                    if not doc_hash:
+                        lines.append(_ndjson({'index': index, 'hash': chunk[offset], 'registered': False,
+                                              'error': 'Hash inválido (deve ter 64 caracteres hexadecimais)'}))
+                        continue
+                    
+                    found += results[doc_hash]['registered']
+                    lines.append(_ndjson({'index': index, 'hash': doc_hash, **results[doc_hash]}))
+                
+                yield ''.join(lines)
+            
+        except Exception as e:
+            logger.error(f"❌ Erro na verificação em lote: {str(e)}")
+            yield _ndjson({'error': 'Erro ao verificar documentos', 'details': str(e)})
+        
+        finally:
+            cur.close()
+            conn.close()
+        
+        yield _ndjson({'summary': {'total': len(hashes), 'registered': found, 'not_registered': len(hashes) - found}})
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
@@ -16,6 +16,7 @@ explorer_bp = Blueprint('explorer', __name__)
 
 JWT_SECRET = os.getenv('JWT_SECRET', 'blocktrust_secret')
 JWT_EXPIRATION_HOURS = 12
+MAX_EVENTS_PAGE = 1000
 
 @explorer_bp.route('/login', methods=['POST'])
 def login():
@@ -61,18 +62,21 @@ def login():
 @explorer_bp.route('/events', methods=['GET'])
 def get_events():
     """
-    Obtém lista de eventos da blockchain
+    Obtém lista de eventos da blockchain (paginação por cursor)
     
     Headers:
         Authorization: Bearer <token>
     
     Query Params:
-        limit: Número máximo de eventos (default: 100)
-        offset: Offset para paginação (default: 0)
+        limit: Número máximo de eventos (default: 100, máximo: 1000)
+        before_id: Retorna eventos com id menor que este (próxima página)
+        after_id: Retorna eventos com id maior que este (página anterior / novos eventos)
         type: Filtrar por tipo de evento (opcional)
+        view: "latest" (default, tudo o que o listener ingeriu) ou "finalized"
+              (apenas eventos com confirmações suficientes, ver listener_head)
     
     Returns:
-        JSON com lista de eventos
+        JSON com lista de eventos (id decrescente), cursores e total
     """
     try:
         # Verificar token JWT
@@ -91,39 +95,93 @@ def get_events():
             return jsonify({'error': 'Token inválido'}), 401
         
         # Parâmetros de consulta
-        limit = int(request.args.get('limit', 100))
-        offset = int(request.args.get('offset', 0))
+        try:
+            limit = min(max(int(request.args.get('limit', 100)), 1), MAX_EVENTS_PAGE)
+            before_id = request.args.get('before_id', type=int)
+            after_id = request.args.get('after_id', type=int)
+        except ValueError:
+            return jsonify({'error': 'limit deve ser numérico'}), 400
+        
         event_type = request.args.get('type')
+        view = request.args.get('view', 'latest')
+        
+        if view not in ('latest', 'finalized'):
+            return jsonify({'error': 'view inválida (use latest ou finalized)'}), 400
+        
+        if before_id is not None and after_id is not None:
+            return jsonify({'error': 'Use before_id ou after_id, não ambos'}), 400
         
         # Consultar eventos
         conn = get_db_connection()
         cur = conn.cursor()
         
+        # Cabeça e último bloco finalizado, mantidos pelo listener
+        cur.execute("SELECT head_block, finalized_block FROM listener_head WHERE id = 1")
+        head = cur.fetchone()
+        head_block = head['head_block'] if head else None
+        finalized_block = head['finalized_block'] if head else None
+        finalized_cutoff = finalized_block if finalized_block is not None else -1
+        
+        conditions = []
+        params = []
+        
         if event_type:
-            cur.execute("""
-                SELECT id, type, data, timestamp
-                FROM events
-                WHERE type = %s
-                ORDER BY id DESC
-                LIMIT %s OFFSET %s
-            """, (event_type, limit, offset))
+            conditions.append("type = %s")
+            params.append(event_type)
+        
+        if view == 'finalized':
+            conditions.append("(data->>'blockNumber')::BIGINT <= %s")
+            params.append(finalized_cutoff)
+        
+        # Cursor sobre a chave primária: custo constante por página, em qualquer profundidade
+        if after_id is not None:
+            conditions.append("id > %s")
+            params.append(after_id)
+            order = "ASC"
         else:
-            cur.execute("""
-                SELECT id, type, data, timestamp
-                FROM events
-                ORDER BY id DESC
-                LIMIT %s OFFSET %s
-            """, (limit, offset))
+            if before_id is not None:
+                conditions.append("id < %s")
+                params.append(before_id)
+            order = "DESC"
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        # limit + 1 para saber se existe outra página sem contar
+        cur.execute(f"""
+            SELECT id, type, data, timestamp
+            FROM events
+            {where}
+            ORDER BY id {order}
+            LIMIT %s
+        """, (*params, limit + 1))
         
         events = cur.fetchall()
+        has_more = len(events) > limit
+        events = events[:limit]
         
-        # Contar total
+        if order == "ASC":
+            events.reverse()
+        
+        # Total a partir dos contadores mantidos pelo listener (sem COUNT(*) na tabela)
         if event_type:
-            cur.execute("SELECT COUNT(*) FROM events WHERE type = %s", (event_type,))
+            cur.execute("SELECT COALESCE(SUM(count), 0) AS total FROM event_counts WHERE type = %s", (event_type,))
         else:
-            cur.execute("SELECT COUNT(*) FROM events")
-        
-        total = cur.fetchone()[0]
+            cur.execute("SELECT COALESCE(SUM(count), 0) AS total FROM event_counts")
+        total = int(cur.fetchone()['total'])
+        
+        if view == 'finalized':
+            # Só os blocos ainda não finalizados são contados (janela de LISTENER_CONFIRMATIONS)
+            pending_where = ["(data->>'blockNumber')::BIGINT > %s"]
+            pending_params = [finalized_cutoff]
+            if event_type:
+                pending_where.append("type = %s")
+                pending_params.append(event_type)
+            
+            cur.execute(
+                f"SELECT COUNT(*) AS pending FROM events WHERE {' AND '.join(pending_where)}",
+                pending_params
+            )
+            total = max(total - cur.fetchone()['pending'], 0)
         
         cur.close()
         conn.close()
@@ -132,10 +190,10 @@ def get_events():
         events_list = []
         for event in events:
             events_list.append({
-                'id': event[0],
-                'type': event[1],
-                'data': event[2],  # Já é JSON
-                'timestamp': event[3].isoformat() if event[3] else None
+                'id': event['id'],
+                'type': event['type'],
+                'data': event['data'],  # Já é JSON
+                'timestamp': event['timestamp'].isoformat() if event['timestamp'] else None
             })
         
         return jsonify({
@@ -143,7 +201,12 @@ def get_events():
             'events': events_list,
             'total': total,
             'limit': limit,
-            'offset': offset
+            'has_more': has_more,
+            'next_before_id': events_list[-1]['id'] if events_list else before_id,
+            'prev_after_id': events_list[0]['id'] if events_list else after_id,
+            'view': view,
+            'head_block': head_block,
+            'finalized_block': finalized_block
         }), 200
         
     except Exception as e:
@@ -189,6 +252,10 @@ def get_stats():
     """
     Retorna estatísticas dos eventos
     
+    Os agregados vêm de event_counts e event_hourly_counts, mantidos pelo
+    listener no momento da ingestão; a consulta lê poucas linhas
+    independentemente do tamanho da tabela events.
+    
     Returns:
         JSON com estatísticas
     """
@@ -198,28 +265,27 @@ def get_stats():
         
         # Total de eventos por tipo
         cur.execute("""
-            SELECT type, COUNT(*) as count
-            FROM events
-            GROUP BY type
+            SELECT type, count
+            FROM event_counts
+            WHERE count > 0
             ORDER BY count DESC
         """)
         
         events_by_type = {}
         for row in cur.fetchall():
-            events_by_type[row[0]] = row[1]
+            events_by_type[row['type']] = row['count']
         
         # Total geral
-        cur.execute("SELECT COUNT(*) FROM events")
-        total_events = cur.fetchone()[0]
+        total_events = sum(events_by_type.values())
         
-        # Eventos nas últimas 24h
+        # Eventos nas últimas 24h (granularidade de uma hora)
         cur.execute("""
-            SELECT COUNT(*) FROM events
-            WHERE timestamp > NOW() - INTERVAL '24 hours'
+            SELECT COALESCE(SUM(count), 0) AS total FROM event_hourly_counts
+            WHERE bucket > NOW() - INTERVAL '24 hours'
         """)
-        events_24h = cur.fetchone()[0]
+        events_24h = int(cur.fetchone()['total'])
         
-        # Último evento
+        # Último evento (busca pela chave primária)
         cur.execute("""
             SELECT type, timestamp FROM events
             ORDER BY id DESC LIMIT 1
@@ -229,8 +295,8 @@ def get_stats():
         last_event_data = None
         if last_event:
             last_event_data = {
-                'type': last_event[0],
-                'timestamp': last_event[1].isoformat() if last_event[1] else None
+                'type': last_event['type'],
+                'timestamp': last_event['timestamp'].isoformat() if last_event['timestamp'] else None
             }
         
         cur.close()
@@ -275,7 +341,7 @@ def get_dual_proofs():
         }
     """
     try:
-        from ..database import get_db_connection
+        from ..utils.db import get_db_connection
         
         conn = get_db_connection()
         cur = conn.cursor()
@@ -4,7 +4,7 @@ Rotas de API para configuração de senha de emergência (Failsafe)
 
 from flask import Blueprint, request, jsonify
 import logging
-import bcrypt
+from api.utils.crypto_pool import crypto_pool, CryptoPoolBusy
 from api.auth import token_required
 from api.utils.db import get_db_connection
 
@@ -61,13 +61,13 @@ def configure_failsafe(current_user):
         password_hash = result[0]
         
         # Verificar senha atual
-        if not bcrypt.checkpw(current_password.encode('utf-8'), password_hash.encode('utf-8')):
+        if not crypto_pool.checkpw(current_password, password_hash):
             cur.close()
             conn.close()
             return jsonify({'error': 'Senha atual incorreta'}), 401
         
         # Gerar hash da senha de emergência
-        failsafe_hash = bcrypt.hashpw(failsafe_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        failsafe_hash = crypto_pool.hashpw(failsafe_password)
         
         # Salvar no banco
         cur.execute("""
@@ -88,6 +88,8 @@ def configure_failsafe(current_user):
             'message': 'Senha de emergência configurada com sucesso'
         }), 200
         
+    except CryptoPoolBusy:
+        raise
     except Exception as e:
         logger.error(f"❌ Erro ao configurar senha de emergência: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -15,13 +15,18 @@ from api.utils.sumsub import (
     validate_credentials
 )
 from api.utils.db import get_db_connection
-from api.utils.audit import log_kyc_event, log_nft_event
+from api.utils.webhook_jobs import webhook_jobs, sumsub_dedup_key
 import logging
 
 logger = logging.getLogger(__name__)
 
 kyc_bp = Blueprint('kyc', __name__)
 
+@kyc_bp.before_app_request
+def start_webhook_jobs():
+    # Retoma eventos pendentes (ex: após restart) em cada processo
+    webhook_jobs.start_worker()
+
 @kyc_bp.route('/init', methods=['POST'])
 @token_required
 def init_kyc(current_user):
@@ -318,96 +323,22 @@ def webhook():
         
         event_type = data.get('type')
         applicant_id = data.get('applicantId')
-        external_user_id = data.get('externalUserId')
-        review_status = data.get('reviewStatus')
-        review_result = data.get('reviewResult', {})
-        
-        logger.info(f"✅ Webhook recebido: {event_type} para applicant {applicant_id}")
         
-        # Atualiza status no banco de dados
-        if external_user_id and review_status:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            
-            # Parseia status
-            parsed_status = parse_verification_status(data)
-            
-            cur.execute("""
-                UPDATE users
-                SET kyc_status = %s,
-                    kyc_updated_at = NOW(),
-                    sumsub_data = %s
-                WHERE id = %s
-            """, (parsed_status['status'], str(data), int(external_user_id)))
-            
-            conn.commit()
-            cur.close()
-            conn.close()
-            
-            logger.info(f"✅ Status KYC atualizado para usuário {external_user_id}: {parsed_status['status']}")
-            
-            # Registrar evento de auditoria
-            log_kyc_event(
-                user_id=int(external_user_id),
-                event_type=parsed_status['status'],
-                applicant_id=applicant_id,
-                review_status=review_status,
-                details={'review_result': review_result}
-            )
-            
-            # Se KYC foi aprovado, iniciar processo de mint de NFT
-            if parsed_status['status'] == 'approved':
-                logger.info(f"🎯 KYC aprovado para usuário {external_user_id} - Iniciando processo de mint de NFT")
-                
-                try:
-                    # Importar utilitários de NFT
-                    from api.utils.nft import check_active_nft, cancel_nft, mint_nft
-                    
-                    # 1. Verificar se usuário já possui NFT ativo
-                    existing_nft = check_active_nft(int(external_user_id))
-                    
-                    if existing_nft:
-                        logger.info(f"⚠️  Usuário {external_user_id} já possui NFT ativo (ID: {existing_nft['nft_id']}) - Cancelando...")
-                        
-                        # 2. Cancelar NFT anterior
-                        cancel_result = cancel_nft(int(external_user_id), existing_nft['nft_id'])
-                        
-                        if cancel_result['success']:
-                            logger.info(f"✅ NFT anterior cancelado: {cancel_result['tx_hash']}")
-                        else:
-                            logger.error(f"❌ Erro ao cancelar NFT anterior: {cancel_result.get('error')}")
-                    
-                    # 3. Mintar novo NFT
-                    logger.info(f"🎨 Mintando novo NFT para usuário {external_user_id}...")
-                    
-                    mint_result = mint_nft(
-                        user_id=int(external_user_id),
-                        kyc_data={
-                            'applicant_id': applicant_id,
-                            'review_status': review_status,
-                            'review_result': review_result
-                        }
-                    )
-                    
-                    if mint_result['success']:
-                        logger.info(f"✅ NFT mintado com sucesso: ID={mint_result['nft_id']}, TX={mint_result['tx_hash']}")
-                        
-                        # Registrar evento de auditoria do NFT
-                        log_nft_event(
-                            user_id=int(external_user_id),
-                            event_type='minted',
-                            nft_id=mint_result['nft_id'],
-                            tx_hash=mint_result['tx_hash'],
-                            details={'kyc_applicant_id': applicant_id}
-                        )
-                    else:
-                        logger.error(f"❌ Erro ao mintar NFT: {mint_result.get('error')}")
-                        
-                except Exception as nft_error:
-                    logger.error(f"❌ Erro no processo de NFT: {str(nft_error)}")
-                    # Não falhar o webhook por causa do NFT
-        
-        return jsonify({'status': 'received'}), 200
+        # Grava o evento bruto e responde já: a transição de KYC e o mint do NFT
+        # rodam no webhook_jobs, com retentativas (reenvios do Sumsub são deduplicados)
+        event_id, created = webhook_jobs.enqueue(
+            'sumsub',
+            sumsub_dedup_key(data, request_body),
+            event_type,
+            data
+        )
+        
+        if created:
+            logger.info(f"✅ Webhook recebido: {event_type} para applicant {applicant_id} (evento {event_id})")
+        else:
+            logger.info(f"♻️ Webhook duplicado ignorado: {event_type} para applicant {applicant_id} (evento {event_id})")
+        
+        return jsonify({'status': 'received', 'event_id': event_id, 'duplicate': not created}), 200
         
     except Exception as e:
         logger.error(f"💥 Erro ao processar webhook: {str(e)}")
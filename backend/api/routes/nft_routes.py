@@ -5,7 +5,10 @@ Rotas de API para gerenciamento de NFTs SoulBound
 from flask import Blueprint, request, jsonify
 import logging
 from api.utils.nft import nft_manager
+from api.utils.nft_state_cache import nft_state_cache
 from api.utils.wallet import wallet_manager
+from api.utils.signing_session import WALLET_SESSION_HEADER
+from api.utils.crypto_pool import CryptoPoolBusy
 from api.auth import token_required
 from api.utils.db import get_db_connection
 
@@ -13,6 +16,11 @@ logger = logging.getLogger(__name__)
 
 nft_bp = Blueprint('nft', __name__)
 
+@nft_bp.before_app_request
+def start_tx_dispatcher():
+    # Retoma as transações abertas da outbox (ex: após restart) em cada processo
+    nft_manager.tx_dispatcher.start_worker()
+
 @nft_bp.route('/status', methods=['GET'])
 @token_required
 def get_nft_status(current_user):
@@ -39,20 +47,34 @@ def get_nft_status(current_user):
         cur.close()
         conn.close()
         
-        if not result or not result[0]:
+        if not result or not result['wallet_address']:
             return jsonify({'error': 'Usuário não possui carteira'}), 404
         
-        wallet_address, db_nft_id, db_nft_active = result
+        wallet_address = result['wallet_address']
+        
+        # Contrato não configurado: responde com o que está no banco
+        if not nft_manager.identity_nft_contract:
+            logger.warning("⚠️ Contrato de NFT não configurado - status do NFT lido do banco")
+            return jsonify({
+                'status': 'success',
+                'has_nft': result['nft_id'] is not None,
+                'nft_id': result['nft_id'],
+                'is_active': bool(result['nft_active']),
+                'wallet_address': wallet_address
+            }), 200
+        
+        # Verificar NFT na blockchain (cache invalidado pelo listener; RPC só na ausência)
+        onchain = nft_state_cache.get_status_batch([wallet_address], nft_manager.get_nft_status_batch).get(wallet_address)
         
-        # Verificar NFT na blockchain
-        blockchain_nft_id = nft_manager.get_active_nft(wallet_address)
-        is_active = nft_manager.is_active_nft(wallet_address)
+        # Leitura on-chain falhou: não reportar "sem NFT"
+        if onchain is None:
+            return jsonify({'error': 'Não foi possível consultar o NFT na blockchain'}), 503
         
         return jsonify({
             'status': 'success',
-            'has_nft': blockchain_nft_id is not None,
-            'nft_id': blockchain_nft_id or db_nft_id,
-            'is_active': is_active,
+            'has_nft': onchain['nft_id'] is not None,
+            'nft_id': onchain['nft_id'] or result['nft_id'],
+            'is_active': onchain['is_active'],
             'wallet_address': wallet_address
         }), 200
         
@@ -68,7 +90,7 @@ def mint_nft(current_user):
     
     Request Body:
         {
-            "password": "senha_do_usuario",
+            "password": "senha_do_usuario",  // dispensada com header X-Signing-Session
             "metadata": {
                 "kyc_status": "approved",
                 "kyc_date": "2025-10-28",
@@ -83,8 +105,9 @@ def mint_nft(current_user):
         data = request.get_json()
         password = data.get('password')
         metadata = data.get('metadata', {})
+        session_token = request.headers.get(WALLET_SESSION_HEADER)
         
-        if not password:
+        if not password and not session_token:
             return jsonify({'error': 'Senha é obrigatória'}), 400
         
         user_id = current_user['user_id']
@@ -101,12 +124,26 @@ def mint_nft(current_user):
         
         result = cur.fetchone()
         
-        if not result or not result[0]:
+        if not result or not result['wallet_address']:
             cur.close()
             conn.close()
             return jsonify({'error': 'Usuário não possui carteira'}), 404
         
-        wallet_address, encrypted_private_key, salt, current_nft_id = result
+        wallet_address = result['wallet_address']
+        
+        # Descriptografar chave privada uma única vez (cancelamento + mint)
+        try:
+            private_key = wallet_manager.unlock_private_key(
+                user_id,
+                result['encrypted_private_key'],
+                result['wallet_salt'],
+                password,
+                session_token
+            )
+        except ValueError as e:
+            cur.close()
+            conn.close()
+            return jsonify({'error': 'Senha incorreta' if password else str(e)}), 401
         
         # Verificar se há NFT anterior ativo
         previous_nft_id = nft_manager.get_active_nft(wallet_address)
@@ -116,25 +153,14 @@ def mint_nft(current_user):
             logger.info(f"🔄 Cancelando NFT anterior {previous_nft_id} para usuário {user_id}")
             
             try:
-                # Descriptografar chave privada
-                private_key = wallet_manager.decrypt_private_key(
-                    encrypted_private_key,
-                    password,
-                    salt
+                # Cancelar NFT anterior (o cancelamento é gravado quando a transação confirmar)
+                cancel_result = nft_manager.cancel_nft(
+                    previous_nft_id,
+                    private_key,
+                    context={'user_id': user_id, 'reason': 'Substituído por novo mint'}
                 )
                 
-                # Cancelar NFT anterior
-                cancel_result = nft_manager.cancel_nft(previous_nft_id, private_key)
-                
-                logger.info(f"✅ NFT {previous_nft_id} cancelado: {cancel_result['transaction_hash']}")
-                
-                # Registrar cancelamento no banco
-                cur.execute("""
-                    INSERT INTO nft_cancellations (user_id, old_nft_id, cancelled_at, transaction_hash)
-                    VALUES (%s, %s, NOW(), %s)
-                """, (user_id, previous_nft_id, cancel_result['transaction_hash']))
-                
-                conn.commit()
+                logger.info(f"📤 Cancelamento do NFT {previous_nft_id} enviado: {cancel_result['transaction_hash']}")
                 
             except Exception as e:
                 logger.error(f"❌ Erro ao cancelar NFT anterior: {str(e)}")
@@ -142,13 +168,6 @@ def mint_nft(current_user):
         
         # Mintar novo NFT
         try:
-            # Descriptografar chave privada
-            private_key = wallet_manager.decrypt_private_key(
-                encrypted_private_key,
-                password,
-                salt
-            )
-            
             # Adicionar informações do usuário aos metadados
             full_metadata = {
                 **metadata,
@@ -157,44 +176,38 @@ def mint_nft(current_user):
                 'previous_nft_id': previous_nft_id or 0
             }
             
-            # Mintar NFT
+            # Mintar NFT (o usuário é atualizado pelo tx_dispatcher quando a transação confirmar)
             mint_result = nft_manager.mint_identity_nft(
                 wallet_address,
                 full_metadata,
                 previous_nft_id or 0,
-                private_key
+                private_key,
+                context={'user_id': user_id}
             )
             
-            # Atualizar banco de dados
-            cur.execute("""
-                UPDATE users
-                SET nft_id = %s,
-                    nft_active = TRUE,
-                    nft_minted_at = NOW(),
-                    nft_transaction_hash = %s
-                WHERE id = %s
-            """, (mint_result['nft_id'], mint_result['transaction_hash'], user_id))
-            
-            conn.commit()
             cur.close()
             conn.close()
             
-            logger.info(f"✅ NFT {mint_result['nft_id']} mintado para usuário {user_id}")
+            logger.info(f"📤 Mint do NFT {mint_result['nft_id']} enviado para usuário {user_id}")
             
             return jsonify({
                 'status': 'success',
                 'nft_id': mint_result['nft_id'],
+                'tx_id': mint_result['tx_id'],
+                'tx_status': mint_result['status'],
                 'transaction_hash': mint_result['transaction_hash'],
                 'block_number': mint_result['block_number'],
                 'previous_nft_cancelled': previous_nft_id is not None,
                 'previous_nft_id': previous_nft_id
-            }), 201
+            }), 202
             
-        except ValueError:
+        except ValueError as e:
             cur.close()
             conn.close()
-            return jsonify({'error': 'Senha incorreta'}), 401
+            return jsonify({'error': 'Erro ao mintar NFT', 'details': str(e)}), 400
         
+    except CryptoPoolBusy:
+        raise
     except Exception as e:
         logger.error(f"❌ Erro ao mintar NFT: {str(e)}")
         return jsonify({'error': 'Erro ao mintar NFT', 'details': str(e)}), 500
@@ -207,7 +220,7 @@ def cancel_nft(current_user):
     
     Request Body:
         {
-            "password": "senha_do_usuario",
+            "password": "senha_do_usuario",  // dispensada com header X-Signing-Session
             "reason": "motivo_do_cancelamento"
         }
     
@@ -218,8 +231,9 @@ def cancel_nft(current_user):
         data = request.get_json()
         password = data.get('password')
         reason = data.get('reason', 'User requested cancellation')
+        session_token = request.headers.get(WALLET_SESSION_HEADER)
         
-        if not password:
+        if not password and not session_token:
             return jsonify({'error': 'Senha é obrigatória'}), 400
         
         user_id = current_user['user_id']
@@ -236,12 +250,12 @@ def cancel_nft(current_user):
         
         result = cur.fetchone()
         
-        if not result or not result[0]:
+        if not result or not result['wallet_address']:
             cur.close()
             conn.close()
             return jsonify({'error': 'Usuário não possui carteira'}), 404
         
-        wallet_address, encrypted_private_key, salt, nft_id = result
+        nft_id = result['nft_id']
         
         if not nft_id:
             cur.close()
@@ -250,44 +264,41 @@ def cancel_nft(current_user):
         
         # Descriptografar chave privada
         try:
-            private_key = wallet_manager.decrypt_private_key(
-                encrypted_private_key,
+            private_key = wallet_manager.unlock_private_key(
+                user_id,
+                result['encrypted_private_key'],
+                result['wallet_salt'],
                 password,
-                salt
+                session_token
             )
-        except ValueError:
+        except ValueError as e:
             cur.close()
             conn.close()
-            return jsonify({'error': 'Senha incorreta'}), 401
-        
-        # Cancelar NFT
-        cancel_result = nft_manager.cancel_nft(nft_id, private_key)
+            return jsonify({'error': 'Senha incorreta' if password else str(e)}), 401
         
-        # Atualizar banco de dados
-        cur.execute("""
-            UPDATE users
-            SET nft_active = FALSE
-            WHERE id = %s
-        """, (user_id,))
+        # Cancelar NFT (desativação e histórico são gravados quando a transação confirmar)
+        cancel_result = nft_manager.cancel_nft(
+            nft_id,
+            private_key,
+            context={'user_id': user_id, 'reason': reason}
+        )
         
-        cur.execute("""
-            INSERT INTO nft_cancellations (user_id, old_nft_id, cancelled_at, transaction_hash, reason)
-            VALUES (%s, %s, NOW(), %s, %s)
-        """, (user_id, nft_id, cancel_result['transaction_hash'], reason))
-        
-        conn.commit()
         cur.close()
         conn.close()
         
-        logger.info(f"✅ NFT {nft_id} cancelado para usuário {user_id}")
+        logger.info(f"📤 Cancelamento do NFT {nft_id} enviado para usuário {user_id}")
         
         return jsonify({
             'status': 'success',
             'nft_id': nft_id,
+            'tx_id': cancel_result['tx_id'],
+            'tx_status': cancel_result['status'],
             'transaction_hash': cancel_result['transaction_hash'],
             'block_number': cancel_result['block_number']
-        }), 200
+        }), 202
         
+    except CryptoPoolBusy:
+        raise
     except Exception as e:
         logger.error(f"❌ Erro ao cancelar NFT: {str(e)}")
         return jsonify({'error': 'Erro ao cancelar NFT', 'details': str(e)}), 500
@@ -331,22 +342,22 @@ def get_nft_history(current_user):
         history = []
         
         # Adicionar NFT atual
-        if current_nft and current_nft[0]:
+        if current_nft and current_nft['nft_id']:
             history.append({
-                'nft_id': current_nft[0],
-                'status': 'active' if current_nft[1] else 'cancelled',
-                'minted_at': current_nft[2].isoformat() if current_nft[2] else None,
-                'transaction_hash': current_nft[3]
+                'nft_id': current_nft['nft_id'],
+                'status': 'active' if current_nft['nft_active'] else 'cancelled',
+                'minted_at': current_nft['nft_minted_at'].isoformat() if current_nft['nft_minted_at'] else None,
+                'transaction_hash': current_nft['nft_transaction_hash']
             })
         
         # Adicionar NFTs cancelados
         for cancel in cancellations:
             history.append({
-                'nft_id': cancel[0],
+                'nft_id': cancel['old_nft_id'],
                 'status': 'cancelled',
-                'cancelled_at': cancel[1].isoformat() if cancel[1] else None,
-                'transaction_hash': cancel[2],
-                'reason': cancel[3]
+                'cancelled_at': cancel['cancelled_at'].isoformat() if cancel['cancelled_at'] else None,
+                'transaction_hash': cancel['transaction_hash'],
+                'reason': cancel['reason']
             })
         
         return jsonify({
@@ -358,3 +369,35 @@ def get_nft_history(current_user):
         logger.error(f"❌ Erro ao obter histórico de NFTs: {str(e)}")
         return jsonify({'error': 'Erro ao obter histórico', 'details': str(e)}), 500
 
+@nft_bp.route('/tx/<int:tx_id>', methods=['GET'])
+@token_required
+def get_transaction_status(current_user, tx_id):
+    """
+    Obtém o estado de uma transação enviada pelo mint/cancelamento
+    
+    Returns:
+        JSON com status (pending, submitted, confirmed, failed), hashes e bloco
+    """
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT wallet_address FROM users WHERE id = %s", (current_user['user_id'],))
+        user = cur.fetchone()
+        cur.close()
+        conn.close()
+        
+        tx_status = nft_manager.get_transaction_status(tx_id)
+        
+        # Só as transações assinadas pela carteira do próprio usuário
+        wallet_address = user['wallet_address'] if user else None
+        if not tx_status or not wallet_address or tx_status['from_address'].lower() != wallet_address.lower():
+            return jsonify({'error': 'Transação não encontrada'}), 404
+        
+        return jsonify({
+            'status': 'success',
+            'transaction': tx_status
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"❌ Erro ao obter status da transação: {str(e)}")
+        return jsonify({'error': 'Erro ao obter status da transação', 'details': str(e)}), 500
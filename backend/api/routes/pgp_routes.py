@@ -78,7 +78,7 @@ def import_pgp_key():
             return jsonify({'error': result['error']}), 400
         
         # Salvar no banco de dados
-        from ..database import get_db_connection
+        from ..utils.db import get_db_connection
         
         conn = get_db_connection()
         cur = conn.cursor()
@@ -122,7 +122,7 @@ def get_pgp_key():
         }
     """
     try:
-        from ..database import get_db_connection
+        from ..utils.db import get_db_connection
         
         conn = get_db_connection()
         cur = conn.cursor()
@@ -137,13 +137,13 @@ def get_pgp_key():
         cur.close()
         conn.close()
         
-        if not result or not result[0]:
+        if not result or not result['pgp_fingerprint']:
             return jsonify({'error': 'Chave PGP não encontrada'}), 404
         
         return jsonify({
-            'fingerprint': result[0],
-            'public_key': result[1],
-            'imported_at': result[2].isoformat() if result[2] else None
+            'fingerprint': result['pgp_fingerprint'],
+            'public_key': result['pgp_public_key'],
+            'imported_at': result['pgp_imported_at'].isoformat() if result['pgp_imported_at'] else None
         }), 200
         
     except Exception as e:
@@ -185,7 +185,7 @@ def sign_dual():
             return jsonify({'error': 'Parâmetros incompletos'}), 400
         
         # Verificar se o fingerprint pertence ao usuário
-        from ..database import get_db_connection
+        from ..utils.db import get_db_connection
         
         conn = get_db_connection()
         cur = conn.cursor()
@@ -198,18 +198,18 @@ def sign_dual():
         
         user_data = cur.fetchone()
         
-        if not user_data or not user_data[0]:
+        if not user_data or not user_data['pgp_fingerprint']:
             cur.close()
             conn.close()
             return jsonify({'error': 'Usuário não possui chave PGP importada'}), 400
         
-        if user_data[0].upper() != pgp_fingerprint.upper():
+        if user_data['pgp_fingerprint'].upper() != pgp_fingerprint.upper():
             cur.close()
             conn.close()
             return jsonify({'error': 'Fingerprint não corresponde ao usuário'}), 403
         
-        # Importar chave pública do usuário
-        import_result = import_public_key(user_data[1])
+        # Importar chave pública do usuário (pula a importação se já estiver no keyring)
+        import_result = import_public_key(user_data['pgp_public_key'], fingerprint=user_data['pgp_fingerprint'])
         
         if not import_result['success']:
             cur.close()
@@ -261,7 +261,7 @@ def sign_dual():
             request.headers.get('User-Agent', '')
         ))
         
-        log_id = cur.fetchone()[0]
+        log_id = cur.fetchone()['id']
         
         conn.commit()
         cur.close()
@@ -317,7 +317,7 @@ def verify_dual():
             return jsonify({'error': 'Parâmetros incompletos'}), 400
         
         # Buscar chave pública pelo fingerprint
-        from ..database import get_db_connection
+        from ..utils.db import get_db_connection
         
         conn = get_db_connection()
         cur = conn.cursor()
@@ -338,10 +338,11 @@ def verify_dual():
                 'reason': 'Chave PGP não encontrada no sistema'
             }), 404
         
-        user_id, public_key = user_data
+        user_id = user_data['id']
+        public_key = user_data['pgp_public_key']
         
-        # Importar chave pública
-        import_result = import_public_key(public_key)
+        # Importar chave pública (pula a importação se já estiver no keyring)
+        import_result = import_public_key(public_key, fingerprint=pgp_fingerprint)
         
         if not import_result['success']:
             cur.close()
@@ -382,7 +383,9 @@ def verify_dual():
                 'reason': 'Assinatura não encontrada na blockchain'
             }), 404
         
-        log_id, nft_id, tx_hash, timestamp = log_data
+        nft_id = log_data['nft_id']
+        tx_hash = log_data['blockchain_tx']
+        timestamp = log_data['created_at']
         
         # TODO: Verificar NFT ativo via IdentityNFT.isActive(nft_id)
         # Por enquanto, assumir ativo
@@ -4,11 +4,14 @@ Rotas de API para assinatura de documentos com suporte a failsafe
 
 from flask import Blueprint, request, jsonify
 import logging
-import hashlib
 from api.utils.wallet import wallet_manager
+from api.utils.crypto_pool import crypto_pool, CryptoPoolBusy, bcrypt_checkpw
 from api.utils.nft import nft_manager
+from api.utils.proof_index import find_proof
 from api.auth import token_required
 from api.utils.db import get_db_connection
+from api.utils.hash_utils import MultiHasher, hash_stream
+from werkzeug.formparser import parse_form_data
 
 logger = logging.getLogger(__name__)
 
@@ -69,18 +72,19 @@ def sign_document(current_user):
         wallet_address, encrypted_private_key, salt, nft_id, nft_active, password_hash, failsafe_hash, failsafe_configured = result
         
         # DETECTAR AUTOMATICAMENTE SE É FAILSAFE
-        import bcrypt
+        # As duas verificações bcrypt rodam em paralelo no pool de criptografia
         is_failsafe = False
+        normal_check = crypto_pool.submit(bcrypt_checkpw, password, password_hash)
         
         # Verificar se a senha é a senha de emergência
         if failsafe_configured and failsafe_hash:
-            if bcrypt.checkpw(password.encode('utf-8'), failsafe_hash.encode('utf-8')):
+            if crypto_pool.run(bcrypt_checkpw, password, failsafe_hash):
                 is_failsafe = True
                 logger.warning(f"🚨 SENHA DE EMERGÊNCIA DETECTADA para usuário {user_id}")
         
         # Se não é failsafe, verificar se é a senha normal
         if not is_failsafe:
-            if not bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8')):
+            if not normal_check.result():
                 cur.close()
                 conn.close()
                 return jsonify({'error': 'Senha incorreta'}), 401
@@ -140,6 +144,8 @@ def sign_document(current_user):
                     
                     logger.warning(f"🚨 NFT {nft_id} cancelado por failsafe: {cancel_result['transaction_hash']}")
                     
+                except CryptoPoolBusy:
+                    raise
                 except Exception as e:
                     logger.error(f"❌ Erro ao cancelar NFT no failsafe: {str(e)}")
             
@@ -183,23 +189,24 @@ def sign_document(current_user):
                 'message': 'Sincronize seu NFT antes de assinar'
             }), 403
         
-        # Assinar documento
+        # Assinar documento (chave descriptografada uma única vez para assinatura e prova)
         try:
+            private_key = wallet_manager.decrypt_private_key(
+                encrypted_private_key,
+                password,
+                salt
+            )
+            
             signature_data = wallet_manager.sign_message(
                 file_hash,
                 encrypted_private_key,
                 password,
-                salt
+                salt,
+                private_key=private_key
             )
             
             # Registrar prova na blockchain
             try:
-                private_key = wallet_manager.decrypt_private_key(
-                    encrypted_private_key,
-                    password,
-                    salt
-                )
-                
                 proof_url = document_url or f"ipfs://blocktrust/{file_hash}"
                 
                 proof_result = nft_manager.register_proof(
@@ -242,6 +249,8 @@ def sign_document(current_user):
             conn.close()
             return jsonify({'error': 'Senha incorreta'}), 401
         
+    except CryptoPoolBusy:
+        raise
     except Exception as e:
         logger.error(f"❌ Erro ao assinar documento: {str(e)}")
         return jsonify({'error': 'Erro ao assinar documento', 'details': str(e)}), 500
@@ -273,13 +282,14 @@ def verify_signature():
         # Verificar assinatura
         is_valid = wallet_manager.verify_signature(file_hash, signature, address)
         
-        # Verificar se está na blockchain
-        on_blockchain = nft_manager.verify_proof(file_hash)
-        
         # Verificar no banco de dados
         conn = get_db_connection()
         cur = conn.cursor()
         
+        # Verificar se está na blockchain (índice local de provas mantido pelo listener)
+        proof = find_proof(cur, file_hash)
+        on_blockchain = bool(proof and proof['valid'])
+        
         cur.execute("""
             SELECT u.email, ds.signed_at, ds.document_name, ds.failsafe
             FROM document_signatures ds
@@ -364,32 +374,84 @@ def get_signature_history(current_user):
 @token_required
 def hash_file(current_user):
     """
-    Gera hash SHA256 de um arquivo
+    Gera hash de um arquivo lendo o upload em streaming (memória constante)
     
-    Request Body:
-        {
-            "file_content": "conteúdo_do_arquivo_em_base64"
-        }
+    Formas de envio:
+        multipart/form-data: um ou mais campos de arquivo
+        application/octet-stream (ou outro tipo binário): o corpo é o arquivo
+        application/json (legado): {"file_content": "conteúdo_do_arquivo_em_base64"}
+            - o hash é calculado sobre o texto base64, como antes
+    
+    Query Params:
+        algorithms: Lista separada por vírgula entre sha256, sha3_256 e keccak256
+                    (default: sha256); todos são calculados em uma única passada
     
     Returns:
-        JSON com file_hash
+        JSON com file_hash (SHA-256), hashes por algoritmo e tamanho em bytes
     """
     try:
-        data = request.get_json()
-        file_content = data.get('file_content')
+        algorithms = [name.strip() for name in request.args.get('algorithms', 'sha256').split(',') if name.strip()]
+        if 'sha256' not in algorithms:
+            algorithms.insert(0, 'sha256')
+        
+        try:
+            MultiHasher(algorithms)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if request.is_json:
+            data = request.get_json()
+            file_content = data.get('file_content')
+            
+            if not file_content:
+                return jsonify({'error': 'Conteúdo do arquivo é obrigatório'}), 400
+            
+            hasher = MultiHasher(algorithms)
+            hasher.update(file_content.encode())
+            results = [{'hashes': hasher.hexdigests(), 'size': hasher.size}]
+        
+        elif request.mimetype == 'multipart/form-data':
+            # Cada arquivo do multipart vai direto para um MultiHasher (sem spool em disco)
+            hashers = []
+            
+            def stream_factory(total_content_length, content_type, filename, content_length=None):
+                hasher = MultiHasher(algorithms)
+                hashers.append((filename, hasher))
+                return hasher
+            
+            _, _, files = parse_form_data(request.environ, stream_factory=stream_factory)
+            
+            if not hashers:
+                return jsonify({'error': 'Nenhum arquivo enviado'}), 400
+            
+            results = [
+                {'filename': filename, 'hashes': hasher.hexdigests(), 'size': hasher.size}
+                for filename, hasher in hashers
+            ]
         
-        if not file_content:
-            return jsonify({'error': 'Conteúdo do arquivo é obrigatório'}), 400
+        else:
+            hashes, size = hash_stream(request.stream, algorithms)
+            
+            if size == 0:
+                return jsonify({'error': 'Conteúdo do arquivo é obrigatório'}), 400
+            
+            results = [{'hashes': hashes, 'size': size}]
         
-        # Gerar hash
-        file_hash = hashlib.sha256(file_content.encode()).hexdigest()
+        file_hash = results[0]['hashes']['sha256']
         
-        logger.info(f"✅ Hash gerado para usuário {current_user['user_id']}: {file_hash[:16]}...")
+        logger.info(f"✅ Hash gerado para usuário {current_user['user_id']}: {file_hash[:16]}... ({results[0]['size']} bytes)")
         
-        return jsonify({
+        response = {
             'status': 'success',
-            'file_hash': file_hash
-        }), 200
+            'file_hash': file_hash,
+            'hashes': results[0]['hashes'],
+            'size': results[0]['size']
+        }
+        
+        if len(results) > 1:
+            response['files'] = results
+        
+        return jsonify(response), 200
         
     except Exception as e:
         logger.error(f"❌ Erro ao gerar hash: {str(e)}")
@@ -5,6 +5,8 @@ Rotas de API para gerenciamento de carteiras proprietárias
 from flask import Blueprint, request, jsonify
 import logging
 from api.utils.wallet import wallet_manager
+from api.utils.signing_session import signing_sessions, WALLET_SESSION_HEADER
+from api.utils.crypto_pool import CryptoPoolBusy
 from api.auth import token_required
 from api.utils.db import get_db_connection
 
@@ -84,6 +86,8 @@ def initialize_wallet(current_user):
             'message': 'Carteira criada com sucesso'
         }), 201
         
+    except CryptoPoolBusy:
+        raise
     except Exception as e:
         import traceback
         error_traceback = traceback.format_exc()
@@ -131,6 +135,111 @@ def get_wallet_info(current_user):
         logger.error(f"❌ Erro ao obter informações da carteira: {str(e)}")
         return jsonify({'error': 'Erro ao obter carteira', 'details': str(e)}), 500
 
+@wallet_bp.route('/session', methods=['POST'])
+@token_required
+def open_signing_session(current_user):
+    """
+    Abre uma sessão de assinatura (opcional)
+    
+    A chave é descriptografada uma vez e guardada cifrada com o token até expirar;
+    as rotas de assinatura aceitam o token no header X-Signing-Session no
+    lugar da senha. Chaves no formato antigo são recriptografadas com o
+    custo atual do KDF aproveitando a senha informada.
+    
+    Request Body:
+        {
+            "password": "senha_do_usuario",
+            "ttl": 300  // opcional, em segundos (limitado por WALLET_SESSION_MAX_TTL)
+        }
+    
+    Returns:
+        JSON com session_token, expires_at, ttl
+    """
+    try:
+        data = request.get_json() or {}
+        password = data.get('password')
+        
+        if not password:
+            return jsonify({'error': 'Senha é obrigatória'}), 400
+        
+        user_id = current_user['user_id']
+        conn = get_db_connection()
+        cur = conn.cursor()
+        
+        cur.execute("""
+            SELECT encrypted_private_key, wallet_salt
+            FROM users
+            WHERE id = %s
+        """, (user_id,))
+        
+        result = cur.fetchone()
+        
+        if not result or not result['encrypted_private_key']:
+            cur.close()
+            conn.close()
+            return jsonify({'error': 'Usuário não possui carteira'}), 404
+        
+        try:
+            private_key = wallet_manager.decrypt_private_key(
+                result['encrypted_private_key'],
+                password,
+                result['wallet_salt']
+            )
+        except ValueError:
+            cur.close()
+            conn.close()
+            return jsonify({'error': 'Senha incorreta'}), 401
+        
+        if wallet_manager.needs_rewrap(result['encrypted_private_key']):
+            cur.execute("""
+                UPDATE users SET encrypted_private_key = %s WHERE id = %s
+            """, (wallet_manager.rewrap_private_key(private_key, password, result['wallet_salt']), user_id))
+            conn.commit()
+            logger.info(f"🔐 Chave da carteira do usuário {user_id} recriptografada com o custo atual do KDF")
+        
+        cur.close()
+        conn.close()
+        
+        try:
+            session = signing_sessions.open(user_id, private_key, data.get('ttl'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({'status': 'success', **session}), 201
+        
+    except CryptoPoolBusy:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Erro ao abrir sessão de assinatura: {str(e)}")
+        return jsonify({'error': 'Erro ao abrir sessão de assinatura', 'details': str(e)}), 500
+
+@wallet_bp.route('/session', methods=['DELETE'])
+@token_required
+def revoke_signing_session(current_user):
+    """
+    Revoga a sessão de assinatura do header X-Signing-Session
+    
+    Request Body (opcional):
+        {
+            "all": true  // revoga todas as sessões do usuário
+        }
+    
+    Returns:
+        JSON com revoked (número de sessões encerradas)
+    """
+    data = request.get_json(silent=True) or {}
+    session_token = request.headers.get(WALLET_SESSION_HEADER)
+    
+    if not session_token and not data.get('all'):
+        return jsonify({'error': f'Header {WALLET_SESSION_HEADER} ou "all": true é obrigatório'}), 400
+    
+    revoked = signing_sessions.revoke(
+        current_user['user_id'],
+        None if data.get('all') else session_token
+    )
+    
+    return jsonify({'status': 'success', 'revoked': revoked}), 200
+
 @wallet_bp.route('/sign', methods=['POST'])
 @token_required
 def sign_message(current_user):
@@ -140,7 +249,7 @@ def sign_message(current_user):
     Request Body:
         {
             "message": "mensagem_a_ser_assinada",
-            "password": "senha_do_usuario",
+            "password": "senha_do_usuario",  // dispensada com header X-Signing-Session
             "failsafe": false  // opcional, default false
         }
     
@@ -181,7 +290,9 @@ def sign_message(current_user):
             }), 200
         
         # Assinatura normal
-        if not password:
+        session_token = request.headers.get(WALLET_SESSION_HEADER)
+        
+        if not password and not session_token:
             return jsonify({'error': 'Senha é obrigatória'}), 400
         
         # Obter dados da carteira
@@ -199,18 +310,28 @@ def sign_message(current_user):
         cur.close()
         conn.close()
         
-        if not result or not result[0]:
+        if not result or not result['encrypted_private_key']:
             return jsonify({'error': 'Usuário não possui carteira'}), 404
         
-        encrypted_private_key, salt, address = result
+        encrypted_private_key = result['encrypted_private_key']
+        salt = result['wallet_salt']
         
         # Assinar mensagem
         try:
+            private_key = wallet_manager.unlock_private_key(
+                user_id,
+                encrypted_private_key,
+                salt,
+                password,
+                session_token
+            )
+            
             signature_data = wallet_manager.sign_message(
                 message,
                 encrypted_private_key,
                 password,
-                salt
+                salt,
+                private_key=private_key
             )
             
             logger.info(f"✅ Mensagem assinada por usuário {user_id}")
@@ -220,9 +341,11 @@ def sign_message(current_user):
                 **signature_data
             }), 200
             
-        except ValueError:
-            return jsonify({'error': 'Senha incorreta'}), 401
+        except ValueError as e:
+            return jsonify({'error': 'Senha incorreta' if password else str(e)}), 401
         
+    except CryptoPoolBusy:
+        raise
     except Exception as e:
         logger.error(f"❌ Erro ao assinar mensagem: {str(e)}")
         return jsonify({'error': 'Erro ao assinar mensagem', 'details': str(e)}), 500
@@ -5,13 +5,17 @@ Registra eventos importantes no banco de dados para auditoria
 
 import logging
 from datetime import datetime
-from api.utils.db import get_db_connection
+from api.utils.db import db_connection
+from api.utils.audit_writer import audit_writer
 
 logger = logging.getLogger(__name__)
 
 def log_audit_event(event_type, user_id, payload, status='success'):
     """
-    Registra evento de auditoria no banco de dados
+    Registra evento de auditoria (gravação assíncrona em lote)
+    
+    O evento entra na fila do audit_writer; a tabela audit_events é criada
+    uma vez por processo pelo writer (ou pelo init_db), não a cada evento.
     
     Args:
         event_type (str): Tipo do evento (ex: 'kyc_approved', 'nft_minted', 'failsafe_triggered')
@@ -20,43 +24,20 @@ def log_audit_event(event_type, user_id, payload, status='success'):
         status (str): Status do evento ('success', 'error', 'pending')
     
     Returns:
-        bool: True se salvou com sucesso, False caso contrário
+        bool: True se o evento foi aceito para gravação, False caso contrário
     """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Criar tabela de auditoria se não existir
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS audit_events (
-                id SERIAL PRIMARY KEY,
-                event_type VARCHAR(100) NOT NULL,
-                user_id INTEGER,
-                payload JSONB,
-                status VARCHAR(50) DEFAULT 'success',
-                created_at TIMESTAMP DEFAULT NOW()
-            )
-        """)
-        
-        # Criar índices para performance
-        cur.execute("""
-            CREATE INDEX IF NOT EXISTS idx_audit_events_type ON audit_events(event_type);
-            CREATE INDEX IF NOT EXISTS idx_audit_events_user_id ON audit_events(user_id);
-            CREATE INDEX IF NOT EXISTS idx_audit_events_created_at ON audit_events(created_at DESC);
-        """)
-        
-        # Inserir evento
-        cur.execute("""
-            INSERT INTO audit_events (event_type, user_id, payload, status)
-            VALUES (%s, %s, %s, %s)
-        """, (event_type, user_id, str(payload), status))
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+        accepted = audit_writer.enqueue(
+            'audit_events',
+            event_type=event_type,
+            user_id=user_id,
+            payload=payload,
+            status=status
+        )
         
-        logger.info(f"✅ Evento de auditoria registrado: {event_type} (user_id={user_id}, status={status})")
-        return True
+        if accepted:
+            logger.info(f"✅ Evento de auditoria registrado: {event_type} (user_id={user_id}, status={status})")
+        return accepted
         
     except Exception as e:
         logger.error(f"❌ Erro ao registrar evento de auditoria: {str(e)}")
@@ -165,29 +146,28 @@ def get_user_audit_log(user_id, limit=50):
         list: Lista de eventos de auditoria
     """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        with db_connection() as conn:
+            cur = conn.cursor()
         
-        cur.execute("""
-            SELECT id, event_type, payload, status, created_at
-            FROM audit_events
-            WHERE user_id = %s
-            ORDER BY created_at DESC
-            LIMIT %s
-        """, (user_id, limit))
+            cur.execute("""
+                SELECT id, event_type, payload, status, created_at
+                FROM audit_events
+                WHERE user_id = %s
+                ORDER BY created_at DESC
+                LIMIT %s
+            """, (user_id, limit))
         
-        events = []
-        for row in cur.fetchall():
-            events.append({
-                'id': row[0],
-                'event_type': row[1],
-                'payload': row[2],
-                'status': row[3],
-                'created_at': row[4].isoformat() if row[4] else None
-            })
+            events = []
+            for row in cur.fetchall():
+                events.append({
+                    'id': row[0],
+                    'event_type': row[1],
+                    'payload': row[2],
+                    'status': row[3],
+                    'created_at': row[4].isoformat() if row[4] else None
+                })
         
-        cur.close()
-        conn.close()
+            cur.close()
         
         return events
         
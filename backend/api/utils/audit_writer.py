@@ -0,0 +1,325 @@
+"""
+Módulo de Gravação Assíncrona de Auditoria
+Os eventos de auditoria (audit_events e audit_logs) entram em uma fila
+limitada em memória e uma thread por processo grava em lotes com INSERT
+de múltiplas linhas. A requisição não espera o banco: quando a fila enche
+ela espera no máximo AUDIT_ENQUEUE_TIMEOUT e então grava o evento em
+disco; lotes que falham por indisponibilidade do banco também vão para
+disco e são regravados quando o banco volta.
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import fcntl
+import logging
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import psycopg2
+from psycopg2.extras import Json, execute_values
+from sqlalchemy import exc as sa_exc
+from api.utils.db import db_connection
+from api.utils.fs_utils import ensure_private_dir
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))  # eventos aguardando gravação por processo
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', '500'))  # linhas por INSERT
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', '1'))  # segundos entre gravações com a fila parada
+AUDIT_ENQUEUE_TIMEOUT = float(os.getenv('AUDIT_ENQUEUE_TIMEOUT', '0.05'))  # espera máxima da requisição com a fila cheia
+AUDIT_SPILL_DIR = os.getenv('AUDIT_SPILL_DIR', os.path.join(tempfile.gettempdir(), 'blocktrust-audit'))  # eventos não gravados no banco
+AUDIT_REPLAY_INTERVAL = int(os.getenv('AUDIT_REPLAY_INTERVAL', '30'))  # segundos entre tentativas de regravar o disco
+
+# Colunas gravadas por tabela (created_at é o momento do evento, não da gravação)
+AUDIT_TABLES = {
+    'audit_events': ('event_type', 'user_id', 'payload', 'status', 'created_at'),
+    'audit_logs': ('user_id', 'role', 'action', 'endpoint', 'ip_address', 'user_agent', 'request_data', 'response_status', 'created_at')
+}
+AUDIT_JSON_COLUMNS = {'payload', 'request_data'}
+
+# Executado uma vez por processo pelo writer e também pelo init_db
+AUDIT_EVENTS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS audit_events (
+        id SERIAL PRIMARY KEY,
+        event_type VARCHAR(100) NOT NULL,
+        user_id INTEGER,
+        payload JSONB,
+        status VARCHAR(50) DEFAULT 'success',
+        created_at TIMESTAMP DEFAULT NOW()
+    );
+    CREATE INDEX IF NOT EXISTS idx_audit_events_type ON audit_events(event_type);
+    CREATE INDEX IF NOT EXISTS idx_audit_events_user_id ON audit_events(user_id);
+    CREATE INDEX IF NOT EXISTS idx_audit_events_created_at ON audit_events(created_at DESC);
+"""
+
+# Erros de conexão: o lote inteiro vai para o disco e é regravado depois
+_UNAVAILABLE_ERRORS = (
+    psycopg2.OperationalError, psycopg2.InterfaceError,
+    sa_exc.OperationalError, sa_exc.InterfaceError, sa_exc.TimeoutError
+)
+
+class AuditWriter:
+    """
+    Fila limitada de eventos de auditoria drenada por uma thread de gravação
+
+    A gravação é at-least-once: um arquivo de disco regravado com sucesso é
+    esvaziado logo após o commit, e uma queda entre os dois pode duplicar
+    linhas. Linhas recusadas pelo banco (tipo ou FK inválidos) são
+    descartadas individualmente para não travar o restante do lote.
+    """
+
+    def __init__(self, maxsize: int = AUDIT_QUEUE_SIZE, spill_dir: str = AUDIT_SPILL_DIR):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._spill_dir = spill_dir
+        self._spill_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._replayed_at = 0.0
+        self._worker = None
+        self._worker_pid = None
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'spilled': 0,
+            'replayed': 0,
+            'rejected': 0,
+            'lost': 0
+        }
+        atexit.register(self.flush)
+
+    def _record(self, key, value=1):
+        with self._lock:
+            self._stats[key] += value
+
+    def start_worker(self):
+        """Inicia a thread de gravação (uma por processo, inclusive após fork)"""
+        with self._lock:
+            if self._worker and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            self._worker = threading.Thread(target=self._run_worker, name='audit-writer', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def enqueue(self, table: str, **values) -> bool:
+        """
+        Enfileira uma linha de auditoria
+
+        Args:
+            table: 'audit_events' ou 'audit_logs'
+            **values: colunas da tabela (ver AUDIT_TABLES)
+
+        Returns:
+            True se o evento foi aceito (na fila ou em disco)
+        """
+        if table not in AUDIT_TABLES:
+            raise ValueError(f"Tabela de auditoria desconhecida: {table}")
+
+        row = {column: values.get(column) for column in AUDIT_TABLES[table]}
+        if row['created_at'] is None:
+            row['created_at'] = datetime.now(timezone.utc).isoformat()
+        item = (table, row)
+
+        self.start_worker()
+        try:
+            self._queue.put(item, timeout=AUDIT_ENQUEUE_TIMEOUT)
+        except queue.Full:
+            logger.warning("⚠️ Fila de auditoria cheia, evento gravado em disco")
+            return self._spill([item])
+
+        self._record('enqueued')
+        return True
+
+    def _run_worker(self):
+        logger.info(f"🧵 Gravação de auditoria iniciada (lotes de até {AUDIT_BATCH_SIZE} eventos)")
+        while True:
+            batch = self._drain(AUDIT_FLUSH_INTERVAL)
+            try:
+                if batch:
+                    self._write_or_spill(batch)
+                if time.time() - self._replayed_at >= AUDIT_REPLAY_INTERVAL:
+                    self._replayed_at = time.time()
+                    self.replay_spilled()
+            except Exception as e:
+                logger.error(f"❌ Erro na gravação de auditoria: {str(e)}")
+
+    def _drain(self, timeout: float) -> List:
+        # Espera o primeiro evento e leva junto o que já estiver na fila
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < AUDIT_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """Grava tudo o que está na fila agora (usado no encerramento do processo)"""
+        while True:
+            batch = self._drain(0)
+            if not batch:
+                return
+            self._write_or_spill(batch)
+
+    def _write_or_spill(self, batch: List):
+        try:
+            self._write(batch)
+        except _UNAVAILABLE_ERRORS as e:
+            logger.warning(f"⚠️ Banco indisponível para auditoria, {len(batch)} evento(s) gravados em disco: {str(e)}")
+            self._spill(batch)
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar lote de auditoria: {str(e)}")
+            self._spill(batch)
+        else:
+            self._record('written', len(batch))
+            self._record('batches')
+
+    def _write(self, batch: List):
+        """Grava um lote em uma transação, com um INSERT de múltiplas linhas por tabela"""
+        by_table: Dict[str, List] = {}
+        for table, row in batch:
+            by_table.setdefault(table, []).append(row)
+
+        with db_connection() as conn:
+            cur = conn.cursor()
+            if not self._schema_ready:
+                cur.execute(AUDIT_EVENTS_SCHEMA)
+            for table, rows in by_table.items():
+                self._insert(cur, table, rows)
+            conn.commit()
+            cur.close()
+
+        self._schema_ready = True
+
+    def _insert(self, cur, table: str, rows: List[Dict]):
+        columns = AUDIT_TABLES[table]
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s"
+        # created_at chega com fuso; a conversão para TIMESTAMP usa o fuso da sessão, como NOW()
+        template = '(' + ', '.join(['%s'] * (len(columns) - 1)) + ', %s::timestamptz)'
+        values = [self._to_values(columns, row) for row in rows]
+
+        cur.execute("SAVEPOINT audit_batch")
+        try:
+            execute_values(cur, sql, values, template=template, page_size=AUDIT_BATCH_SIZE)
+            cur.execute("RELEASE SAVEPOINT audit_batch")
+            return
+        except _UNAVAILABLE_ERRORS:
+            raise
+        except psycopg2.DatabaseError as e:
+            cur.execute("ROLLBACK TO SAVEPOINT audit_batch")
+            logger.warning(f"⚠️ Lote de {table} recusado, gravando linha a linha: {str(e)}")
+
+        for row, value in zip(rows, values):
+            cur.execute("SAVEPOINT audit_row")
+            try:
+                execute_values(cur, sql, [value], template=template)
+                cur.execute("RELEASE SAVEPOINT audit_row")
+            except _UNAVAILABLE_ERRORS:
+                raise
+            except psycopg2.DatabaseError as e:
+                cur.execute("ROLLBACK TO SAVEPOINT audit_row")
+                self._record('rejected')
+                logger.error(f"❌ Evento de auditoria descartado ({table}): {str(e)} | {json.dumps(row, default=str)}")
+
+    @staticmethod
+    def _to_values(columns, row: Dict):
+        values = []
+        for column in columns:
+            value = row.get(column)
+            if column in AUDIT_JSON_COLUMNS and isinstance(value, (dict, list)):
+                value = Json(value, dumps=lambda obj: json.dumps(obj, default=str))
+            values.append(value)
+        return tuple(values)
+
+    # Disco
+
+    def _spill_path(self) -> str:
+        return os.path.join(self._spill_dir, f'audit-{os.getpid()}.jsonl')
+
+    def _spill(self, batch: List) -> bool:
+        """Acrescenta eventos ao arquivo deste processo (uma linha JSON por evento, modo 0600)"""
+        lines = ''.join(json.dumps({'table': table, 'row': row}, default=str) + '\n' for table, row in batch)
+        try:
+            ensure_private_dir(self._spill_dir)
+            with self._spill_lock:
+                fd = os.open(self._spill_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+                with os.fdopen(fd, 'a', encoding='utf-8') as f:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    f.write(lines)
+                    f.flush()
+                    os.fsync(f.fileno())
+        except OSError as e:
+            self._record('lost', len(batch))
+            logger.error(f"❌ Falha ao gravar auditoria em disco, {len(batch)} evento(s) perdidos: {str(e)}")
+            return False
+
+        self._record('spilled', len(batch))
+        return True
+
+    def replay_spilled(self) -> int:
+        """
+        Regrava no banco os eventos guardados em disco (de qualquer processo)
+
+        Cada arquivo é lido e esvaziado com lock exclusivo, então eventos
+        acrescentados durante a regravação esperam e não se perdem.
+
+        Returns:
+            Número de eventos regravados
+        """
+        if not os.path.isdir(self._spill_dir):
+            return 0
+
+        # Arquivos em um diretório de outro usuário poderiam injetar eventos falsos
+        try:
+            ensure_private_dir(self._spill_dir)
+        except OSError as e:
+            logger.error(f"❌ Diretório de auditoria em disco recusado: {str(e)}")
+            return 0
+
+        replayed = 0
+        for name in sorted(os.listdir(self._spill_dir)):
+            path = os.path.join(self._spill_dir, name)
+            if not name.endswith('.jsonl') or os.path.getsize(path) == 0:
+                continue
+
+            with open(path, 'r+', encoding='utf-8') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                batch = []
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        batch.append((entry['table'], entry['row']))
+                    except (ValueError, KeyError):
+                        logger.error(f"❌ Linha inválida no arquivo de auditoria {name}: {line[:200]}")
+
+                # Uma transação por arquivo: só esvazia depois do commit
+                if batch:
+                    self._write(batch)
+                f.truncate(0)
+
+            replayed += len(batch)
+            self._record('replayed', len(batch))
+            logger.info(f"✅ {len(batch)} evento(s) de auditoria regravados a partir de {name}")
+
+        return replayed
+
+    def get_stats(self) -> Dict:
+        """Profundidade da fila e contadores de gravação"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        stats['max_queue'] = self._queue.maxsize
+        return stats
+
+# Instância global
+audit_writer = AuditWriter()
@@ -0,0 +1,192 @@
+"""
+Módulo de Execução de Criptografia
+Executa bcrypt e PBKDF2 (trabalho de CPU) em um pool de processos limitado,
+fora da thread que atende a requisição. Uma rajada de logins fica na fila
+deste pool em vez de ocupar a CPU do worker do gunicorn, e quando a fila
+enche as novas requisições recebem 503 em vez de esperar indefinidamente.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+CRYPTO_POOL_WORKERS = int(os.getenv('CRYPTO_POOL_WORKERS', str(os.cpu_count() or 1)))  # processos do pool (0 = executa na própria thread)
+CRYPTO_POOL_MAX_QUEUE = int(os.getenv('CRYPTO_POOL_MAX_QUEUE', '64'))  # tarefas aguardando além das em execução
+CRYPTO_POOL_QUEUE_TIMEOUT = float(os.getenv('CRYPTO_POOL_QUEUE_TIMEOUT', '5'))  # segundos esperando vaga na fila antes de recusar
+
+class CryptoPoolBusy(Exception):
+    """Fila do pool de criptografia cheia"""
+
+# Funções executadas nos processos do pool (precisam ser de nível de módulo)
+
+def _timed(fn, submitted_at, *args):
+    started_at = time.time()
+    return fn(*args), started_at - submitted_at, time.time() - started_at
+
+def bcrypt_checkpw(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+def bcrypt_hashpw(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+def pbkdf2_sha256(password: str, salt: bytes, iterations: int, length: int) -> bytes:
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=length, salt=salt, iterations=iterations)
+    return kdf.derive(password.encode())
+
+class CryptoExecutor:
+    """
+    Pool de processos para hashing de senhas e derivação de chaves
+
+    O número de tarefas admitidas (em execução + na fila) é limitado por um
+    semáforo; submit() espera até CRYPTO_POOL_QUEUE_TIMEOUT por uma vaga e
+    então levanta CryptoPoolBusy. Os processos usam spawn, pois o processo
+    da API tem threads (listener, outbox, ancoragem) e fork com threads
+    ativas pode herdar locks presos.
+    """
+
+    def __init__(self, workers: int = CRYPTO_POOL_WORKERS, max_queue: int = CRYPTO_POOL_MAX_QUEUE):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + max_queue)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'rejected': 0,
+            'failed': 0,
+            'in_flight': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'run_time_total': 0.0
+        }
+
+    def _get_executor(self):
+        # Um pool por processo (o gunicorn pode fazer fork depois do import)
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._executor_pid = os.getpid()
+                logger.info(f"🧮 Pool de criptografia iniciado com {self.workers} processo(s)")
+            return self._executor
+
+    def _reset_executor(self):
+        # Um processo do pool morreu: o próximo submit recria o pool
+        with self._lock:
+            self._executor = None
+        logger.error("❌ Pool de criptografia quebrado, será recriado")
+
+    def _record(self, key, value=1):
+        with self._lock:
+            self._stats[key] += value
+
+    def submit(self, fn, *args) -> Future:
+        """
+        Envia uma função de criptografia para o pool
+
+        Returns:
+            concurrent.futures.Future com o resultado de fn(*args)
+
+        Raises:
+            CryptoPoolBusy: se a fila continuar cheia após CRYPTO_POOL_QUEUE_TIMEOUT
+        """
+        if not self._slots.acquire(timeout=CRYPTO_POOL_QUEUE_TIMEOUT):
+            self._record('rejected')
+            logger.warning("⚠️ Pool de criptografia cheio, requisição recusada")
+            raise CryptoPoolBusy("Servidor ocupado processando criptografia, tente novamente")
+
+        self._record('submitted')
+        self._record('in_flight')
+        result = Future()
+
+        def finish(inner: Future):
+            # Métricas e vaga liberadas antes de acordar quem aguarda o resultado
+            self._record('in_flight', -1)
+            self._slots.release()
+            try:
+                value, wait_time, run_time = inner.result()
+            except Exception as e:
+                self._record('failed')
+                if isinstance(e, BrokenProcessPool):
+                    self._reset_executor()
+                result.set_exception(e)
+            else:
+                with self._lock:
+                    self._stats['completed'] += 1
+                    self._stats['wait_time_total'] += wait_time
+                    self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+                    self._stats['run_time_total'] += run_time
+                result.set_result(value)
+
+        try:
+            if self.workers <= 0:
+                inner = Future()
+                inner.set_result(_timed(fn, time.time(), *args))
+            else:
+                inner = self._get_executor().submit(_timed, fn, time.time(), *args)
+        except Exception as e:
+            inner = Future()
+            inner.set_exception(e)
+
+        inner.add_done_callback(finish)
+        return result
+
+    def run(self, fn, *args):
+        """Executa fn(*args) no pool e aguarda o resultado"""
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn, *args):
+        """Versão para código asyncio (listener, webhooks assíncronos)"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def checkpw(self, password: str, hashed: str) -> bool:
+        """bcrypt.checkpw no pool"""
+        return self.run(bcrypt_checkpw, password, hashed)
+
+    def hashpw(self, password: str) -> str:
+        """bcrypt.hashpw (salt novo) no pool; retorna o hash em texto"""
+        return self.run(bcrypt_hashpw, password)
+
+    def derive_key(self, password: str, salt: bytes, iterations: int, length: int = 32) -> bytes:
+        """PBKDF2-HMAC-SHA256 no pool; retorna os bytes derivados"""
+        return self.run(pbkdf2_sha256, password, salt, iterations, length)
+
+    def get_stats(self) -> Dict:
+        """Profundidade da fila e tempos de espera/execução"""
+        with self._lock:
+            stats = dict(self._stats)
+
+        completed = stats['completed'] or 1
+        return {
+            'workers': self.workers,
+            'in_flight': stats['in_flight'],
+            'queued': max(stats['in_flight'] - max(self.workers, 1), 0),
+            'max_queue': CRYPTO_POOL_MAX_QUEUE,
+            'submitted': stats['submitted'],
+            'completed': stats['completed'],
+            'failed': stats['failed'],
+            'rejected': stats['rejected'],
+            'avg_wait_ms': round(stats['wait_time_total'] / completed * 1000, 2),
+            'max_wait_ms': round(stats['wait_time_max'] * 1000, 2),
+            'avg_run_ms': round(stats['run_time_total'] / completed * 1000, 2)
+        }
+
+# Instância global
+crypto_pool = CryptoExecutor()
@@ -1,9 +1,16 @@
 import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from dotenv import load_dotenv
 from .db_engine import test_connection, engine
 
+logger = logging.getLogger(__name__)
+
 # Carregar variáveis de ambiente do arquivo .env
 load_dotenv()
 
@@ -17,8 +24,122 @@ if DATABASE_URL and '+psycopg2' in DATABASE_URL:
 # Testar conexão ao importar o módulo
 test_connection()
 
+# Métricas de checkout do pool (por processo)
+_pool_metrics_lock = threading.Lock()
+_pool_metrics = {
+    'checkouts': 0,
+    'checkout_timeouts': 0,
+    'checkout_wait_ms_total': 0.0,
+    'checkout_wait_ms_max': 0.0
+}
+
+class PooledConnection:
+    """
+    Conexão psycopg2 emprestada do pool do SQLAlchemy (api.utils.db_engine.engine)
+
+    Mantém a interface de uma conexão psycopg2 comum: cursor() usa RealDictCursor
+    por padrão e close() devolve a conexão ao pool em vez de encerrá-la.
+    Também pode ser usada como context manager.
+    """
+
+    def __init__(self, pool_connection):
+        self._pool_connection = pool_connection
+
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault('cursor_factory', RealDictCursor)
+        return self._pool_connection.cursor(*args, **kwargs)
+
+    def close(self):
+        """Devolve a conexão ao pool (o pool faz rollback do que não foi commitado)"""
+        if self._pool_connection is not None:
+            self._pool_connection.close()
+            self._pool_connection = None
+
+    @property
+    def closed(self):
+        return self._pool_connection is None
+
+    def __getattr__(self, name):
+        if self._pool_connection is None:
+            raise psycopg2.InterfaceError('connection already returned to pool')
+        return getattr(self._pool_connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self._pool_connection is not None:
+            try:
+                self._pool_connection.rollback()
+            except Exception:
+                pass
+        self.close()
+        return False
+
 def get_db_connection():
-    return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    """
+    Obtém uma conexão do pool compartilhado do processo
+
+    A conexão deve ser devolvida com close() (ou usando db_connection()).
+
+    Raises:
+        sqlalchemy.exc.TimeoutError: se nenhuma conexão ficar livre em DB_POOL_TIMEOUT segundos
+    """
+    started = time.monotonic()
+    try:
+        pool_connection = engine.raw_connection()
+    except PoolTimeoutError:
+        with _pool_metrics_lock:
+            _pool_metrics['checkout_timeouts'] += 1
+        logger.error("❌ Timeout ao obter conexão do pool do banco de dados")
+        raise
+
+    wait_ms = (time.monotonic() - started) * 1000
+    with _pool_metrics_lock:
+        _pool_metrics['checkouts'] += 1
+        _pool_metrics['checkout_wait_ms_total'] += wait_ms
+        _pool_metrics['checkout_wait_ms_max'] = max(_pool_metrics['checkout_wait_ms_max'], wait_ms)
+
+    return PooledConnection(pool_connection)
+
+@contextmanager
+def db_connection():
+    """
+    Context manager para checkout/devolução de uma conexão do pool
+
+    Exemplo:
+        with db_connection() as conn:
+            cur = conn.cursor()
+            ...
+            conn.commit()
+    """
+    conn = get_db_connection()
+    with conn:
+        yield conn
+
+def get_pool_stats():
+    """
+    Retorna estado e métricas do pool de conexões deste processo
+
+    Returns:
+        dict: tamanho, conexões em uso, checkouts, timeouts e tempos de espera
+    """
+    pool = engine.pool
+    with _pool_metrics_lock:
+        metrics = dict(_pool_metrics)
+
+    checkouts = metrics['checkouts']
+    return {
+        'pid': os.getpid(),
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': pool.overflow(),
+        'checkouts': checkouts,
+        'checkout_timeouts': metrics['checkout_timeouts'],
+        'checkout_wait_ms_avg': round(metrics['checkout_wait_ms_total'] / checkouts, 3) if checkouts else 0.0,
+        'checkout_wait_ms_max': round(metrics['checkout_wait_ms_max'], 3)
+    }
 
 def init_db():
     conn = get_db_connection()
@@ -134,14 +255,39 @@ def init_db():
         )
     ''')
     
+    # Ancoragem em lote: raiz de Merkle por lote e prova de inclusão por registro
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS document_batches (
+            id SERIAL PRIMARY KEY,
+            merkle_root VARCHAR(66) NOT NULL,
+            leaf_count INTEGER NOT NULL,
+            tx_id INTEGER,
+            tx_hash VARCHAR(66),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cur.execute('''
+        ALTER TABLE document_registrations
+        ADD COLUMN IF NOT EXISTS anchor_status VARCHAR(20),
+        ADD COLUMN IF NOT EXISTS batch_id INTEGER REFERENCES document_batches(id),
+        ADD COLUMN IF NOT EXISTS leaf_index INTEGER,
+        ADD COLUMN IF NOT EXISTS merkle_proof JSONB
+    ''')
+    
     # Criar índices para document_registrations
     try:
         cur.execute('CREATE INDEX IF NOT EXISTS idx_doc_file_hash ON document_registrations(file_hash)')
         cur.execute('CREATE INDEX IF NOT EXISTS idx_doc_user_id ON document_registrations(user_id)')
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_doc_anchor_queued ON document_registrations(id) WHERE anchor_status = 'queued'")
     except Exception as e:
         # Ignorar se os índices já existirem
         pass
     
+    # Auditoria: mesmo DDL que o audit_writer executa uma vez por processo
+    from api.utils.audit_writer import AUDIT_EVENTS_SCHEMA
+    cur.execute(AUDIT_EVENTS_SCHEMA)
+    
     conn.commit()
     cur.close()
     conn.close()
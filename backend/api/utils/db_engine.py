@@ -8,16 +8,36 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Tamanho do pool de conexões (por processo/worker do gunicorn)
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # segundos aguardando uma conexão livre
+
 # Criar engine com pool_pre_ping e pool_recycle conforme recomendação do Render
 engine = create_engine(
-    DATABASE_URL, 
+    DATABASE_URL,
     pool_pre_ping=True,  # Testa conexão antes de usar (evita conexões mortas)
-    pool_recycle=3600    # Recicla conexões a cada 1 hora (evita timeout do Render)
+    pool_recycle=3600,   # Recicla conexões a cada 1 hora (evita timeout do Render)
+    pool_size=DB_POOL_MIN_SIZE,
+    max_overflow=max(DB_POOL_MAX_SIZE - DB_POOL_MIN_SIZE, 0),
+    pool_timeout=DB_POOL_TIMEOUT
 )
 
 # Criar SessionLocal para uso com SQLAlchemy ORM
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _reset_pool_after_fork():
+    """
+    Descarta as conexões herdadas do processo pai após um fork (workers do gunicorn).
+
+    As conexões do pai não são fechadas (close=False) para não derrubar
+    o socket que o processo pai ainda está usando.
+    """
+    engine.dispose(close=False)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
 def test_connection():
     """
     Testa a conexão com o banco de dados.
@@ -37,4 +57,3 @@ def get_session():
     Retorna uma nova sessão do SQLAlchemy.
     """
     return SessionLocal()
-
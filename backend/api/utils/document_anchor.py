@@ -0,0 +1,285 @@
+"""
+Módulo de Ancoragem em Lote de Documentos
+Agrupa os hashes registrados em /api/document/register em janelas de tempo
+ou tamanho e ancora uma única raiz de Merkle no ProofRegistry por lote.
+Cada registro recebe sua prova de inclusão, verificada localmente.
+"""
+
+import os
+import logging
+import threading
+from typing import Dict, List, Optional
+from psycopg2.extras import Json, execute_values
+from api.utils.db import get_db_connection
+from api.utils.merkle import build_tree, get_root, get_proof, verify_proof
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+DOCUMENT_ANCHOR_MODE = os.getenv('DOCUMENT_ANCHOR_MODE', 'direct')  # direct (uma tx por documento) ou batch
+DOCUMENT_BATCH_INTERVAL = int(os.getenv('DOCUMENT_BATCH_INTERVAL', '60'))  # segundos entre lotes
+DOCUMENT_BATCH_MAX_SIZE = int(os.getenv('DOCUMENT_BATCH_MAX_SIZE', '5000'))  # documentos por raiz
+DOCUMENT_ANCHOR_URGENCY = os.getenv('DOCUMENT_ANCHOR_URGENCY', 'slow')  # nível de taxa do fee_oracle para as raízes
+DEPLOYER_PRIVATE_KEY = os.getenv('DEPLOYER_PRIVATE_KEY')
+
+def batch_mode_enabled() -> bool:
+    """Indica se os registros de documentos devem ser ancorados em lote"""
+    return DOCUMENT_ANCHOR_MODE == 'batch'
+
+class DocumentBatcher:
+    """
+    Ancora em lote os documentos com anchor_status = 'queued'
+
+    Uma thread por processo acorda a cada DOCUMENT_BATCH_INTERVAL segundos
+    (ou antes, quando DOCUMENT_BATCH_MAX_SIZE registros foram enfileirados
+    neste processo) e reivindica os registros pendentes com SKIP LOCKED,
+    então processos diferentes nunca ancoram o mesmo documento duas vezes.
+    A raiz é enviada pelo tx_dispatcher com a chave do deployer.
+    """
+
+    def __init__(self):
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._worker = None
+        self._worker_pid = None
+
+    def notify_queued(self, count: int = 1):
+        """Avisa que registros foram enfileirados; dispara o lote ao atingir o tamanho máximo"""
+        self.start_worker()
+        with self._lock:
+            self._queued += count
+            if self._queued >= DOCUMENT_BATCH_MAX_SIZE:
+                self._wake.set()
+
+    def start_worker(self):
+        """Inicia a thread de ancoragem (uma por processo, inclusive após fork)"""
+        with self._lock:
+            if self._worker and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            self._worker = threading.Thread(target=self._run_worker, name='document-batcher', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def _run_worker(self):
+        logger.info(f"🧵 Ancoragem em lote iniciada (janela de {DOCUMENT_BATCH_INTERVAL}s ou {DOCUMENT_BATCH_MAX_SIZE} documentos)")
+        while True:
+            self._wake.wait(DOCUMENT_BATCH_INTERVAL)
+            self._wake.clear()
+            with self._lock:
+                self._queued = 0
+
+            try:
+                # Lotes cheios indicam que ainda há fila: continuar sem esperar a janela
+                while self.anchor_pending() >= DOCUMENT_BATCH_MAX_SIZE:
+                    pass
+            except Exception as e:
+                logger.error(f"❌ Erro ao ancorar lote de documentos: {str(e)}")
+
+    def anchor_pending(self) -> int:
+        """
+        Ancora um lote com os registros pendentes
+
+        Os registros são reivindicados e recebem lote e prova em uma
+        transação curta; a raiz só é enviada depois do commit, com a chave
+        de idempotência anchor_batch:{batch_id}, para que o envio (RPC e
+        nonce) não aconteça com os registros bloqueados. Lotes gravados
+        cujo envio falhou são reenviados no início da chamada seguinte.
+
+        Returns:
+            Número de documentos ancorados no lote
+        """
+        from api.utils.nft import nft_manager
+
+        if not nft_manager.proof_registry_contract:
+            raise ValueError("Contrato de ProofRegistry não configurado")
+
+        if not DEPLOYER_PRIVATE_KEY:
+            raise ValueError("DEPLOYER_PRIVATE_KEY não configurada para ancoragem em lote")
+
+        self._submit_unsent()
+
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+
+            cur.execute("""
+                SELECT id, file_hash
+                FROM document_registrations
+                WHERE anchor_status = 'queued'
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (DOCUMENT_BATCH_MAX_SIZE,))
+            rows = cur.fetchall()
+
+            if not rows:
+                conn.commit()
+                cur.close()
+                return 0
+
+            layers = build_tree([row['file_hash'] for row in rows])
+            merkle_root = get_root(layers)
+
+            cur.execute("""
+                INSERT INTO document_batches (merkle_root, leaf_count, created_at)
+                VALUES (%s, %s, NOW())
+                RETURNING id
+            """, (merkle_root, len(rows)))
+            batch_id = cur.fetchone()['id']
+
+            execute_values(
+                cur,
+                """
+                UPDATE document_registrations AS dr
+                SET batch_id = v.batch_id, leaf_index = v.leaf_index, merkle_proof = v.merkle_proof,
+                    anchor_status = 'batched'
+                FROM (VALUES %s) AS v (id, leaf_index, merkle_proof, batch_id)
+                WHERE dr.id = v.id
+                """,
+                [
+                    (row['id'], index, Json(get_proof(layers, index)), batch_id)
+                    for index, row in enumerate(rows)
+                ],
+                template="(%s, %s, %s::JSONB, %s)",
+                page_size=1000
+            )
+
+            conn.commit()
+            cur.close()
+
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        tx = self._submit_batch(batch_id, merkle_root)
+
+        logger.info(f"🌳 Lote {batch_id}: {len(rows)} documentos ancorados na raiz {merkle_root} ({tx['transaction_hash']})")
+        return len(rows)
+
+    def _submit_unsent(self):
+        """Reenvia as raízes de lotes gravados sem transação (envio falhou ou o processo caiu)"""
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            # Lotes recentes podem estar sendo enviados pelo processo que os criou
+            cur.execute("""
+                SELECT id, merkle_root
+                FROM document_batches
+                WHERE tx_id IS NULL AND created_at < NOW() - make_interval(secs => %s)
+                ORDER BY id
+            """, (DOCUMENT_BATCH_INTERVAL,))
+            batches = cur.fetchall()
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+
+        for batch in batches:
+            try:
+                tx = self._submit_batch(batch['id'], batch['merkle_root'])
+                logger.info(f"🌳 Raiz do lote {batch['id']} reenviada ({tx['transaction_hash']})")
+            except Exception as e:
+                logger.error(f"❌ Erro ao reenviar a raiz do lote {batch['id']}: {str(e)}")
+
+    def _submit_batch(self, batch_id: int, merkle_root: str) -> Dict:
+        """Envia a raiz de um lote (uma única vez por lote) e grava a transação no lote e nos registros"""
+        from api.utils.nft import nft_manager
+
+        tx = nft_manager.tx_dispatcher.submit(
+            'anchor_batch',
+            nft_manager.proof_registry_contract.functions.registerProof(
+                merkle_root,
+                f"merkle://blocktrust/batch/{batch_id}"
+            ),
+            DEPLOYER_PRIVATE_KEY,
+            gas=200000,
+            urgency=DOCUMENT_ANCHOR_URGENCY,
+            idempotency_key=f"anchor_batch:{batch_id}",
+            context={'batch_id': batch_id}
+        )
+
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE document_batches SET tx_id = %s, tx_hash = %s WHERE id = %s
+            """, (tx['tx_id'], tx['transaction_hash'], batch_id))
+            cur.execute("""
+                UPDATE document_registrations SET blockchain_tx = %s WHERE batch_id = %s
+            """, (tx['transaction_hash'], batch_id))
+            conn.commit()
+            cur.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        return tx
+
+def complete_anchor_batch(cur, row, status: str, receipt: Optional[Dict]):
+    """
+    Conclusão de anchor_batch (ver TxDispatcher.register_completion)
+
+    Se a raiz não foi ancorada (revertida ou nunca aceita), os documentos
+    do lote voltam para a fila e entram em um lote novo, com outra chave de
+    idempotência; o lote antigo fica apenas como histórico.
+    """
+    if status == 'confirmed':
+        return
+
+    batch_id = row['context']['batch_id']
+    cur.execute("""
+        UPDATE document_registrations
+        SET anchor_status = 'queued', batch_id = NULL, leaf_index = NULL, merkle_proof = NULL, blockchain_tx = NULL
+        WHERE batch_id = %s
+    """, (batch_id,))
+    logger.error(f"❌ Raiz do lote {batch_id} não ancorada (tx_id {row['id']}): {cur.rowcount} documentos de volta à fila")
+
+def find_batched_registrations(cur, doc_hashes: List[str]) -> Dict[str, Dict]:
+    """
+    Busca o registro em lote mais recente de vários documentos e verifica as provas localmente
+
+    Returns:
+        Dict hash -> registro, prova e estado da ancoragem, apenas para os
+        documentos registrados em lote
+    """
+    if not doc_hashes:
+        return {}
+
+    cur.execute("""
+        SELECT DISTINCT ON (dr.file_hash)
+            dr.file_hash, dr.batch_id, dr.leaf_index, dr.merkle_proof, dr.anchor_status,
+            b.merkle_root, COALESCE(t.tx_hash, b.tx_hash) AS tx_hash, t.status AS tx_status, t.block_number
+        FROM document_registrations dr
+        LEFT JOIN document_batches b ON b.id = dr.batch_id
+        LEFT JOIN tx_outbox t ON t.id = b.tx_id
+        WHERE dr.file_hash = ANY(%s) AND dr.anchor_status IN ('queued', 'batched')
+        ORDER BY dr.file_hash, dr.anchor_status = 'batched' DESC, dr.registered_at DESC
+    """, (list(doc_hashes),))
+
+    registrations = {}
+    for row in cur.fetchall():
+        if row['anchor_status'] == 'queued':
+            registrations[row['file_hash']] = {'anchor_status': 'queued', 'anchored': False, 'proof_valid': False}
+            continue
+
+        proof = row['merkle_proof'] or []
+        registrations[row['file_hash']] = {
+            'anchor_status': 'batched',
+            'batch_id': row['batch_id'],
+            'leaf_index': row['leaf_index'],
+            'merkle_root': row['merkle_root'],
+            'merkle_proof': proof,
+            'proof_valid': verify_proof(row['file_hash'], proof, row['merkle_root']),
+            'anchored': row['tx_status'] == 'confirmed',
+            'anchor_tx': row['tx_hash'],
+            'anchor_block': row['block_number']
+        }
+    return registrations
+
+# Instância global
+document_batcher = DocumentBatcher()
@@ -0,0 +1,177 @@
+"""
+Oráculo de Taxas (EIP-1559)
+Uma thread por processo amostra eth_feeHistory a cada FEE_ORACLE_REFRESH_INTERVAL
+segundos e guarda o base fee do próximo bloco e os percentis de priority fee
+pagos nos últimos blocos. Cada envio de transação recebe maxFeePerGas e
+maxPriorityFeePerGas do cache, sem uma chamada eth_gasPrice por escrita.
+"""
+
+import os
+import time
+import logging
+import threading
+import statistics
+from typing import Dict, Optional
+
+from web3 import Web3
+from api.utils.web3_provider import get_web3
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+FEE_ORACLE_REFRESH_INTERVAL = int(os.getenv('FEE_ORACLE_REFRESH_INTERVAL', '15'))  # segundos entre amostras de eth_feeHistory
+FEE_ORACLE_MAX_STALENESS = int(os.getenv('FEE_ORACLE_MAX_STALENESS', '120'))  # amostra mais antiga que isso é refeita na hora
+FEE_ORACLE_BLOCKS = int(os.getenv('FEE_ORACLE_BLOCKS', '20'))  # blocos considerados por amostra
+FEE_URGENCY_TIERS = os.getenv('FEE_URGENCY_TIERS', 'slow:10,standard:50,fast:90')  # nível:percentil de priority fee
+FEE_DEFAULT_URGENCY = os.getenv('FEE_DEFAULT_URGENCY', 'standard')
+FEE_BASE_FEE_MULTIPLIER = float(os.getenv('FEE_BASE_FEE_MULTIPLIER', '2'))  # folga para o base fee subir até a inclusão
+FEE_MIN_PRIORITY_GWEI = os.getenv('FEE_MIN_PRIORITY_GWEI')  # piso da priority fee (default: POLYGON_MIN_PRIORITY_GWEI nas redes Polygon, 0 nas demais)
+POLYGON_MIN_PRIORITY_GWEI = 30  # a Polygon recusa priority fee abaixo de 30 gwei
+POLYGON_CHAIN_IDS = {137, 80001, 80002}  # mainnet, Mumbai, Amoy
+
+def parse_tiers(value: str) -> Dict[str, float]:
+    """Converte 'slow:10,standard:50,fast:90' em {nível: percentil}"""
+    tiers = {}
+    for item in value.split(','):
+        name, _, percentile = item.strip().partition(':')
+        if name:
+            tiers[name] = float(percentile)
+    return tiers
+
+URGENCY_TIERS = parse_tiers(FEE_URGENCY_TIERS)
+
+class FeeOracle:
+    """
+    Cache de base fee e priority fee por nível de urgência
+
+    Para cada nível, a priority fee é a mediana, nos últimos
+    FEE_ORACLE_BLOCKS blocos, do percentil configurado das gorjetas pagas
+    (blocos vazios ficam de fora), nunca abaixo do piso da rede
+    (FEE_MIN_PRIORITY_GWEI ou, sem ele, 30 gwei só nas redes Polygon).
+    maxFeePerGas = base fee do próximo bloco * FEE_BASE_FEE_MULTIPLIER +
+    priority fee. Em redes sem EIP-1559 (eth_feeHistory indisponível ou sem
+    base fee) o cache guarda eth_gasPrice e as transações seguem legadas.
+    """
+
+    def __init__(self, w3: Optional[Web3] = None, tiers: Optional[Dict[str, float]] = None):
+        self.w3 = w3 or get_web3()
+        self.tiers = tiers or URGENCY_TIERS
+        self._lock = threading.Lock()
+        self._sample = None
+        self._min_priority = None
+        self._worker = None
+        self._worker_pid = None
+
+    def start_worker(self):
+        """Inicia a thread de amostragem (uma por processo, inclusive após fork)"""
+        with self._lock:
+            if self._worker and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            self._worker = threading.Thread(target=self._run_worker, name='fee-oracle', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def _run_worker(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"❌ Erro ao amostrar taxas da rede: {str(e)}")
+            time.sleep(FEE_ORACLE_REFRESH_INTERVAL)
+
+    def refresh(self) -> Dict:
+        """Amostra eth_feeHistory e atualiza o cache"""
+        percentiles = sorted(set(self.tiers.values()))
+        min_priority = self._get_min_priority()
+
+        try:
+            history = self.w3.eth.fee_history(FEE_ORACLE_BLOCKS, 'latest', percentiles)
+            base_fee = history['baseFeePerGas'][-1] if history.get('baseFeePerGas') else 0
+        except Exception as e:
+            logger.warning(f"⚠️ eth_feeHistory indisponível, usando eth_gasPrice: {str(e)}")
+            base_fee = 0
+
+        if not base_fee:
+            sample = {'legacy': True, 'gas_price': self.w3.eth.gas_price, 'sampled_at': time.time()}
+        else:
+            rewards = [block for block in history.get('reward') or [] if any(block)]
+            priority = {}
+            for name, percentile in self.tiers.items():
+                column = percentiles.index(percentile)
+                paid = [block[column] for block in rewards]
+                priority[name] = max(int(statistics.median(paid)) if paid else 0, min_priority)
+
+            sample = {
+                'legacy': False,
+                'base_fee': base_fee,
+                'priority': priority,
+                'block': history['oldestBlock'] + len(history['baseFeePerGas']) - 1,
+                'sampled_at': time.time()
+            }
+
+        with self._lock:
+            self._sample = sample
+        return sample
+
+    def _get_min_priority(self) -> int:
+        if self._min_priority is None:
+            if FEE_MIN_PRIORITY_GWEI is not None:
+                gwei = float(FEE_MIN_PRIORITY_GWEI)
+            else:
+                gwei = POLYGON_MIN_PRIORITY_GWEI if self.w3.eth.chain_id in POLYGON_CHAIN_IDS else 0
+            self._min_priority = Web3.to_wei(gwei, 'gwei')
+        return self._min_priority
+
+    def _current(self) -> Dict:
+        self.start_worker()
+        with self._lock:
+            sample = self._sample
+        if sample is None or time.time() - sample['sampled_at'] >= FEE_ORACLE_MAX_STALENESS:
+            sample = self.refresh()
+        return sample
+
+    def get_fee_params(self, urgency: Optional[str] = None) -> Dict:
+        """
+        Campos de taxa para build_transaction/sign_transaction
+
+        Args:
+            urgency: Nível de urgência (ver FEE_URGENCY_TIERS; default FEE_DEFAULT_URGENCY)
+
+        Returns:
+            {'maxFeePerGas', 'maxPriorityFeePerGas'} ou {'gasPrice'} em redes legadas
+
+        Raises:
+            ValueError: nível de urgência desconhecido
+        """
+        urgency = urgency or FEE_DEFAULT_URGENCY
+        if urgency not in self.tiers:
+            raise ValueError(f"Nível de urgência desconhecido: {urgency} (disponíveis: {', '.join(self.tiers)})")
+
+        sample = self._current()
+        if sample['legacy']:
+            return {'gasPrice': sample['gas_price']}
+
+        priority = sample['priority'][urgency]
+        return {
+            'maxFeePerGas': int(sample['base_fee'] * FEE_BASE_FEE_MULTIPLIER) + priority,
+            'maxPriorityFeePerGas': priority
+        }
+
+    def get_stats(self) -> Dict:
+        """Última amostra (em gwei) e idade do cache"""
+        with self._lock:
+            sample = self._sample
+        if sample is None:
+            return {'sampled': False}
+
+        stats = {'sampled': True, 'legacy': sample['legacy'], 'age_seconds': round(time.time() - sample['sampled_at'], 1)}
+        if sample['legacy']:
+            stats['gas_price_gwei'] = float(Web3.from_wei(sample['gas_price'], 'gwei'))
+        else:
+            stats['block'] = sample['block']
+            stats['base_fee_gwei'] = float(Web3.from_wei(sample['base_fee'], 'gwei'))
+            stats['priority_gwei'] = {name: float(Web3.from_wei(value, 'gwei')) for name, value in sample['priority'].items()}
+        return stats
+
+# Instância global
+fee_oracle = FeeOracle()
@@ -0,0 +1,34 @@
+"""
+Utilitários de Sistema de Arquivos
+Os diretórios de trabalho em /tmp (keyring PGP, auditoria em disco) ficam
+em um local compartilhado com os demais usuários da máquina: só são usados
+se pertencerem ao processo e não forem acessíveis por mais ninguém.
+"""
+
+import os
+import stat
+
+def ensure_private_dir(path: str) -> str:
+    """
+    Cria o diretório com modo 0700 ou valida um já existente
+
+    Um diretório existente do próprio usuário com permissões abertas é
+    corrigido para 0700; de outro dono, ou um link simbólico, é recusado.
+
+    Returns:
+        O próprio caminho
+
+    Raises:
+        PermissionError: se o caminho não for um diretório do usuário do processo
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{path} não é um diretório")
+    if info.st_uid != os.geteuid():
+        raise PermissionError(f"{path} pertence a outro usuário (uid {info.st_uid})")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        os.chmod(path, 0o700)
+
+    return path
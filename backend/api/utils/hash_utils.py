@@ -1,4 +1,14 @@
 import hashlib
+from eth_hash.auto import keccak
+
+# Algoritmos suportados no hash incremental (nome -> construtor)
+HASH_ALGORITHMS = {
+    'sha256': hashlib.sha256,
+    'sha3_256': hashlib.sha3_256,
+    'keccak256': lambda: keccak.new(b'')
+}
+
+HASH_CHUNK_SIZE = 64 * 1024
 
 def calculate_sha256(file_bytes):
     """Calcula o hash SHA-256 de um arquivo"""
@@ -9,3 +19,51 @@ def verify_hash(file_bytes, expected_hash):
     calculated = calculate_sha256(file_bytes)
     return calculated == expected_hash
 
+class MultiHasher:
+    """
+    Calcula vários hashes em uma única passada pelos dados
+
+    Implementa write()/seek() para poder ser usado como stream_factory do
+    parser multipart do werkzeug: cada chunk do upload é enviado direto aos
+    hashers, sem manter o arquivo em memória ou em disco.
+    """
+
+    def __init__(self, algorithms=('sha256',)):
+        unknown = [name for name in algorithms if name not in HASH_ALGORITHMS]
+        if unknown:
+            raise ValueError(f"Algoritmo(s) não suportado(s): {', '.join(unknown)}")
+
+        self._hashers = {name: HASH_ALGORITHMS[name]() for name in algorithms}
+        self.size = 0
+
+    def update(self, chunk):
+        for hasher in self._hashers.values():
+            hasher.update(chunk)
+        self.size += len(chunk)
+
+    def write(self, chunk):
+        self.update(chunk)
+        return len(chunk)
+
+    def seek(self, *args):
+        # Chamado pelo werkzeug ao fim de cada arquivo; não há conteúdo para rebobinar
+        return 0
+
+    def hexdigests(self):
+        """Retorna {algoritmo: hash em hex}"""
+        return {name: hasher.digest().hex() for name, hasher in self._hashers.items()}
+
+def hash_stream(stream, algorithms=('sha256',), chunk_size=HASH_CHUNK_SIZE):
+    """
+    Calcula os hashes de um stream lendo em chunks (memória constante)
+
+    Returns:
+        Tupla (dict {algoritmo: hash em hex}, tamanho em bytes)
+    """
+    hasher = MultiHasher(algorithms)
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        hasher.update(chunk)
+    return hasher.hexdigests(), hasher.size
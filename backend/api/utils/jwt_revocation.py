@@ -0,0 +1,184 @@
+"""
+JWT Revocation Cache
+Process-local view of jwt_blacklist: a bloom filter answers "not revoked"
+without a DB round trip, and an LRU keeps recent positive (and false
+positive) lookups. A background thread pulls new blacklist rows every
+JWT_REVOCATION_REFRESH_INTERVAL seconds, so a revocation reaches every
+worker within that window.
+"""
+
+import os
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from api.utils.db import db_connection
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+JWT_REVOCATION_REFRESH_INTERVAL = int(os.getenv('JWT_REVOCATION_REFRESH_INTERVAL', '5'))  # seconds between delta pulls
+JWT_REVOCATION_MAX_STALENESS = int(os.getenv('JWT_REVOCATION_MAX_STALENESS', '60'))  # fall back to the DB if the cache is older than this
+JWT_REVOCATION_FULL_RELOAD = int(os.getenv('JWT_REVOCATION_FULL_RELOAD', '3600'))  # seconds between full rebuilds (drops expired JTIs)
+JWT_REVOCATION_BLOOM_CAPACITY = int(os.getenv('JWT_REVOCATION_BLOOM_CAPACITY', '100000'))  # expected live revocations
+JWT_REVOCATION_LRU_SIZE = int(os.getenv('JWT_REVOCATION_LRU_SIZE', '10000'))  # cached DB answers for bloom hits
+JWT_REVOCATION_OVERLAP = timedelta(seconds=30)  # re-read window for rows committed out of revoked_at order
+JWT_REVOCATION_FALSE_POSITIVE_RATE = 0.001
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings (double hashing on SHA-256)"""
+
+    def __init__(self, capacity, error_rate=JWT_REVOCATION_FALSE_POSITIVE_RATE):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.sha256(value.encode('utf-8')).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class RevocationCache:
+    """
+    Bloom filter + LRU kept fresh by delta pulls on jwt_blacklist.revoked_at
+
+    Until the first successful load, or whenever the last refresh is older
+    than JWT_REVOCATION_MAX_STALENESS, lookups go straight to the DB so the
+    revocation window stays bounded even if the refresher is failing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._recent = OrderedDict()
+        self._cursor = None
+        self._refreshed_at = 0.0
+        self._reloaded_at = 0.0
+        self._worker = None
+        self._worker_pid = None
+
+    def start_worker(self):
+        """Start the refresh thread (one per process, including after fork)"""
+        with self._lock:
+            if self._worker and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            self._worker = threading.Thread(target=self._run_worker, name='jwt-revocation', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def _run_worker(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"❌ Error refreshing JWT revocation cache: {e}")
+            time.sleep(JWT_REVOCATION_REFRESH_INTERVAL)
+
+    def refresh(self):
+        """Pull blacklist rows added since the last pull (full rebuild when due)"""
+        full = self._bloom is None or time.time() - self._reloaded_at >= JWT_REVOCATION_FULL_RELOAD
+
+        with db_connection() as conn:
+            cur = conn.cursor()
+            if full:
+                cur.execute("""
+                    SELECT jti, revoked_at FROM jwt_blacklist
+                    WHERE expires_at > NOW()
+                """)
+            else:
+                cur.execute("""
+                    SELECT jti, revoked_at FROM jwt_blacklist
+                    WHERE revoked_at > %s AND expires_at > NOW()
+                """, (self._cursor - JWT_REVOCATION_OVERLAP,))
+            rows = cur.fetchall()
+            cur.execute("SELECT NOW()::timestamp AS now")
+            db_now = cur.fetchone()['now']
+            cur.close()
+
+        with self._lock:
+            if full:
+                capacity = max(JWT_REVOCATION_BLOOM_CAPACITY, len(rows) * 2)
+                self._bloom = BloomFilter(capacity)
+                self._recent.clear()
+                self._reloaded_at = time.time()
+
+            for row in rows:
+                self._bloom.add(row['jti'])
+                if row['jti'] in self._recent:
+                    self._recent[row['jti']] = True
+                if self._cursor is None or row['revoked_at'] > self._cursor:
+                    self._cursor = row['revoked_at']
+
+            if self._cursor is None:
+                # Empty table: start pulling from the DB clock
+                self._cursor = db_now
+
+            self._refreshed_at = time.time()
+
+        if full:
+            logger.info(f"🔐 JWT revocation cache loaded: {len(rows)} revoked tokens")
+
+    def _remember(self, jti, revoked):
+        self._recent[jti] = revoked
+        self._recent.move_to_end(jti)
+        while len(self._recent) > JWT_REVOCATION_LRU_SIZE:
+            self._recent.popitem(last=False)
+
+    def add(self, jti):
+        """Record a revocation made by this process (visible immediately here)"""
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+                self._remember(jti, True)
+
+    def is_revoked(self, jti, query_db):
+        """
+        Check a JTI against the cache
+
+        Args:
+            jti: Token ID
+            query_db: Callable(jti) -> bool used for bloom hits and stale cache
+
+        Returns:
+            True if the token was revoked
+        """
+        if not jti:
+            return False
+
+        self.start_worker()
+
+        with self._lock:
+            fresh = self._bloom is not None and time.time() - self._refreshed_at < JWT_REVOCATION_MAX_STALENESS
+            if fresh:
+                if jti not in self._bloom:
+                    return False
+                if jti in self._recent:
+                    self._recent.move_to_end(jti)
+                    return self._recent[jti]
+
+        revoked = query_db(jti)
+
+        if fresh:
+            with self._lock:
+                self._remember(jti, revoked)
+        return revoked
+
+
+# Global instance
+revocation_cache = RevocationCache()
@@ -8,7 +8,9 @@ import os
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import request, jsonify
-from api.utils.db import get_db_connection
+from api.utils.db import db_connection
+from api.utils.jwt_revocation import revocation_cache
+from api.utils.audit_writer import audit_writer
 import uuid
 
 # JWT Configuration
@@ -63,19 +65,28 @@ def decode_token(token):
 
 
 def is_token_blacklisted(jti):
-    """Check if token JTI is in blacklist"""
+    """
+    Check if token JTI is in blacklist
+    
+    Answered from the process-local revocation cache; only bloom filter hits
+    (or a stale cache) reach the database.
+    """
+    return revocation_cache.is_revoked(jti, _query_blacklist)
+
+
+def _query_blacklist(jti):
+    """Check the jwt_blacklist table directly"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT 1 FROM jwt_blacklist 
-            WHERE jti = %s AND expires_at > NOW()
-        """, (jti,))
-        
-        result = cur.fetchone()
-        cur.close()
-        conn.close()
+        with db_connection() as conn:
+            cur = conn.cursor()
+            
+            cur.execute("""
+                SELECT 1 FROM jwt_blacklist 
+                WHERE jti = %s AND expires_at > NOW()
+            """, (jti,))
+            
+            result = cur.fetchone()
+            cur.close()
         
         return result is not None
     except Exception as e:
@@ -86,18 +97,20 @@ def is_token_blacklisted(jti):
 def blacklist_token(jti, token_type, user_id, expires_at):
     """Add token to blacklist"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute("""
-            INSERT INTO jwt_blacklist (jti, token_type, user_id, expires_at)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (jti) DO NOTHING
-        """, (jti, token_type, user_id, expires_at))
+        with db_connection() as conn:
+            cur = conn.cursor()
+            
+            cur.execute("""
+                INSERT INTO jwt_blacklist (jti, token_type, user_id, expires_at)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (jti) DO NOTHING
+            """, (jti, token_type, user_id, expires_at))
+            
+            conn.commit()
+            cur.close()
         
-        conn.commit()
-        cur.close()
-        conn.close()
+        # Other workers pick it up on their next delta pull
+        revocation_cache.add(jti)
         
         return True
     except Exception as e:
@@ -154,22 +167,19 @@ def jwt_required(allowed_roles=None):
 
 
 def log_audit(user_id, role, action, endpoint, ip_address, user_agent, request_data=None, response_status=None):
-    """Log admin action to audit_logs table"""
+    """Queue an admin action for the audit_logs table (written in batches by audit_writer)"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute("""
-            INSERT INTO audit_logs 
-            (user_id, role, action, endpoint, ip_address, user_agent, request_data, response_status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """, (user_id, role, action, endpoint, ip_address, user_agent, request_data, response_status))
-        
-        conn.commit()
-        cur.close()
-        conn.close()
-        
-        return True
+        return audit_writer.enqueue(
+            'audit_logs',
+            user_id=user_id,
+            role=role,
+            action=action,
+            endpoint=endpoint,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            request_data=request_data,
+            response_status=response_status
+        )
     except Exception as e:
         print(f"Error logging audit: {e}")
         return False
@@ -0,0 +1,91 @@
+"""
+Módulo de Árvores de Merkle
+Usado na ancoragem em lote de documentos: uma única raiz vai para o
+ProofRegistry e cada documento guarda sua prova de inclusão.
+
+Compatível com o MerkleProof do OpenZeppelin: keccak256 com pares
+ordenados, de modo que a prova é apenas a lista de irmãos.
+"""
+
+from typing import List
+from eth_utils import keccak
+
+def _to_bytes(hex_value: str) -> bytes:
+    return bytes.fromhex(hex_value[2:] if hex_value.startswith('0x') else hex_value)
+
+def _to_hex(value: bytes) -> str:
+    return '0x' + value.hex()
+
+def _hash_pair(a: bytes, b: bytes) -> bytes:
+    return keccak(a + b) if a <= b else keccak(b + a)
+
+def leaf_hash(doc_hash: str) -> bytes:
+    """
+    Calcula a folha de um documento
+
+    A folha é keccak256 do hash do documento (e não o hash em si), para que
+    uma folha nunca possa ser confundida com um nó interno.
+    """
+    return keccak(_to_bytes(doc_hash))
+
+def build_tree(doc_hashes: List[str]) -> List[List[bytes]]:
+    """
+    Monta a árvore a partir dos hashes dos documentos
+
+    Um nó sem par é promovido ao nível seguinte sem ser duplicado.
+
+    Returns:
+        Lista de níveis, das folhas (índice 0) até a raiz (último nível)
+    """
+    if not doc_hashes:
+        raise ValueError("Árvore de Merkle requer ao menos um documento")
+
+    layers = [[leaf_hash(doc_hash) for doc_hash in doc_hashes]]
+
+    while len(layers[-1]) > 1:
+        layer = layers[-1]
+        next_layer = []
+        for i in range(0, len(layer), 2):
+            if i + 1 < len(layer):
+                next_layer.append(_hash_pair(layer[i], layer[i + 1]))
+            else:
+                next_layer.append(layer[i])
+        layers.append(next_layer)
+
+    return layers
+
+def get_root(layers: List[List[bytes]]) -> str:
+    """Retorna a raiz da árvore em hex (0x...)"""
+    return _to_hex(layers[-1][0])
+
+def get_proof(layers: List[List[bytes]], index: int) -> List[str]:
+    """
+    Retorna a prova de inclusão da folha de posição index
+
+    Returns:
+        Lista de hashes irmãos (0x...), da folha até a raiz - O(log n)
+    """
+    proof = []
+    for layer in layers[:-1]:
+        sibling = index ^ 1
+        if sibling < len(layer):
+            proof.append(_to_hex(layer[sibling]))
+        index //= 2
+    return proof
+
+def verify_proof(doc_hash: str, proof: List[str], root: str) -> bool:
+    """
+    Verifica localmente se um documento pertence à árvore de raiz root
+
+    Args:
+        doc_hash: Hash do documento (0x...)
+        proof: Prova retornada por get_proof
+        root: Raiz ancorada on-chain
+
+    Returns:
+        True se a prova reconstrói a raiz
+    """
+    node = leaf_hash(doc_hash)
+    for sibling in proof:
+        node = _hash_pair(node, _to_bytes(sibling))
+    return _to_hex(node) == root.lower()
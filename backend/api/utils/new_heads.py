@@ -0,0 +1,87 @@
+"""
+Assinatura de newHeads via WebSocket
+Usada pelo listener (POLYGON_WS_URL) para acordar o loop de ingestão a cada
+bloco novo em vez de esperar LISTENER_POLL_INTERVAL.
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional
+
+from web3 import Web3, AsyncWeb3
+from web3.providers import WebsocketProviderV2
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+WS_RECONNECT_DELAY = int(os.getenv('LISTENER_WS_RECONNECT_DELAY', '5'))  # segundos entre tentativas de reconexão
+
+def head_number(message: Dict) -> Optional[int]:
+    """
+    Número do bloco de uma notificação newHeads
+
+    O web3 (listen_to_websocket) entrega a notificação já formatada como
+    {'subscription': ..., 'result': cabeçalho}, com o número em hex.
+    """
+    number = (message.get('result') or {}).get('number')
+    if number is None:
+        return None
+    return Web3.to_int(hexstr=number) if isinstance(number, str) else number
+
+class NewHeadsSubscriber(threading.Thread):
+    """
+    Assina `newHeads` via WebSocket e acorda o loop principal a cada bloco novo.
+    
+    A ingestão continua sendo feita pelo loop HTTP (mesmo chunking, detecção
+    de reorg e gravação em lote); o WebSocket só substitui a espera de
+    POLL_INTERVAL. Se o socket cair, o loop volta sozinho ao polling HTTP
+    enquanto esta thread tenta reconectar.
+    """
+    
+    def __init__(self, ws_url):
+        super().__init__(name='newheads-subscriber', daemon=True)
+        self.ws_url = ws_url
+        self.new_head = threading.Event()
+        self.latest_block = None
+        self.connected = False
+    
+    def run(self):
+        asyncio.run(self._subscribe_forever())
+    
+    async def _subscribe_forever(self):
+        while True:
+            try:
+                async with AsyncWeb3.persistent_websocket(WebsocketProviderV2(self.ws_url)) as ws_w3:
+                    await ws_w3.eth.subscribe('newHeads')
+                    self.connected = True
+                    logger.info("🔌 WebSocket conectado, assinando newHeads")
+                    
+                    async for message in ws_w3.ws.listen_to_websocket():
+                        self.on_message(message)
+                    
+                    raise ConnectionError('stream de newHeads encerrado')
+            
+            except Exception as e:
+                if self.connected:
+                    logger.warning(f"⚠️ WebSocket desconectado ({str(e)}), voltando ao polling HTTP")
+                else:
+                    logger.debug(f"Falha ao conectar WebSocket: {str(e)}")
+            
+            self.connected = False
+            self.latest_block = None
+            await asyncio.sleep(WS_RECONNECT_DELAY)
+    
+    def on_message(self, message: Dict):
+        """Registra o head de uma notificação e acorda o loop principal"""
+        number = head_number(message)
+        if number is not None:
+            self.latest_block = number
+        self.new_head.set()
+    
+    def wait_for_head(self, timeout):
+        """Espera um novo bloco (ou o timeout de polling) e retorna o número do head, se conhecido"""
+        self.new_head.wait(timeout)
+        self.new_head.clear()
+        return self.latest_block if self.connected else None
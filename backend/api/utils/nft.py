@@ -5,10 +5,14 @@ Implementa lógica de minting, cancelamento e consulta de NFTs de identidade
 
 import os
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 from web3 import Web3
+from web3._utils.abi import get_abi_output_types
 # geth_poa_middleware não é mais necessário no web3.py >= 6.0
 import json
+from api.utils.tx_dispatcher import TxDispatcher
+from api.utils.document_anchor import complete_anchor_batch
+from api.utils.web3_provider import get_web3, get_contract, load_abi
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +20,9 @@ logger = logging.getLogger(__name__)
 POLYGON_RPC_URL = os.getenv('POLYGON_RPC_URL', 'https://polygon-mumbai.infura.io/v3/demo')
 IDENTITY_NFT_CONTRACT_ADDRESS = os.getenv('IDENTITY_NFT_CONTRACT_ADDRESS', '0x0000000000000000000000000000000000000000')
 PROOF_REGISTRY_CONTRACT_ADDRESS = os.getenv('PROOF_REGISTRY_CONTRACT_ADDRESS', '0x0000000000000000000000000000000000000000')
+NFT_BATCH_READ_MODE = os.getenv('NFT_BATCH_READ_MODE', 'rpc')  # rpc (lote JSON-RPC) ou multicall (Multicall3.aggregate3)
+NFT_BATCH_READ_MAX_CALLS = int(os.getenv('NFT_BATCH_READ_MAX_CALLS', '200'))  # chamadas por requisição ao RPC
+MULTICALL3_ADDRESS = os.getenv('MULTICALL3_ADDRESS', '0xcA11bde05977b3631167028862bE2a173976CA11')  # mesmo endereço em todas as redes
 
 # ABIs dos contratos (simplificados para demonstração)
 IDENTITY_NFT_ABI = [
@@ -71,6 +78,42 @@ IDENTITY_NFT_ABI = [
     }
 ]
 
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"}
+                ],
+                "name": "calls",
+                "type": "tuple[]"
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"}
+                ],
+                "name": "returnData",
+                "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function"
+    }
+]
+
+# Leituras aceitas por NFTManager.batch_read: nome -> contrato
+BATCH_READ_CALLS = {
+    'getActiveNFT': 'identity',
+    'isActiveNFT': 'identity',
+    'verifyProof': 'proof'
+}
+
 PROOF_REGISTRY_ABI = [
     {
         "inputs": [
@@ -96,7 +139,7 @@ class NFTManager:
     
     def __init__(self):
         """Inicializa o gerenciador de NFTs"""
-        self.w3 = Web3(Web3.HTTPProvider(POLYGON_RPC_URL))
+        self.w3 = get_web3(POLYGON_RPC_URL)
         
         # Adicionar middleware para PoA (Polygon)
         # POA middleware não é mais necessário no web3.py >= 6.0
@@ -107,21 +150,21 @@ class NFTManager:
         else:
             logger.info(f"✅ Conectado ao Polygon: {POLYGON_RPC_URL}")
         
+        # Fila de transações (nonce local + outbox); o receipt é acompanhado em background
+        self.tx_dispatcher = TxDispatcher(self.w3)
+        self.tx_dispatcher.register_completion('mint_identity', self._complete_mint)
+        self.tx_dispatcher.register_completion('cancel_nft', self._complete_cancel)
+        self.tx_dispatcher.register_completion('anchor_batch', complete_anchor_batch)
+        
         # Inicializar contratos
         self.identity_nft_contract = None
         self.proof_registry_contract = None
         
         if IDENTITY_NFT_CONTRACT_ADDRESS != '0x0000000000000000000000000000000000000000':
-            self.identity_nft_contract = self.w3.eth.contract(
-                address=Web3.to_checksum_address(IDENTITY_NFT_CONTRACT_ADDRESS),
-                abi=IDENTITY_NFT_ABI
-            )
+            self.identity_nft_contract = get_contract(self.w3, IDENTITY_NFT_CONTRACT_ADDRESS, IDENTITY_NFT_ABI)
         
         if PROOF_REGISTRY_CONTRACT_ADDRESS != '0x0000000000000000000000000000000000000000':
-            self.proof_registry_contract = self.w3.eth.contract(
-                address=Web3.to_checksum_address(PROOF_REGISTRY_CONTRACT_ADDRESS),
-                abi=PROOF_REGISTRY_ABI
-            )
+            self.proof_registry_contract = get_contract(self.w3, PROOF_REGISTRY_CONTRACT_ADDRESS, PROOF_REGISTRY_ABI)
     
     def get_active_nft(self, wallet_address: str) -> Optional[int]:
         """
@@ -175,50 +218,164 @@ class NFTManager:
             logger.error(f"❌ Erro ao verificar NFT ativo: {str(e)}")
             return False
     
-    def cancel_nft(self, nft_id: int, private_key: str) -> Dict:
+    def _read_function(self, call: str, arg):
+        contract = self.identity_nft_contract if BATCH_READ_CALLS[call] == 'identity' else self.proof_registry_contract
+        if not contract:
+            return None
+        if BATCH_READ_CALLS[call] == 'identity':
+            arg = Web3.to_checksum_address(arg)
+        return contract.get_function_by_name(call)(arg)
+    
+    def _call_rpc_batch(self, functions: List) -> List[Optional[bytes]]:
+        # Um array JSON-RPC com um eth_call por leitura
+        provider = self.w3.provider
+        requests_list = [
+            ('eth_call', [{'to': fn.address, 'data': fn._encode_transaction_data()}, 'latest'])
+            for fn in functions
+        ]
+        
+        try:
+            responses = provider.make_batch_request(requests_list)
+        except (AttributeError, ValueError) as e:
+            # Provedor sem suporte a lote: uma chamada por leitura
+            logger.warning(f"⚠️ Lote JSON-RPC indisponível, consultando em sequência: {str(e)}")
+            results = []
+            for fn in functions:
+                try:
+                    results.append(bytes(self.w3.eth.call({'to': fn.address, 'data': fn._encode_transaction_data()})))
+                except Exception:
+                    results.append(None)
+            return results
+        
+        return [
+            bytes.fromhex(response['result'][2:]) if response.get('result') not in (None, '0x') else None
+            for response in responses
+        ]
+    
+    def _call_multicall(self, functions: List) -> List[Optional[bytes]]:
+        # Uma única eth_call para o Multicall3, permitindo falha por item
+        multicall = get_contract(self.w3, MULTICALL3_ADDRESS, MULTICALL3_ABI)
+        results = multicall.functions.aggregate3([
+            (fn.address, True, fn._encode_transaction_data()) for fn in functions
+        ]).call()
+        return [bytes(data) if success and data else None for success, data in results]
+    
+    def batch_read(self, calls: List[Tuple[str, str]]) -> List:
+        """
+        Executa várias leituras de contrato em uma única ida ao RPC
+        
+        As leituras vão em um lote JSON-RPC ou em um aggregate3 do Multicall3
+        (NFT_BATCH_READ_MODE), em blocos de NFT_BATCH_READ_MAX_CALLS.
+        
+        Args:
+            calls: Lista de (argumento, leitura), ex: [(wallet, 'getActiveNFT'), (doc_hash, 'verifyProof')]
+            
+        Returns:
+            Resultados decodificados na mesma ordem (None se a leitura falhou
+            ou o contrato não está configurado)
+        """
+        results = [None] * len(calls)
+        pending = []
+        
+        for index, (arg, call) in enumerate(calls):
+            if call not in BATCH_READ_CALLS:
+                raise ValueError(f"Leitura não suportada em lote: {call}")
+            try:
+                fn = self._read_function(call, arg)
+            except Exception as e:
+                logger.warning(f"⚠️ Leitura {call}({arg}) ignorada: {str(e)}")
+                continue
+            if fn is not None:
+                pending.append((index, fn))
+        
+        for start in range(0, len(pending), NFT_BATCH_READ_MAX_CALLS):
+            chunk = pending[start:start + NFT_BATCH_READ_MAX_CALLS]
+            functions = [fn for _, fn in chunk]
+            
+            try:
+                if NFT_BATCH_READ_MODE == 'multicall':
+                    raw_results = self._call_multicall(functions)
+                else:
+                    raw_results = self._call_rpc_batch(functions)
+            except Exception as e:
+                logger.error(f"❌ Erro na leitura em lote ({len(chunk)} chamadas): {str(e)}")
+                continue
+            
+            for (index, fn), raw in zip(chunk, raw_results):
+                if raw is None:
+                    continue
+                try:
+                    results[index] = self.w3.codec.decode(get_abi_output_types(fn.abi), raw)[0]
+                except Exception as e:
+                    logger.warning(f"⚠️ Resposta inválida para {fn.fn_name}: {str(e)}")
+        
+        return results
+    
+    def get_nft_status_batch(self, wallet_addresses: List[str]) -> Dict[str, Dict]:
+        """
+        getActiveNFT + isActiveNFT de várias carteiras em uma ida ao RPC
+        
+        Returns:
+            Dict carteira -> {'nft_id': ID ou None, 'is_active': bool}; carteiras
+            cuja leitura falhou ficam fora do resultado
+        """
+        calls = []
+        for wallet_address in wallet_addresses:
+            calls.append((wallet_address, 'getActiveNFT'))
+            calls.append((wallet_address, 'isActiveNFT'))
+        
+        results = self.batch_read(calls)
+        
+        # None é falha de leitura (getActiveNFT sem NFT retorna 0), não ausência de NFT
+        return {
+            wallet_address: {
+                'nft_id': results[2 * i] or None,
+                'is_active': bool(results[2 * i + 1])
+            }
+            for i, wallet_address in enumerate(wallet_addresses)
+            if results[2 * i] is not None and results[2 * i + 1] is not None
+        }
+    
+    def verify_proofs(self, doc_hashes: List[str]) -> Dict[str, bool]:
+        """verifyProof de vários hashes em uma ida ao RPC"""
+        results = self.batch_read([(doc_hash, 'verifyProof') for doc_hash in doc_hashes])
+        return {doc_hash: bool(result) for doc_hash, result in zip(doc_hashes, results)}
+    
+    def cancel_nft(self, nft_id: int, private_key: str, context: Optional[Dict] = None) -> Dict:
         """
         Cancela um NFT existente
         
         Args:
             nft_id: ID do NFT a ser cancelado
             private_key: Chave privada para assinar a transação
+            context: {'user_id', 'reason'} para gravar o cancelamento no banco
+                quando a transação for confirmada (ver _complete_cancel)
             
         Returns:
-            Dict com status e transaction_hash
+            Dict com status ('pending'), tx_id e transaction_hash; o receipt
+            é acompanhado pelo tx_dispatcher (ver get_transaction_status)
         """
         try:
             if not self.identity_nft_contract:
                 raise ValueError("Contrato de NFT não configurado")
             
-            # Criar conta a partir da chave privada
-            account = self.w3.eth.account.from_key(private_key)
-            
-            # Preparar transação
-            nonce = self.w3.eth.get_transaction_count(account.address)
-            
-            transaction = self.identity_nft_contract.functions.cancelNFT(nft_id).build_transaction({
-                'from': account.address,
-                'nonce': nonce,
-                'gas': 200000,
-                'gasPrice': self.w3.eth.gas_price
-            })
-            
-            # Assinar transação
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, private_key)
-            
-            # Enviar transação
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            
-            # Aguardar confirmação
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            # Enfileirar transação (retorna sem aguardar o receipt)
+            tx = self.tx_dispatcher.submit(
+                'cancel_nft',
+                self.identity_nft_contract.functions.cancelNFT(nft_id),
+                private_key,
+                gas=200000,
+                context={**context, 'nft_id': nft_id} if context else None
+            )
             
-            logger.info(f"✅ NFT {nft_id} cancelado com sucesso: {tx_hash.hex()}")
+            logger.info(f"📤 Cancelamento do NFT {nft_id} enviado: {tx['transaction_hash']} (tx_id {tx['tx_id']})")
             
             return {
-                'status': 'success',
-                'transaction_hash': tx_hash.hex(),
-                'block_number': receipt['blockNumber'],
-                'gas_used': receipt['gasUsed']
+                'status': 'pending',
+                'tx_id': tx['tx_id'],
+                'transaction_hash': tx['transaction_hash'],
+                'block_number': None,
+                'gas_used': None
             }
             
         except Exception as e:
@@ -230,7 +387,8 @@ class NFTManager:
         wallet_address: str,
         metadata: Dict,
         previous_nft_id: int,
-        private_key: str
+        private_key: str,
+        context: Optional[Dict] = None
     ) -> Dict:
         """
         Minta um novo NFT de identidade
@@ -240,63 +398,85 @@ class NFTManager:
             metadata: Metadados do NFT (KYC info, etc.)
             previous_nft_id: ID do NFT anterior (0 se for o primeiro)
             private_key: Chave privada para assinar a transação
+            context: {'user_id'} para gravar o NFT no usuário quando a
+                transação for confirmada (ver _complete_mint)
             
         Returns:
-            Dict com status, nft_id e transaction_hash
+            Dict com status ('pending'), nft_id, tx_id e transaction_hash
         """
         try:
             if not self.identity_nft_contract:
                 raise ValueError("Contrato de NFT não configurado")
             
-            # Criar conta a partir da chave privada
-            account = self.w3.eth.account.from_key(private_key)
-            
             # Converter metadata para bytes
             metadata_json = json.dumps(metadata)
             metadata_bytes = metadata_json.encode('utf-8')
             
-            # Preparar transação
+            # Enfileirar transação (retorna sem aguardar o receipt)
             checksum_address = Web3.to_checksum_address(wallet_address)
-            nonce = self.w3.eth.get_transaction_count(account.address)
-            
-            transaction = self.identity_nft_contract.functions.mintIdentityNFT(
-                checksum_address,
-                metadata_bytes,
-                previous_nft_id
-            ).build_transaction({
-                'from': account.address,
-                'nonce': nonce,
-                'gas': 300000,
-                'gasPrice': self.w3.eth.gas_price
-            })
-            
-            # Assinar transação
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, private_key)
-            
-            # Enviar transação
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            
-            # Aguardar confirmação
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
-            
-            # Extrair NFT ID dos logs (simplificado)
-            # Em produção, parse os eventos do receipt
+            
+            tx = self.tx_dispatcher.submit(
+                'mint_identity',
+                self.identity_nft_contract.functions.mintIdentityNFT(
+                    checksum_address,
+                    metadata_bytes,
+                    previous_nft_id
+                ),
+                private_key,
+                gas=300000,
+                context={**context, 'previous_nft_id': previous_nft_id} if context else None
+            )
+            
+            # NFT ID estimado (o receipt ainda não existe; o MintingEvent é ingerido pelo listener)
             nft_id = previous_nft_id + 1  # Simplificação
             
-            logger.info(f"✅ NFT {nft_id} mintado com sucesso para {wallet_address}: {tx_hash.hex()}")
+            logger.info(f"📤 Mint do NFT {nft_id} enviado para {wallet_address}: {tx['transaction_hash']} (tx_id {tx['tx_id']})")
             
             return {
-                'status': 'success',
+                'status': 'pending',
                 'nft_id': nft_id,
-                'transaction_hash': tx_hash.hex(),
-                'block_number': receipt['blockNumber'],
-                'gas_used': receipt['gasUsed']
+                'tx_id': tx['tx_id'],
+                'transaction_hash': tx['transaction_hash'],
+                'block_number': None,
+                'gas_used': None
             }
             
         except Exception as e:
             logger.error(f"❌ Erro ao mintar NFT: {str(e)}")
             raise
     
+    def _complete_mint(self, cur, row, status: str, receipt: Optional[Dict]):
+        """Conclusão de mint_identity: grava o NFT no usuário só após a confirmação"""
+        context = row['context']
+        if status != 'confirmed':
+            logger.error(f"❌ Mint do usuário {context['user_id']} falhou (tx_id {row['id']}): usuário não alterado")
+            return
+        
+        nft_id = minted_nft_id(self.identity_nft_contract, receipt, context['previous_nft_id'])
+        cur.execute("""
+            UPDATE users
+            SET nft_id = %s, nft_active = TRUE, nft_minted_at = NOW(), nft_transaction_hash = %s
+            WHERE id = %s
+        """, (nft_id, receipt['transactionHash'].hex(), context['user_id']))
+        logger.info(f"✅ NFT {nft_id} gravado para o usuário {context['user_id']} (tx_id {row['id']})")
+    
+    def _complete_cancel(self, cur, row, status: str, receipt: Optional[Dict]):
+        """Conclusão de cancel_nft: desativa o NFT e registra o cancelamento só após a confirmação"""
+        context = row['context']
+        if status != 'confirmed':
+            logger.error(f"❌ Cancelamento do NFT {context['nft_id']} falhou (tx_id {row['id']}): usuário não alterado")
+            return
+        
+        # Um mint confirmado depois pode já ter trocado o NFT do usuário
+        cur.execute("""
+            UPDATE users SET nft_active = FALSE WHERE id = %s AND nft_id = %s
+        """, (context['user_id'], context['nft_id']))
+        cur.execute("""
+            INSERT INTO nft_cancellations (user_id, old_nft_id, cancelled_at, transaction_hash, reason)
+            VALUES (%s, %s, NOW(), %s, %s)
+        """, (context['user_id'], context['nft_id'], receipt['transactionHash'].hex(), context.get('reason')))
+        logger.info(f"✅ Cancelamento do NFT {context['nft_id']} gravado (tx_id {row['id']})")
+    
     def register_proof(
         self,
         doc_hash: str,
@@ -312,50 +492,46 @@ class NFTManager:
             private_key: Chave privada para assinar a transação
             
         Returns:
-            Dict com status e transaction_hash
+            Dict com status ('pending'), tx_id e transaction_hash
         """
         try:
             if not self.proof_registry_contract:
                 raise ValueError("Contrato de ProofRegistry não configurado")
             
-            # Criar conta a partir da chave privada
-            account = self.w3.eth.account.from_key(private_key)
-            
-            # Preparar transação
-            nonce = self.w3.eth.get_transaction_count(account.address)
-            
-            transaction = self.proof_registry_contract.functions.registerProof(
-                doc_hash,
-                proof_url
-            ).build_transaction({
-                'from': account.address,
-                'nonce': nonce,
-                'gas': 200000,
-                'gasPrice': self.w3.eth.gas_price
-            })
-            
-            # Assinar transação
-            signed_txn = self.w3.eth.account.sign_transaction(transaction, private_key)
-            
-            # Enviar transação
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            
-            # Aguardar confirmação
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            # Enfileirar transação (retorna sem aguardar o receipt)
+            tx = self.tx_dispatcher.submit(
+                'register_proof',
+                self.proof_registry_contract.functions.registerProof(doc_hash, proof_url),
+                private_key,
+                gas=200000
+            )
             
-            logger.info(f"✅ Prova registrada com sucesso: {tx_hash.hex()}")
+            logger.info(f"📤 Registro de prova enviado: {tx['transaction_hash']} (tx_id {tx['tx_id']})")
             
             return {
-                'status': 'success',
-                'transaction_hash': tx_hash.hex(),
-                'block_number': receipt['blockNumber'],
-                'gas_used': receipt['gasUsed']
+                'status': 'pending',
+                'tx_id': tx['tx_id'],
+                'transaction_hash': tx['transaction_hash'],
+                'block_number': None,
+                'gas_used': None
             }
             
         except Exception as e:
             logger.error(f"❌ Erro ao registrar prova: {str(e)}")
             raise
     
+    def get_transaction_status(self, tx_id: int) -> Optional[Dict]:
+        """
+        Obtém o estado de uma transação enviada por este gerenciador
+        
+        Args:
+            tx_id: Handle retornado por mint_identity_nft, cancel_nft ou register_proof
+            
+        Returns:
+            Dict com status (pending, submitted, confirmed, failed), hashes e bloco
+        """
+        return self.tx_dispatcher.get_status(tx_id)
+    
     def verify_proof(self, doc_hash: str) -> bool:
         """
         Verifica se uma prova existe na blockchain
@@ -401,7 +577,7 @@ def check_active_nft(user_id: int) -> Optional[Dict]:
         Dict com informações do NFT ativo ou None
     """
     try:
-        from api.database import get_db_connection
+        from api.utils.db import get_db_connection
         
         conn = get_db_connection()
         cur = conn.cursor()
@@ -420,10 +596,10 @@ def check_active_nft(user_id: int) -> Optional[Dict]:
             return None
         
         return {
-            'nft_id': result[0],
-            'wallet_address': result[1],
-            'nft_active': result[2],
-            'nft_minted_at': result[3]
+            'nft_id': result['nft_id'],
+            'wallet_address': result['wallet_address'],
+            'nft_active': result['nft_active'],
+            'nft_minted_at': result['nft_minted_at']
         }
         
     except Exception as e:
@@ -442,7 +618,7 @@ def cancel_nft(user_id: int, nft_id: int) -> Dict:
         Dict com resultado da operação
     """
     try:
-        from api.database import get_db_connection
+        from api.utils.db import get_db_connection
         
         # TODO: Chamar contrato IdentityNFT.cancelNFT(nft_id)
         # Por enquanto, apenas simular
@@ -484,33 +660,88 @@ def cancel_nft(user_id: int, nft_id: int) -> Dict:
             'error': str(e)
         }
 
-def mint_nft(user_id: int, kyc_data: Dict) -> Dict:
+def _get_identity_contract(identity_nft_address: str):
+    """IdentityNFT usado no fluxo de KYC (Web3, ABI e contrato vêm do registro compartilhado)"""
+    rpc_url = os.getenv('POLYGON_RPC_URL', 'https://polygon-mumbai.g.alchemy.com/v2/demo')
+    w3 = get_web3(rpc_url)
+    
+    # ABI completa do deploy, com fallback para a ABI simplificada
+    identity_abi = load_abi('IdentityNFT', IDENTITY_NFT_ABI)
+    
+    return w3, get_contract(w3, identity_nft_address, identity_abi)
+
+def _save_minted_nft(user_id: int, nft_id: int, tx_hash: str, wallet_address: str) -> Dict:
+    """Grava o NFT mintado no usuário e monta o resultado final"""
+    from api.utils.db import get_db_connection
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    cur.execute("""
+        UPDATE users
+        SET nft_id = %s,
+            nft_active = TRUE,
+            nft_minted_at = NOW(),
+            nft_transaction_hash = %s
+        WHERE id = %s
+    """, (nft_id, tx_hash, user_id))
+    
+    conn.commit()
+    cur.close()
+    conn.close()
+    
+    logger.info(f"✅ NFT {nft_id} mintado para usuário {user_id} ({wallet_address})")
+    
+    return {
+        'success': True,
+        'nft_id': nft_id,
+        'tx_hash': tx_hash,
+        'wallet_address': wallet_address
+    }
+
+def _simulate_mint(user_id: int, wallet_address: str) -> Dict:
+    import random
+    import hashlib
+    
+    nft_id = random.randint(1000, 9999)
+    tx_hash = "0x" + hashlib.sha256(f"mint_{nft_id}_{wallet_address}".encode()).hexdigest()
+    return _save_minted_nft(user_id, nft_id, tx_hash, wallet_address)
+
+def submit_mint_nft(user_id: int, kyc_data: Dict, idempotency_key: Optional[str] = None,
+                    simulate_on_error: bool = False) -> Dict:
     """
-    Minta um novo NFT para o usuário
+    Envia o mint do NFT de identidade sem aguardar a confirmação
+    
+    Com os contratos configurados, a transação vai para a outbox do
+    tx_dispatcher e o resultado volta com pending=True; o mint é gravado
+    no usuário por complete_mint_nft depois do receipt. Em modo simulado
+    o resultado já é final.
     
     Args:
         user_id: ID do usuário
         kyc_data: Dados do KYC aprovado
+        idempotency_key: Chave repassada ao tx_dispatcher (reexecuções não reenviam o mint)
+        simulate_on_error: Simula o mint se o envio ao contrato falhar (comportamento de mint_nft)
         
     Returns:
         Dict com resultado da operação
     """
     try:
-        from api.database import get_db_connection
-        import hashlib
-        import json
+        from api.utils.db import get_db_connection
         
         # Obter dados do usuário
         conn = get_db_connection()
         cur = conn.cursor()
         
         cur.execute("""
-            SELECT wallet_address, email, name
+            SELECT wallet_address, email, name, nft_id
             FROM users
             WHERE id = %s
         """, (user_id,))
         
         user_data = cur.fetchone()
+        cur.close()
+        conn.close()
         
         if not user_data:
             return {
@@ -518,7 +749,7 @@ def mint_nft(user_id: int, kyc_data: Dict) -> Dict:
                 'error': 'Usuário não encontrado'
             }
         
-        wallet_address, email, name = user_data
+        wallet_address = user_data['wallet_address']
         
         # Se não tem carteira, criar uma
         if not wallet_address:
@@ -541,130 +772,168 @@ def mint_nft(user_id: int, kyc_data: Dict) -> Dict:
         # Se contratos não estão deployados ou está em mock mode, simular
         if mock_mode or identity_nft_address == '0x0000000000000000000000000000000000000000' or not deployer_private_key or deployer_private_key.startswith('0x0000'):
             logger.warning(f"⚠️  Contratos não deployados ou MOCK_MODE ativo - Simulando mint de NFT")
-            import random
-            nft_id = random.randint(1000, 9999)
-            tx_hash = "0x" + hashlib.sha256(f"mint_{nft_id}_{wallet_address}".encode()).hexdigest()
-        else:
-            # Usar contrato real
-            try:
-                logger.info(f"🎨 Mintando NFT real para {wallet_address}...")
-                
-                # Carregar ABI do contrato
-                import json
-                abi_path = os.path.join(os.path.dirname(__file__), '../../contracts/IdentityNFT.abi.json')
-                
-                if os.path.exists(abi_path):
-                    with open(abi_path, 'r') as f:
-                        identity_abi = json.load(f)
-                else:
-                    # Fallback para ABI simplificada
-                    identity_abi = IDENTITY_NFT_ABI
-                
-                # Conectar ao contrato
-                from web3 import Web3
-                rpc_url = os.getenv('POLYGON_RPC_URL', 'https://polygon-mumbai.g.alchemy.com/v2/demo')
-                w3 = Web3(Web3.HTTPProvider(rpc_url))
-                
-                if not w3.is_connected():
-                    raise Exception("Não foi possível conectar ao RPC")
-                
-                identity_contract = w3.eth.contract(
-                    address=Web3.to_checksum_address(identity_nft_address),
-                    abi=identity_abi
-                )
-                
-                # Preparar metadata
-                metadata = {
-                    'user_id': user_id,
-                    'email': email,
-                    'name': name,
-                    'kyc_approved': True,
-                    'kyc_data': kyc_data
-                }
-                metadata_json = json.dumps(metadata)
-                metadata_bytes = metadata_json.encode('utf-8')
-                
-                # Obter NFT anterior (se existir)
-                cur.execute("SELECT nft_id FROM users WHERE id = %s", (user_id,))
-                previous_nft = cur.fetchone()
-                previous_nft_id = int(previous_nft[0]) if previous_nft and previous_nft[0] else 0
-                
-                # Criar conta do deployer
-                from eth_account import Account
-                deployer_account = Account.from_key(deployer_private_key)
-                
-                # Preparar transação
-                nonce = w3.eth.get_transaction_count(deployer_account.address)
-                
-                transaction = identity_contract.functions.mintIdentityNFT(
+            return _simulate_mint(user_id, wallet_address)
+        
+        # Usar contrato real
+        try:
+            logger.info(f"🎨 Mintando NFT real para {wallet_address}...")
+            
+            from web3 import Web3
+            _, identity_contract = _get_identity_contract(identity_nft_address)
+            
+            # Preparar metadata
+            metadata = {
+                'user_id': user_id,
+                'email': user_data['email'],
+                'name': user_data['name'],
+                'kyc_approved': True,
+                'kyc_data': kyc_data
+            }
+            metadata_bytes = json.dumps(metadata).encode('utf-8')
+            
+            # NFT anterior (se existir)
+            previous_nft_id = int(user_data['nft_id']) if user_data['nft_id'] else 0
+            
+            # Enviar pela fila de transações: o nonce do deployer é
+            # compartilhado entre os workers e não pode ser lido da rede a cada envio
+            tx = nft_manager.tx_dispatcher.submit(
+                'mint_identity',
+                identity_contract.functions.mintIdentityNFT(
                     Web3.to_checksum_address(wallet_address),
                     metadata_bytes,
                     previous_nft_id
-                ).build_transaction({
-                    'from': deployer_account.address,
-                    'nonce': nonce,
-                    'gas': 500000,
-                    'gasPrice': w3.eth.gas_price,
-                    'chainId': w3.eth.chain_id
-                })
-                
-                # Assinar e enviar transação
-                signed_txn = w3.eth.account.sign_transaction(transaction, deployer_private_key)
-                tx_hash_bytes = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-                tx_hash = tx_hash_bytes.hex()
-                
-                logger.info(f"📤 Transação enviada: {tx_hash}")
-                logger.info(f"⏳ Aguardando confirmação...")
-                
-                # Aguardar confirmação
-                receipt = w3.eth.wait_for_transaction_receipt(tx_hash_bytes, timeout=120)
-                
-                # Extrair NFT ID dos eventos
-                logs = identity_contract.events.MintingEvent().process_receipt(receipt)
-                if logs:
-                    nft_id = int(logs[0]['args']['nftId'])
-                    logger.info(f"✅ NFT {nft_id} mintado com sucesso!")
-                else:
-                    # Fallback: incrementar ID anterior
-                    nft_id = previous_nft_id + 1
-                    logger.warning(f"⚠️  Não foi possível extrair NFT ID dos logs, usando {nft_id}")
-                
-            except Exception as contract_error:
-                logger.error(f"❌ Erro ao mintar NFT real: {str(contract_error)}")
-                logger.warning(f"⚠️  Fallback para simulação")
-                
-                # Fallback para simulação
-                import random
-                nft_id = random.randint(1000, 9999)
-                tx_hash = "0x" + hashlib.sha256(f"mint_{nft_id}_{wallet_address}".encode()).hexdigest()
+                ),
+                deployer_private_key,
+                gas=500000,
+                idempotency_key=idempotency_key
+            )
+            
+            logger.info(f"📤 Transação enviada: {tx['transaction_hash']}")
+            
+            return {
+                'success': True,
+                'pending': True,
+                'tx_id': tx['tx_id'],
+                'tx_hash': tx['transaction_hash'],
+                'previous_nft_id': previous_nft_id,
+                'wallet_address': wallet_address
+            }
+            
+        except Exception as contract_error:
+            logger.error(f"❌ Erro ao mintar NFT real: {str(contract_error)}")
+            if not simulate_on_error:
+                raise
+            
+            logger.warning(f"⚠️  Fallback para simulação")
+            return _simulate_mint(user_id, wallet_address)
         
-        # Atualizar banco de dados
-        cur.execute("""
-            UPDATE users
-            SET nft_id = %s,
-                nft_active = TRUE,
-                nft_minted_at = NOW(),
-                nft_transaction_hash = %s
-            WHERE id = %s
-        """, (nft_id, tx_hash, user_id))
+    except Exception as e:
+        logger.error(f"❌ Erro ao mintar NFT: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+def minted_nft_id(contract, receipt, previous_nft_id: int) -> int:
+    """
+    Extrai o ID do NFT do MintingEvent do receipt
+    
+    Args:
+        contract: Contrato IdentityNFT usado para decodificar o evento
+        receipt: Receipt da transação de mint
+        previous_nft_id: NFT anterior (fallback: previous_nft_id + 1)
         
-        conn.commit()
-        cur.close()
-        conn.close()
+    Returns:
+        ID do NFT mintado
+    """
+    logs = contract.events.MintingEvent().process_receipt(receipt)
+    if logs:
+        nft_id = int(logs[0]['args']['nftId'])
+        logger.info(f"✅ NFT {nft_id} mintado com sucesso!")
+    else:
+        # Fallback: incrementar ID anterior
+        nft_id = previous_nft_id + 1
+        logger.warning(f"⚠️  Não foi possível extrair NFT ID dos logs, usando {nft_id}")
+    return nft_id
+
+def complete_mint_nft(user_id: int, tx_id: int, previous_nft_id: int, wallet_address: str) -> Dict:
+    """
+    Conclui um mint enviado por submit_mint_nft, sem bloquear
+    
+    Args:
+        user_id: ID do usuário
+        tx_id: Handle da transação na outbox
+        previous_nft_id: NFT anterior (fallback para o ID se o evento não vier no receipt)
+        wallet_address: Carteira que recebeu o NFT
         
-        logger.info(f"✅ NFT {nft_id} mintado para usuário {user_id} ({wallet_address})")
+    Returns:
+        Dict com o resultado final, ou pending=True se a transação ainda não foi confirmada
+    """
+    try:
+        status = nft_manager.tx_dispatcher.get_status(tx_id)
         
-        return {
-            'success': True,
-            'nft_id': nft_id,
-            'tx_hash': tx_hash,
-            'wallet_address': wallet_address
-        }
+        if not status:
+            return {'success': False, 'error': f'Transação {tx_id} não encontrada'}
+        
+        if status['status'] == 'failed':
+            return {'success': False, 'tx_failed': True, 'error': f"Transação {tx_id} falhou: {status['last_error']}"}
+        
+        if status['status'] != 'confirmed':
+            return {'success': False, 'pending': True, 'tx_id': tx_id}
+        
+        identity_nft_address = os.getenv('IDENTITY_NFT_ADDRESS', '0x0000000000000000000000000000000000000000')
+        w3, identity_contract = _get_identity_contract(identity_nft_address)
+        receipt = w3.eth.get_transaction_receipt(status['transaction_hash'])
+        tx_hash = receipt['transactionHash'].hex()
+        
+        nft_id = minted_nft_id(identity_contract, receipt, previous_nft_id)
+        
+        return _save_minted_nft(user_id, nft_id, tx_hash, wallet_address)
         
     except Exception as e:
-        logger.error(f"❌ Erro ao mintar NFT: {str(e)}")
+        logger.error(f"❌ Erro ao concluir mint de NFT: {str(e)}")
         return {
             'success': False,
             'error': str(e)
         }
 
+def mint_nft(user_id: int, kyc_data: Dict) -> Dict:
+    """
+    Minta um novo NFT para o usuário e aguarda a confirmação
+    
+    Bloqueia até 120s pelo receipt; o webhook de KYC usa submit_mint_nft e
+    complete_mint_nft pelo webhook_jobs em vez desta função.
+    
+    Args:
+        user_id: ID do usuário
+        kyc_data: Dados do KYC aprovado
+        
+    Returns:
+        Dict com resultado da operação
+    """
+    result = submit_mint_nft(user_id, kyc_data, simulate_on_error=True)
+    if not result.get('pending'):
+        return result
+    
+    try:
+        # Aguardar confirmação (o worker do dispatcher acompanha o receipt e faz bump de gas)
+        logger.info(f"⏳ Aguardando confirmação...")
+        nft_manager.tx_dispatcher.wait_for_receipt(result['tx_id'], timeout=120)
+        
+        completed = complete_mint_nft(user_id, result['tx_id'], result['previous_nft_id'], result['wallet_address'])
+        if not completed['success']:
+            raise RuntimeError(completed.get('error'))
+        return completed
+        
+    except Exception as contract_error:
+        logger.error(f"❌ Erro ao mintar NFT real: {str(contract_error)}")
+        logger.warning(f"⚠️  Fallback para simulação")
+        
+        try:
+            return _simulate_mint(user_id, result['wallet_address'])
+        except Exception as e:
+            logger.error(f"❌ Erro ao mintar NFT: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
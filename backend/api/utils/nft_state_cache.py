@@ -0,0 +1,225 @@
+"""
+Cache de Estado On-chain dos NFTs
+Visão por processo de getActiveNFT/isActiveNFT por carteira, preenchida sob
+demanda (read-through) e limitada por TTL e tamanho. O NFT ativo só muda em
+MintingEvent, CancelamentoEvent, CancelamentoSimples e FailsafeEvent; o
+listener grava uma invalidação por evento em nft_state_invalidations e uma
+thread por processo lê as novas a cada NFT_STATE_REFRESH_INTERVAL segundos,
+removendo apenas as carteiras afetadas.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from api.utils.db import db_connection
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+NFT_STATE_CACHE_TTL = int(os.getenv('NFT_STATE_CACHE_TTL', '300'))  # segundos de validade de uma entrada mesmo sem invalidação
+NFT_STATE_CACHE_SIZE = int(os.getenv('NFT_STATE_CACHE_SIZE', '10000'))  # carteiras mantidas por processo (LRU)
+NFT_STATE_REFRESH_INTERVAL = int(os.getenv('NFT_STATE_REFRESH_INTERVAL', '5'))  # segundos entre leituras de invalidações
+NFT_STATE_MAX_STALENESS = int(os.getenv('NFT_STATE_MAX_STALENESS', '60'))  # sem leitura recente, consulta direto o RPC
+NFT_STATE_PULL_LIMIT = 1000  # invalidações lidas por consulta
+
+class NFTStateCache:
+    """
+    LRU de estado on-chain por carteira, invalidado pelos eventos do listener
+
+    Cada entrada guarda nft_id, is_active e o bloco da última mudança vista
+    para a carteira. Eventos de cancelamento só trazem o tokenId, por isso o
+    cache também mapeia tokenId -> carteira. Uma invalidação sem carteira e
+    sem token (reorg) limpa o cache inteiro.
+
+    Enquanto as invalidações não forem lidas pela primeira vez, ou se a
+    última leitura for mais antiga que NFT_STATE_MAX_STALENESS, as consultas
+    vão direto ao RPC e nada é guardado.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tokens = {}
+        self._blocks = OrderedDict()
+        self._generation = 0
+        self._cursor = None
+        self._refreshed_at = 0.0
+        self._worker = None
+        self._worker_pid = None
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'bypassed': 0,
+            'invalidations': 0,
+            'evicted': 0
+        }
+
+    def start_worker(self):
+        """Inicia a thread de leitura de invalidações (uma por processo, inclusive após fork)"""
+        with self._lock:
+            if self._worker and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            self._worker = threading.Thread(target=self._run_worker, name='nft-state-cache', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def _run_worker(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"❌ Erro ao ler invalidações de estado de NFT: {str(e)}")
+            time.sleep(NFT_STATE_REFRESH_INTERVAL)
+
+    def refresh(self):
+        """
+        Aplica as invalidações gravadas desde a última leitura
+
+        O cursor é o id da tabela: o listener é o único escritor e grava em
+        uma transação por janela de blocos, então os ids ficam visíveis em
+        ordem. Na primeira leitura o cache está vazio e o cursor começa no
+        maior id existente.
+        """
+        with db_connection() as conn:
+            cur = conn.cursor()
+            rows = []
+            if self._cursor is None:
+                cur.execute("SELECT COALESCE(MAX(id), 0) AS last_id FROM nft_state_invalidations")
+                cursor = cur.fetchone()['last_id']
+            else:
+                cursor = self._cursor
+                while True:
+                    cur.execute("""
+                        SELECT id, wallet_address, token_id, block_number
+                        FROM nft_state_invalidations
+                        WHERE id > %s
+                        ORDER BY id
+                        LIMIT %s
+                    """, (cursor, NFT_STATE_PULL_LIMIT))
+                    page = cur.fetchall()
+                    rows.extend(page)
+                    if page:
+                        cursor = page[-1]['id']
+                    if len(page) < NFT_STATE_PULL_LIMIT:
+                        break
+            cur.close()
+
+        with self._lock:
+            for row in rows:
+                self._invalidate(row['wallet_address'], row['token_id'], row['block_number'])
+            self._cursor = cursor
+            self._refreshed_at = time.time()
+
+        if rows:
+            logger.info(f"♻️ {len(rows)} invalidação(ões) de estado de NFT aplicadas")
+
+    def _invalidate(self, wallet_address: Optional[str], token_id: Optional[str], block_number: Optional[int]):
+        self._generation += 1
+        self._stats['invalidations'] += 1
+
+        if wallet_address is None and token_id is None:
+            self._entries.clear()
+            self._tokens.clear()
+            return
+
+        wallets = set()
+        if wallet_address:
+            wallets.add(wallet_address.lower())
+        if token_id is not None:
+            owner = self._tokens.pop(str(token_id), None)
+            if owner:
+                wallets.add(owner)
+
+        for wallet in wallets:
+            self._drop(wallet)
+            if block_number is not None and block_number > self._blocks.get(wallet, -1):
+                self._blocks[wallet] = block_number
+                self._blocks.move_to_end(wallet)
+                while len(self._blocks) > NFT_STATE_CACHE_SIZE:
+                    self._blocks.popitem(last=False)
+
+    def _drop(self, wallet: str):
+        entry = self._entries.pop(wallet, None)
+        if entry and entry['nft_id'] is not None:
+            self._tokens.pop(str(entry['nft_id']), None)
+
+    def _store(self, wallet: str, status: Dict):
+        self._drop(wallet)
+        self._entries[wallet] = {
+            'nft_id': status['nft_id'],
+            'is_active': status['is_active'],
+            'block': self._blocks.get(wallet),
+            'expires_at': time.time() + NFT_STATE_CACHE_TTL
+        }
+        if status['nft_id'] is not None:
+            self._tokens[str(status['nft_id'])] = wallet
+
+        while len(self._entries) > NFT_STATE_CACHE_SIZE:
+            _, evicted = self._entries.popitem(last=False)
+            self._stats['evicted'] += 1
+            if evicted['nft_id'] is not None:
+                self._tokens.pop(str(evicted['nft_id']), None)
+
+    def get_status_batch(self, wallet_addresses: List[str], fetch: Callable[[List[str]], Dict[str, Dict]]) -> Dict[str, Dict]:
+        """
+        Estado on-chain de várias carteiras, consultando o RPC só para as ausentes
+
+        Args:
+            wallet_addresses: Carteiras consultadas
+            fetch: Callable(carteiras) -> {carteira: {'nft_id', 'is_active'}}
+                usado para as carteiras fora do cache (ex: get_nft_status_batch);
+                carteiras cuja leitura falhou devem ficar fora do retorno
+
+        Returns:
+            Dict carteira (como recebida) -> {'nft_id', 'is_active'}, sem as
+            carteiras que não puderam ser lidas (que também não entram no cache)
+        """
+        self.start_worker()
+
+        result = {}
+        missing = []
+        now = time.time()
+
+        with self._lock:
+            fresh = self._cursor is not None and now - self._refreshed_at < NFT_STATE_MAX_STALENESS
+            generation = self._generation
+            for wallet_address in wallet_addresses:
+                entry = self._entries.get(wallet_address.lower()) if fresh else None
+                if entry and entry['expires_at'] > now:
+                    self._entries.move_to_end(wallet_address.lower())
+                    result[wallet_address] = {'nft_id': entry['nft_id'], 'is_active': entry['is_active']}
+                    self._stats['hits'] += 1
+                else:
+                    missing.append(wallet_address)
+            self._stats['misses' if fresh else 'bypassed'] += len(missing)
+
+        if not missing:
+            return result
+
+        fetched = fetch(missing)
+        result.update(fetched)
+
+        with self._lock:
+            # Uma invalidação durante a consulta pode ter chegado depois da leitura no RPC
+            if fresh and generation == self._generation:
+                for wallet_address, status in fetched.items():
+                    self._store(wallet_address.lower(), status)
+
+        return result
+
+    def get_stats(self) -> Dict:
+        """Tamanho do cache, contadores e idade da última leitura de invalidações"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['max_entries'] = NFT_STATE_CACHE_SIZE
+            stats['cursor'] = self._cursor
+            stats['refreshed_seconds_ago'] = round(time.time() - self._refreshed_at, 1) if self._refreshed_at else None
+        return stats
+
+# Instância global
+nft_state_cache = NFTStateCache()
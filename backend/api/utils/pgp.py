@@ -8,19 +8,90 @@ import hashlib
 import logging
 import os
 import tempfile
+import threading
+from collections import OrderedDict
+from .pgp_native import NativeKeyring, PGPError
+from .fs_utils import ensure_private_dir
 
 logger = logging.getLogger(__name__)
 
-# Diretório temporário para GPG
-GPG_HOME = tempfile.mkdtemp()
+# Keyring persistente: chaves já importadas sobrevivem a restarts do processo
+GPG_HOME = os.getenv('PGP_GNUPGHOME', os.path.join(tempfile.gettempdir(), 'blocktrust-gnupg'))
+PGP_KEY_CACHE_SIZE = int(os.getenv('PGP_KEY_CACHE_SIZE', '1024'))  # chaves mantidas no LRU em memória
+PGP_BACKEND = os.getenv('PGP_BACKEND', 'gnupg')  # gnupg (subprocesso gpg) ou native (verificação em processo)
+
+# Em /tmp outro usuário poderia criar o diretório antes e plantar chaves
+ensure_private_dir(GPG_HOME)
 gpg = gnupg.GPG(gnupghome=GPG_HOME)
 
-def import_public_key(armored_pubkey):
+# LRU fingerprint -> informações da chave importada, e hash do armored -> fingerprint
+_key_cache = OrderedDict()
+_armor_index = {}
+_cache_lock = threading.Lock()
+
+# Backend nativo: chaves interpretadas em processo, sem gpg
+native_keyring = NativeKeyring(PGP_KEY_CACHE_SIZE)
+
+def _armor_digest(armored_pubkey):
+    return hashlib.sha256(armored_pubkey.strip().encode('utf-8')).hexdigest()
+
+def _cache_get(fingerprint):
+    with _cache_lock:
+        info = _key_cache.get(fingerprint)
+        if info:
+            _key_cache.move_to_end(fingerprint)
+        return info
+
+def _cache_put(info, armor_digest=None):
+    with _cache_lock:
+        fingerprint = info['fingerprint'].upper()
+        _key_cache[fingerprint] = info
+        _key_cache.move_to_end(fingerprint)
+        if armor_digest:
+            _armor_index[armor_digest] = fingerprint
+        
+        while len(_key_cache) > PGP_KEY_CACHE_SIZE:
+            evicted, _ = _key_cache.popitem(last=False)
+            for digest in [d for d, fp in _armor_index.items() if fp == evicted]:
+                del _armor_index[digest]
+
+def _lookup_key(fingerprint):
+    """
+    Busca uma chave no keyring pelo fingerprint (sem listar o keyring inteiro)
+    
+    Returns:
+        dict com fingerprint, key_id, uids, length, algo (ou None)
+    """
+    info = _cache_get(fingerprint.upper())
+    if info:
+        return info
+    
+    keys = gpg.list_keys(keys=[fingerprint])
+    key_info = next((k for k in keys if k['fingerprint'].upper() == fingerprint.upper()), None)
+    
+    if not key_info:
+        return None
+    
+    info = {
+        'fingerprint': key_info['fingerprint'],
+        'key_id': key_info['keyid'],
+        'uids': key_info['uids'],
+        'length': key_info['length'],
+        'algo': key_info['algo']
+    }
+    _cache_put(info)
+    return info
+
+def import_public_key(armored_pubkey, fingerprint=None):
     """
     Importa uma chave pública PGP
     
+    Chaves já importadas (mesmo fingerprint ou mesmo armored) são atendidas
+    pelo cache em memória ou pelo keyring persistente, sem nova importação.
+    
     Args:
         armored_pubkey: Chave pública em formato armored (ASCII)
+        fingerprint: Fingerprint esperado (opcional, permite pular a importação)
     
     Returns:
         dict: {
@@ -31,7 +102,25 @@ def import_public_key(armored_pubkey):
             'error': str (se falhar)
         }
     """
+    if PGP_BACKEND == 'native':
+        return _native_import_public_key(armored_pubkey, fingerprint)
+    
     try:
+        # Chave conhecida: nada a importar
+        if fingerprint:
+            key_info = _lookup_key(fingerprint)
+            if key_info:
+                return {'success': True, **key_info}
+        
+        armor_digest = _armor_digest(armored_pubkey)
+        with _cache_lock:
+            cached_fingerprint = _armor_index.get(armor_digest)
+        
+        if cached_fingerprint:
+            key_info = _cache_get(cached_fingerprint)
+            if key_info:
+                return {'success': True, **key_info}
+        
         import_result = gpg.import_keys(armored_pubkey)
         
         if not import_result.fingerprints:
@@ -40,11 +129,12 @@ def import_public_key(armored_pubkey):
                 'error': 'Nenhuma chave válida encontrada'
             }
         
-        fingerprint = import_result.fingerprints[0]
+        imported_fingerprint = import_result.fingerprints[0]
         
-        # Obter informações da chave
-        keys = gpg.list_keys()
-        key_info = next((k for k in keys if k['fingerprint'] == fingerprint), None)
+        # Obter informações da chave (relidas do keyring: a importação pode ter atualizado UIDs)
+        with _cache_lock:
+            _key_cache.pop(imported_fingerprint.upper(), None)
+        key_info = _lookup_key(imported_fingerprint)
         
         if not key_info:
             return {
@@ -52,16 +142,11 @@ def import_public_key(armored_pubkey):
                 'error': 'Erro ao obter informações da chave'
             }
         
-        logger.info(f"✅ Chave PGP importada: {fingerprint[:16]}...")
+        _cache_put(key_info, armor_digest)
         
-        return {
-            'success': True,
-            'fingerprint': fingerprint,
-            'key_id': key_info['keyid'],
-            'uids': key_info['uids'],
-            'length': key_info['length'],
-            'algo': key_info['algo']
-        }
+        logger.info(f"✅ Chave PGP importada: {imported_fingerprint[:16]}...")
+        
+        return {'success': True, **key_info}
         
     except Exception as e:
         logger.error(f"❌ Erro ao importar chave PGP: {str(e)}")
@@ -70,6 +155,25 @@ def import_public_key(armored_pubkey):
             'error': str(e)
         }
 
+def _native_import_public_key(armored_pubkey, fingerprint=None):
+    try:
+        key = native_keyring.get(fingerprint) if fingerprint else None
+        if not key:
+            key = native_keyring.import_key(armored_pubkey)
+        return {'success': True, **key.info()}
+    
+    except PGPError as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+    except Exception as e:
+        logger.error(f"❌ Erro ao interpretar chave PGP: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
 def verify_signature(data, signature, fingerprint):
     """
     Verifica uma assinatura PGP
@@ -92,8 +196,14 @@ def verify_signature(data, signature, fingerprint):
         if isinstance(data, str):
             data = data.encode('utf-8')
         
-        # Verificar assinatura
-        verified = gpg.verify_data(signature, data)
+        if PGP_BACKEND == 'native':
+            return native_keyring.verify(data, signature, fingerprint)
+        
+        # Verificar assinatura (verify_data recebe o caminho do arquivo da assinatura)
+        with tempfile.NamedTemporaryFile('w', suffix='.asc', dir=GPG_HOME) as sig_file:
+            sig_file.write(signature)
+            sig_file.flush()
+            verified = gpg.verify_data(sig_file.name, data)
         
         if not verified:
             return {
@@ -101,8 +211,9 @@ def verify_signature(data, signature, fingerprint):
                 'error': 'Assinatura inválida ou chave não encontrada'
             }
         
-        # Verificar se o fingerprint corresponde
-        if verified.fingerprint.upper() != fingerprint.upper():
+        # Verificar se o fingerprint corresponde (assinaturas de subchave trazem o da primária em pubkey_fingerprint)
+        signer_fingerprints = {(verified.fingerprint or '').upper(), (verified.pubkey_fingerprint or '').upper()}
+        if fingerprint.upper() not in signer_fingerprints:
             return {
                 'valid': False,
                 'error': f'Fingerprint não corresponde: esperado {fingerprint}, obtido {verified.fingerprint}'
@@ -135,10 +246,11 @@ def get_public_key(fingerprint):
         str: Chave pública em formato armored (ou None se não encontrada)
     """
     try:
-        keys = gpg.list_keys()
-        key_info = next((k for k in keys if k['fingerprint'] == fingerprint), None)
+        if PGP_BACKEND == 'native':
+            key = native_keyring.get(fingerprint)
+            return key.armored if key else None
         
-        if not key_info:
+        if not _lookup_key(fingerprint):
             return None
         
         # Exportar chave
@@ -186,11 +298,14 @@ def fingerprint_to_bytes20(fingerprint):
     return '0x' + fp_bytes20
 
 def cleanup():
-    """Remove diretório temporário do GPG"""
+    """Remove o keyring do GPG e limpa o cache de chaves"""
     import shutil
     try:
+        with _cache_lock:
+            _key_cache.clear()
+            _armor_index.clear()
         shutil.rmtree(GPG_HOME)
-        logger.info("✅ Diretório GPG temporário removido")
+        logger.info("✅ Diretório GPG removido")
     except Exception as e:
         logger.error(f"❌ Erro ao remover diretório GPG: {str(e)}")
 
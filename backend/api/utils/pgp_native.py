@@ -0,0 +1,456 @@
+"""
+Verificação OpenPGP em processo - Blocktrust v1.4
+Backend alternativo ao python-gnupg (PGP_BACKEND=native): interpreta chaves
+públicas e assinaturas destacadas em formato armored (RFC 4880, pacotes v4)
+usando apenas a biblioteca cryptography, sem subprocessos gpg nem arquivos
+temporários. As chaves interpretadas ficam em um LRU por fingerprint.
+
+Suporta RSA, EdDSA (Ed25519) e ECDSA (P-256/384/521); subchaves só são
+aceitas com assinatura de vínculo válida da chave primária, e chaves ou
+subchaves revogadas/expiradas são rejeitadas.
+"""
+
+import base64
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+from cryptography.hazmat.primitives.asymmetric.utils import Prehashed, encode_dss_signature
+
+logger = logging.getLogger(__name__)
+
+class PGPError(ValueError):
+    """Chave ou assinatura OpenPGP inválida ou não suportada"""
+
+# Tags de pacote
+TAG_SIGNATURE = 2
+TAG_PUBLIC_KEY = 6
+TAG_USER_ID = 13
+TAG_PUBLIC_SUBKEY = 14
+
+# Algoritmos de chave pública
+ALGO_RSA = (1, 3)
+ALGO_ECDSA = 19
+ALGO_EDDSA = 22
+
+HASH_ALGORITHMS = {
+    2: (hashlib.sha1, hashes.SHA1),
+    8: (hashlib.sha256, hashes.SHA256),
+    9: (hashlib.sha384, hashes.SHA384),
+    10: (hashlib.sha512, hashes.SHA512),
+    11: (hashlib.sha224, hashes.SHA224)
+}
+
+CURVE_OIDS = {
+    bytes.fromhex('2A8648CE3D030107'): ec.SECP256R1,
+    bytes.fromhex('2B81040022'): ec.SECP384R1,
+    bytes.fromhex('2B81040023'): ec.SECP521R1
+}
+ED25519_OID = bytes.fromhex('2B06010401DA470F01')
+
+# Tipos de assinatura
+SIG_BINARY = 0x00
+SIG_TEXT = 0x01
+SIG_CERTIFICATIONS = (0x10, 0x11, 0x12, 0x13)
+SIG_SUBKEY_BINDING = 0x18
+SIG_KEY_REVOCATION = 0x20
+SIG_SUBKEY_REVOCATION = 0x28
+
+# Subpacotes
+SUB_CREATION_TIME = 2
+SUB_KEY_EXPIRATION = 9
+SUB_ISSUER = 16
+SUB_ISSUER_FINGERPRINT = 33
+
+# Decodificação
+
+def dearmor(armored: str) -> bytes:
+    """Remove o armor ASCII (cabeçalhos e CRC24) e retorna os pacotes binários"""
+    lines = armored.strip().replace('\r', '').split('\n')
+
+    if not lines or not lines[0].startswith('-----BEGIN PGP'):
+        raise PGPError('Bloco armored inválido')
+
+    body = []
+    in_body = False
+    for line in lines[1:]:
+        if line.startswith('-----END PGP'):
+            break
+        if not in_body:
+            # Cabeçalhos (Version:, Comment:) terminam na primeira linha vazia
+            if not line.strip():
+                in_body = True
+            elif ':' not in line:
+                in_body = True
+                body.append(line.strip())
+            continue
+        if line.startswith('='):
+            break
+        body.append(line.strip())
+
+    try:
+        return base64.b64decode(''.join(body), validate=True)
+    except Exception:
+        raise PGPError('Conteúdo base64 inválido no bloco armored')
+
+def _read_length(data: bytes, pos: int) -> Tuple[int, int, bool]:
+    # Comprimento de pacote no formato novo; retorna (tamanho, nova posição, parcial)
+    first = data[pos]
+    if first < 192:
+        return first, pos + 1, False
+    if first < 224:
+        return ((first - 192) << 8) + data[pos + 1] + 192, pos + 2, False
+    if first == 255:
+        return int.from_bytes(data[pos + 1:pos + 5], 'big'), pos + 5, False
+    return 1 << (first & 0x1f), pos + 1, True
+
+def parse_packets(data: bytes) -> List[Tuple[int, bytes]]:
+    """Divide uma sequência binária OpenPGP em (tag, corpo)"""
+    packets = []
+    pos = 0
+    try:
+        while pos < len(data):
+            header = data[pos]
+            if not header & 0x80:
+                raise PGPError('Cabeçalho de pacote inválido')
+
+            if header & 0x40:
+                tag = header & 0x3f
+                length, pos, partial = _read_length(data, pos + 1)
+                body = data[pos:pos + length]
+                pos += length
+                while partial:
+                    length, pos, partial = _read_length(data, pos)
+                    body += data[pos:pos + length]
+                    pos += length
+            else:
+                tag = (header >> 2) & 0x0f
+                length_type = header & 0x03
+                pos += 1
+                if length_type == 3:
+                    length = len(data) - pos
+                else:
+                    size = 1 << length_type
+                    length = int.from_bytes(data[pos:pos + size], 'big')
+                    pos += size
+                body = data[pos:pos + length]
+                pos += length
+
+            if pos > len(data):
+                raise PGPError('Pacote truncado')
+            packets.append((tag, body))
+    except IndexError:
+        raise PGPError('Pacote truncado')
+    return packets
+
+def _read_mpi(data: bytes, pos: int) -> Tuple[int, int]:
+    bits = int.from_bytes(data[pos:pos + 2], 'big')
+    size = (bits + 7) // 8
+    return int.from_bytes(data[pos + 2:pos + 2 + size], 'big'), pos + 2 + size
+
+def _read_subpackets(data: bytes) -> List[Tuple[int, bytes]]:
+    subpackets = []
+    pos = 0
+    while pos < len(data):
+        first = data[pos]
+        if first < 192:
+            length, pos = first, pos + 1
+        elif first < 255:
+            length, pos = ((first - 192) << 8) + data[pos + 1] + 192, pos + 2
+        else:
+            length, pos = int.from_bytes(data[pos + 1:pos + 5], 'big'), pos + 5
+        subpackets.append((data[pos] & 0x7f, data[pos + 1:pos + length]))
+        pos += length
+    return subpackets
+
+# Estruturas
+
+class PublicKeyPacket:
+    """Chave pública (primária ou subchave) v4"""
+
+    def __init__(self, body: bytes):
+        if not body or body[0] != 4:
+            raise PGPError(f'Versão de chave não suportada: {body[0] if body else None}')
+
+        self.body = body
+        self.created = int.from_bytes(body[1:5], 'big')
+        self.algo = body[5]
+        self.fingerprint = hashlib.sha1(self.material()).hexdigest().upper()
+        self.key_id = self.fingerprint[-16:]
+        self.expires = None
+        self.revoked = False
+        self._key, self.length = self._load_key(body[6:])
+
+    def material(self) -> bytes:
+        """Bytes usados no fingerprint e nas assinaturas sobre a chave"""
+        return b'\x99' + len(self.body).to_bytes(2, 'big') + self.body
+
+    def _load_key(self, data: bytes):
+        if self.algo in ALGO_RSA:
+            n, pos = _read_mpi(data, 0)
+            e, _ = _read_mpi(data, pos)
+            return rsa.RSAPublicNumbers(e, n).public_key(), n.bit_length()
+
+        if self.algo not in (ALGO_ECDSA, ALGO_EDDSA):
+            # DSA/ElGamal/ECDH: chave presente mas não usada por este backend
+            return None, 0
+
+        oid = data[1:1 + data[0]]
+        point, _ = _read_mpi(data, 1 + data[0])
+        point_bytes = point.to_bytes((point.bit_length() + 7) // 8, 'big')
+
+        if self.algo == ALGO_EDDSA and oid == ED25519_OID:
+            return Ed25519PublicKey.from_public_bytes(point_bytes[1:]), 255
+
+        if self.algo == ALGO_ECDSA and oid in CURVE_OIDS:
+            curve = CURVE_OIDS[oid]()
+            return ec.EllipticCurvePublicKey.from_encoded_point(curve, point_bytes), curve.key_size
+
+        return None, 0
+
+    def verify_digest(self, signature: 'SignaturePacket', digest: bytes) -> bool:
+        if self._key is None or signature.pubkey_algo != self.algo:
+            return False
+
+        hash_cls = HASH_ALGORITHMS[signature.hash_algo][1]
+        try:
+            if self.algo in ALGO_RSA:
+                size = (self._key.key_size + 7) // 8
+                self._key.verify(signature.values[0].to_bytes(size, 'big'), digest,
+                                 padding.PKCS1v15(), Prehashed(hash_cls()))
+            elif self.algo == ALGO_EDDSA:
+                r, s = signature.values
+                self._key.verify(r.to_bytes(32, 'big') + s.to_bytes(32, 'big'), digest)
+            else:
+                r, s = signature.values
+                self._key.verify(encode_dss_signature(r, s), digest, ec.ECDSA(Prehashed(hash_cls())))
+            return True
+        except (InvalidSignature, OverflowError, ValueError):
+            return False
+
+    def is_usable(self, at: float) -> bool:
+        return not self.revoked and (self.expires is None or at < self.expires)
+
+class SignaturePacket:
+    """Assinatura v4"""
+
+    def __init__(self, body: bytes):
+        if len(body) < 6 or body[0] != 4:
+            raise PGPError(f'Versão de assinatura não suportada: {body[0] if body else None}')
+
+        self.sig_type = body[1]
+        self.pubkey_algo = body[2]
+        self.hash_algo = body[3]
+
+        if self.hash_algo not in HASH_ALGORITHMS:
+            raise PGPError(f'Algoritmo de hash não suportado: {self.hash_algo}')
+
+        hashed_len = int.from_bytes(body[4:6], 'big')
+        self.hashed_part = body[:6 + hashed_len]
+        hashed = _read_subpackets(body[6:6 + hashed_len])
+
+        pos = 6 + hashed_len
+        unhashed_len = int.from_bytes(body[pos:pos + 2], 'big')
+        unhashed = _read_subpackets(body[pos + 2:pos + 2 + unhashed_len])
+        pos += 2 + unhashed_len
+
+        self.left16 = body[pos:pos + 2]
+        pos += 2
+        count = 1 if self.pubkey_algo in ALGO_RSA else 2
+        self.values = []
+        for _ in range(count):
+            value, pos = _read_mpi(body, pos)
+            self.values.append(value)
+
+        self.created = None
+        self.key_expiration = None
+        self.issuer_fingerprint = None
+        self.issuer_key_id = None
+        for sub_type, sub_data in hashed:
+            if sub_type == SUB_CREATION_TIME:
+                self.created = int.from_bytes(sub_data, 'big')
+            elif sub_type == SUB_KEY_EXPIRATION:
+                self.key_expiration = int.from_bytes(sub_data, 'big')
+        for sub_type, sub_data in hashed + unhashed:
+            if sub_type == SUB_ISSUER_FINGERPRINT and sub_data[:1] == b'\x04':
+                self.issuer_fingerprint = sub_data[1:].hex().upper()
+            elif sub_type == SUB_ISSUER:
+                self.issuer_key_id = sub_data.hex().upper()
+
+    def digest(self, signed_data: bytes) -> bytes:
+        hasher = HASH_ALGORITHMS[self.hash_algo][0]()
+        hasher.update(signed_data)
+        hasher.update(self.hashed_part)
+        hasher.update(b'\x04\xff' + len(self.hashed_part).to_bytes(4, 'big'))
+        return hasher.digest()
+
+    def verify(self, key: PublicKeyPacket, signed_data: bytes) -> bool:
+        digest = self.digest(signed_data)
+        if digest[:2] != self.left16:
+            return False
+        return key.verify_digest(self, digest)
+
+class NativePublicKey:
+    """Chave pública OpenPGP interpretada (primária, UIDs e subchaves vinculadas)"""
+
+    def __init__(self, armored: str):
+        packets = parse_packets(dearmor(armored))
+
+        if not packets or packets[0][0] != TAG_PUBLIC_KEY:
+            raise PGPError('Nenhuma chave válida encontrada')
+
+        self.armored = armored.strip()
+        self.primary = PublicKeyPacket(packets[0][1])
+        self.uids: List[str] = []
+        self.subkeys: List[PublicKeyPacket] = []
+
+        current_uid = None
+        current_subkey = None
+        certification_time = -1
+
+        for tag, body in packets[1:]:
+            if tag == TAG_PUBLIC_KEY:
+                break  # Apenas a primeira chave do bloco
+            if tag == TAG_USER_ID:
+                current_uid, current_subkey = body, None
+                self.uids.append(body.decode('utf-8', errors='replace'))
+            elif tag == TAG_PUBLIC_SUBKEY:
+                current_uid, current_subkey = None, PublicKeyPacket(body)
+            elif tag == TAG_SIGNATURE:
+                try:
+                    signature = SignaturePacket(body)
+                except PGPError:
+                    continue
+                certification_time = self._apply_self_signature(signature, current_uid, current_subkey, certification_time)
+
+    def _apply_self_signature(self, signature, uid, subkey, certification_time):
+        primary = self.primary
+        base = primary.material()
+
+        if signature.sig_type == SIG_KEY_REVOCATION and uid is None and subkey is None:
+            if signature.verify(primary, base):
+                primary.revoked = True
+
+        elif signature.sig_type in SIG_CERTIFICATIONS and uid is not None:
+            signed = base + b'\xb4' + len(uid).to_bytes(4, 'big') + uid
+            # A certificação mais recente define a expiração da chave primária
+            if (signature.created or 0) > certification_time and signature.verify(primary, signed):
+                certification_time = signature.created or 0
+                primary.expires = primary.created + signature.key_expiration if signature.key_expiration else None
+
+        elif subkey is not None and signature.sig_type in (SIG_SUBKEY_BINDING, SIG_SUBKEY_REVOCATION):
+            if signature.verify(primary, base + subkey.material()):
+                if signature.sig_type == SIG_SUBKEY_REVOCATION:
+                    subkey.revoked = True
+                else:
+                    subkey.expires = subkey.created + signature.key_expiration if signature.key_expiration else None
+                    if subkey not in self.subkeys:
+                        self.subkeys.append(subkey)
+
+        return certification_time
+
+    @property
+    def fingerprint(self) -> str:
+        return self.primary.fingerprint
+
+    def find_signing_key(self, signature: SignaturePacket) -> Optional[PublicKeyPacket]:
+        for key in [self.primary] + self.subkeys:
+            if signature.issuer_fingerprint == key.fingerprint or signature.issuer_key_id == key.key_id:
+                return key
+        return None
+
+    def info(self) -> Dict:
+        """Mesmo formato de import_public_key no backend gnupg"""
+        return {
+            'fingerprint': self.fingerprint,
+            'key_id': self.primary.key_id,
+            'uids': self.uids,
+            'length': str(self.primary.length),
+            'algo': str(self.primary.algo)
+        }
+
+class NativeKeyring:
+    """LRU de chaves interpretadas, indexado por fingerprint"""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._keys = OrderedDict()
+        self._armor_index = {}
+        self._lock = threading.Lock()
+
+    def get(self, fingerprint: str) -> Optional[NativePublicKey]:
+        with self._lock:
+            key = self._keys.get(fingerprint.upper())
+            if key:
+                self._keys.move_to_end(key.fingerprint)
+            return key
+
+    def import_key(self, armored: str) -> NativePublicKey:
+        digest = hashlib.sha256(armored.strip().encode('utf-8')).hexdigest()
+        with self._lock:
+            fingerprint = self._armor_index.get(digest)
+        if fingerprint:
+            key = self.get(fingerprint)
+            if key:
+                return key
+
+        key = NativePublicKey(armored)
+        with self._lock:
+            self._keys[key.fingerprint] = key
+            self._keys.move_to_end(key.fingerprint)
+            self._armor_index[digest] = key.fingerprint
+            while len(self._keys) > self.max_size:
+                evicted, _ = self._keys.popitem(last=False)
+                for stale in [d for d, fp in self._armor_index.items() if fp == evicted]:
+                    del self._armor_index[stale]
+        return key
+
+    def verify(self, data: bytes, armored_signature: str, fingerprint: str) -> Dict:
+        """
+        Verifica uma assinatura destacada contra a chave de fingerprint informado
+
+        Returns:
+            Mesmo formato de verify_signature no backend gnupg
+        """
+        key = self.get(fingerprint)
+        if not key:
+            return {'valid': False, 'error': 'Assinatura inválida ou chave não encontrada'}
+
+        signatures = [SignaturePacket(body) for tag, body in parse_packets(dearmor(armored_signature)) if tag == TAG_SIGNATURE]
+        if not signatures:
+            return {'valid': False, 'error': 'Nenhuma assinatura encontrada'}
+
+        signature = signatures[0]
+        if signature.sig_type not in (SIG_BINARY, SIG_TEXT):
+            return {'valid': False, 'error': f'Tipo de assinatura não suportado: {signature.sig_type:#x}'}
+
+        signing_key = key.find_signing_key(signature)
+        if not signing_key:
+            return {
+                'valid': False,
+                'error': f'Fingerprint não corresponde: esperado {fingerprint}, obtido {signature.issuer_fingerprint or signature.issuer_key_id}'
+            }
+
+        now = time.time()
+        if not key.primary.is_usable(now) or not signing_key.is_usable(now):
+            return {'valid': False, 'error': 'Chave revogada ou expirada'}
+
+        if signature.sig_type == SIG_TEXT:
+            data = b'\r\n'.join(line.rstrip(b'\r') for line in data.split(b'\n'))
+
+        if not signature.verify(signing_key, data):
+            return {'valid': False, 'error': 'Assinatura inválida ou chave não encontrada'}
+
+        return {
+            'valid': True,
+            'fingerprint': key.fingerprint,
+            'timestamp': str(signature.created) if signature.created else None,
+            'username': key.uids[0] if key.uids else None
+        }
@@ -0,0 +1,85 @@
+"""
+Índice Local de Provas do ProofRegistry
+A tabela proofs é mantida pelo listener a partir dos eventos ProofRegistered
+e ProofRevoked, então a verificação de documentos é uma consulta ao banco em
+vez de um eth_call. O docHash é um `string indexed` nos eventos: o log traz
+apenas keccak256(docHash), e é essa a chave da tabela.
+"""
+
+import os
+import logging
+from typing import Dict, List, Optional
+
+from web3 import Web3
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+PROOF_MIN_CONFIRMATIONS = int(os.getenv('PROOF_MIN_CONFIRMATIONS', '0'))  # confirmações exigidas quando a requisição não informa
+
+# Mesma normalização de stored_proof_key, para consultas sobre events.data
+STORED_PROOF_KEY_SQL = "'0x' || regexp_replace(lower(data->'args'->>'docHash'), '^0x', '')"
+
+def proof_key(doc_hash: str) -> str:
+    """Chave da prova em proofs (topic do docHash: keccak256 da string registrada)"""
+    return Web3.keccak(text=doc_hash).hex()
+
+def stored_proof_key(doc_hash_arg: str) -> str:
+    """
+    Chave da prova a partir do docHash gravado em events
+
+    O listener grava o topic com bytes.hex(), sem o prefixo 0x; proof_key
+    (HexBytes.hex()) tem o prefixo. Toda chave gravada em proofs passa por aqui
+    ou por STORED_PROOF_KEY_SQL.
+    """
+    return '0x' + doc_hash_arg.lower().removeprefix('0x')
+
+def find_proofs(cur, doc_hashes: List[str], min_confirmations: Optional[int] = None) -> Dict[str, Dict]:
+    """
+    Busca as provas de vários documentos no índice local
+
+    Args:
+        cur: Cursor aberto (RealDictCursor)
+        doc_hashes: Hashes exatamente como registrados no contrato
+        min_confirmations: Blocos exigidos acima do registro (default: PROOF_MIN_CONFIRMATIONS)
+
+    Returns:
+        Dict hash -> prova (signer, bloco, tx, revoked, confirmations, valid)
+        apenas para os hashes encontrados; valid exige prova não revogada e
+        com as confirmações pedidas
+    """
+    if min_confirmations is None:
+        min_confirmations = PROOF_MIN_CONFIRMATIONS
+
+    keys = {proof_key(doc_hash): doc_hash for doc_hash in doc_hashes}
+    if not keys:
+        return {}
+
+    cur.execute("""
+        SELECT p.doc_hash_key, p.signer, p.block_number, p.transaction_hash, p.registered_at,
+               p.revoked, p.revoked_block, h.head_block
+        FROM proofs p
+        LEFT JOIN listener_head h ON h.id = 1
+        WHERE p.doc_hash_key = ANY(%s)
+    """, (list(keys),))
+
+    proofs = {}
+    for row in cur.fetchall():
+        confirmations = row['head_block'] - row['block_number'] + 1 if row['head_block'] is not None else 0
+        confirmed = confirmations >= min_confirmations
+        proofs[keys[row['doc_hash_key']]] = {
+            'signer': row['signer'],
+            'block_number': row['block_number'],
+            'transaction_hash': row['transaction_hash'],
+            'registered_at': row['registered_at'].isoformat() if row['registered_at'] else None,
+            'revoked': row['revoked'],
+            'revoked_block': row['revoked_block'],
+            'confirmations': max(confirmations, 0),
+            'confirmed': confirmed,
+            'valid': confirmed and not row['revoked']
+        }
+    return proofs
+
+def find_proof(cur, doc_hash: str, min_confirmations: Optional[int] = None) -> Optional[Dict]:
+    """Prova de um documento no índice local (None se nunca registrada)"""
+    return find_proofs(cur, [doc_hash], min_confirmations).get(doc_hash)
@@ -0,0 +1,183 @@
+"""
+Módulo de Sessões de Assinatura
+Mantém, por um tempo curto, a chave privada de um usuário que abriu uma
+sessão explicitamente (POST /api/wallet/session), para que o PBKDF2 seja
+pago uma vez por sessão e não a cada operação.
+
+As sessões ficam na tabela signing_sessions, visível a todos os workers do
+gunicorn. O banco guarda apenas o SHA-256 do token e a chave privada
+cifrada (Fernet) com uma chave derivada do próprio token: sem o token, que
+só o cliente tem, a linha não serve para nada.
+"""
+
+import os
+import time
+import base64
+import hashlib
+import secrets
+import logging
+import threading
+from typing import Dict, Optional
+from cryptography.fernet import Fernet, InvalidToken
+from api.utils.db import db_connection
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+WALLET_SESSION_TTL = int(os.getenv('WALLET_SESSION_TTL', '300'))  # segundos de validade padrão de uma sessão
+WALLET_SESSION_MAX_TTL = int(os.getenv('WALLET_SESSION_MAX_TTL', '900'))  # limite para o ttl pedido pelo cliente
+WALLET_SESSION_SWEEP_INTERVAL = 60  # segundos entre remoções de sessões expiradas
+WALLET_SESSION_HEADER = 'X-Signing-Session'
+
+def init_signing_session_tables(cur):
+    """Cria a tabela de sessões de assinatura se não existir"""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS signing_sessions (
+            token_id VARCHAR(64) PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            wrapped_key TEXT NOT NULL,
+            expires_at TIMESTAMP NOT NULL,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+    """)
+
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_signing_sessions_user ON signing_sessions(user_id);
+        CREATE INDEX IF NOT EXISTS idx_signing_sessions_expires ON signing_sessions(expires_at);
+    """)
+
+class SigningSessionStore:
+    """
+    Sessões de assinatura indexadas por (user_id, SHA-256 do token)
+
+    A chave de cifragem da sessão é SHA-256('blocktrust-session-wrap:' +
+    token), distinta do identificador gravado; o token tem 256 bits
+    aleatórios, então não precisa de um KDF lento.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables_ready = False
+        self._sweeper = None
+        self._sweeper_pid = None
+
+    @staticmethod
+    def _token_id(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def _wrapper(token: str) -> Fernet:
+        digest = hashlib.sha256(b'blocktrust-session-wrap:' + token.encode()).digest()
+        return Fernet(base64.urlsafe_b64encode(digest))
+
+    def _ensure_tables(self, cur):
+        if not self._tables_ready:
+            init_signing_session_tables(cur)
+            self._tables_ready = True
+
+    def open(self, user_id: int, private_key: str, ttl: Optional[int] = None) -> Dict:
+        """
+        Abre uma sessão de assinatura
+
+        Returns:
+            Dict com session_token e expires_at (epoch)
+        """
+        ttl = min(int(ttl or WALLET_SESSION_TTL), WALLET_SESSION_MAX_TTL)
+        if ttl <= 0:
+            raise ValueError("ttl da sessão deve ser positivo")
+
+        token = secrets.token_urlsafe(32)
+        wrapped_key = self._wrapper(token).encrypt(private_key.encode()).decode()
+
+        self._start_sweeper()
+        with db_connection() as conn:
+            cur = conn.cursor()
+            self._ensure_tables(cur)
+            cur.execute("""
+                INSERT INTO signing_sessions (token_id, user_id, wrapped_key, expires_at)
+                VALUES (%s, %s, %s, NOW() + make_interval(secs => %s))
+            """, (self._token_id(token), user_id, wrapped_key, ttl))
+            conn.commit()
+            cur.close()
+
+        logger.info(f"🔓 Sessão de assinatura aberta para usuário {user_id} ({ttl}s)")
+        return {'session_token': token, 'expires_at': int(time.time() + ttl), 'ttl': ttl}
+
+    def get(self, user_id: int, token: str) -> Optional[str]:
+        """Retorna a chave privada da sessão, ou None se inexistente/expirada"""
+        if not token:
+            return None
+
+        with db_connection() as conn:
+            cur = conn.cursor()
+            self._ensure_tables(cur)
+            cur.execute("""
+                SELECT wrapped_key FROM signing_sessions
+                WHERE token_id = %s AND user_id = %s AND expires_at > NOW()
+            """, (self._token_id(token), user_id))
+            row = cur.fetchone()
+            conn.commit()
+            cur.close()
+
+        if not row:
+            return None
+
+        try:
+            return self._wrapper(token).decrypt(row['wrapped_key'].encode()).decode()
+        except InvalidToken:
+            return None
+
+    def revoke(self, user_id: int, token: Optional[str] = None) -> int:
+        """
+        Revoga uma sessão (ou todas as do usuário, se token for None)
+
+        Returns:
+            Número de sessões revogadas
+        """
+        with db_connection() as conn:
+            cur = conn.cursor()
+            self._ensure_tables(cur)
+            if token:
+                cur.execute("""
+                    DELETE FROM signing_sessions WHERE token_id = %s AND user_id = %s
+                """, (self._token_id(token), user_id))
+            else:
+                cur.execute("DELETE FROM signing_sessions WHERE user_id = %s", (user_id,))
+            revoked = cur.rowcount
+            conn.commit()
+            cur.close()
+
+        if revoked:
+            logger.info(f"🔒 {revoked} sessão(ões) de assinatura revogada(s) para usuário {user_id}")
+        return revoked
+
+    def purge_expired(self) -> int:
+        """Remove as sessões expiradas"""
+        with db_connection() as conn:
+            cur = conn.cursor()
+            self._ensure_tables(cur)
+            cur.execute("DELETE FROM signing_sessions WHERE expires_at <= NOW()")
+            purged = cur.rowcount
+            conn.commit()
+            cur.close()
+        return purged
+
+    def _start_sweeper(self):
+        # Remove as chaves cifradas expiradas mesmo sem novos acessos
+        with self._lock:
+            if self._sweeper and self._sweeper.is_alive() and self._sweeper_pid == os.getpid():
+                return
+            self._sweeper = threading.Thread(target=self._run_sweeper, name='signing-session-sweeper', daemon=True)
+            self._sweeper_pid = os.getpid()
+            self._sweeper.start()
+
+    def _run_sweeper(self):
+        while True:
+            time.sleep(WALLET_SESSION_SWEEP_INTERVAL)
+            try:
+                self.purge_expired()
+            except Exception as e:
+                logger.error(f"❌ Erro ao remover sessões de assinatura expiradas: {str(e)}")
+
+# Instância global
+signing_sessions = SigningSessionStore()
@@ -0,0 +1,608 @@
+"""
+Módulo de Despacho de Transações
+Aloca nonces por conta assinante, grava cada transação em uma outbox durável
+(tabela tx_outbox) e acompanha os receipts em uma thread de fundo, reenviando
+com gas maior as transações que ficarem presas no mempool.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Optional
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+from psycopg2.extras import Json
+from api.utils.db import get_db_connection
+from api.utils.web3_provider import get_chain_id
+from api.utils.fee_oracle import fee_oracle
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+TX_RECEIPT_POLL_INTERVAL = float(os.getenv('TX_RECEIPT_POLL_INTERVAL', '3'))  # segundos entre verificações de receipt
+TX_STUCK_AFTER = int(os.getenv('TX_STUCK_AFTER', '90'))  # segundos sem receipt até reenviar com gas maior
+TX_GAS_BUMP_PERCENT = int(os.getenv('TX_GAS_BUMP_PERCENT', '15'))  # os nós exigem no mínimo 10% para substituir
+TX_MAX_ATTEMPTS = int(os.getenv('TX_MAX_ATTEMPTS', '5'))  # envios (original + reenvios) antes de desistir do bump
+TX_MAX_GAS_PRICE_GWEI = int(os.getenv('TX_MAX_GAS_PRICE_GWEI', '1000'))
+TX_MAX_BROADCAST_FAILURES = int(os.getenv('TX_MAX_BROADCAST_FAILURES', '10'))  # envios recusados até desistir de uma tx nunca aceita
+TX_BUMP_URGENCY = os.getenv('TX_BUMP_URGENCY', 'fast')  # nível do fee_oracle usado como piso no reenvio
+
+# Conta do deployer (chave do ambiente): pode receber bump mesmo após restart
+DEPLOYER_PRIVATE_KEY = os.getenv('DEPLOYER_PRIVATE_KEY')
+
+def is_rpc_rejection(error: Exception) -> bool:
+    """Erro devolvido pelo nó em uma resposta JSON-RPC (o web3 levanta ValueError com o dict do erro)"""
+    return isinstance(error, ValueError) and bool(error.args) and isinstance(error.args[0], dict) and 'code' in error.args[0]
+
+class TxDispatcher:
+    """
+    Fila de transações on-chain com nonce local por conta
+
+    submit() assina e envia sem aguardar o receipt: o nonce é reservado em
+    tx_nonces (linha bloqueada durante a transação, o que serializa os
+    workers do gunicorn que compartilham a mesma chave) e a transação
+    assinada é gravada em tx_outbox antes do envio. A thread de fundo
+    confirma os receipts, reenvia o que não chegou ao mempool e aplica
+    bump de gas nas transações presas.
+
+    As chaves privadas nunca são gravadas: ficam apenas em memória até as
+    transações da conta serem resolvidas. Após um restart, transações
+    pendentes continuam sendo acompanhadas e retransmitidas, mas só recebem
+    bump de gas se a chave for registrada novamente (ex: deployer).
+
+    Efeitos no banco que dependem do resultado on-chain são registrados por
+    tipo com register_completion() e executados pelo worker na mesma
+    transação que grava o status final da linha.
+
+    As tabelas tx_outbox e tx_nonces vêm das migrations 010, 014 e 017-019.
+    """
+
+    def __init__(self, w3: Web3):
+        self.w3 = w3
+        self._signers = {}  # endereço -> chave privada (somente em memória)
+        self._open_by_signer = {}  # endereço -> ids de tx_outbox abertos neste processo
+        self._completions = {}  # kind -> handler(cur, row, status, receipt)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+        self._worker_pid = None
+        self._deployer_address = None
+
+        if DEPLOYER_PRIVATE_KEY and not DEPLOYER_PRIVATE_KEY.startswith('0x0000'):
+            try:
+                self.register_signer(DEPLOYER_PRIVATE_KEY)
+                self._deployer_address = self.w3.eth.account.from_key(DEPLOYER_PRIVATE_KEY).address
+            except Exception as e:
+                logger.warning(f"⚠️ DEPLOYER_PRIVATE_KEY inválida: {str(e)}")
+
+    def _get_chain_id(self) -> int:
+        return get_chain_id(self.w3)
+
+    def register_completion(self, kind: str, handler):
+        """
+        Registra o passo de conclusão das transações de um tipo
+
+        O handler recebe (cur, row, status, receipt) quando uma transação
+        enviada com context chega a 'confirmed' ou 'failed' (receipt é None
+        se ela nunca foi minerada). Se o handler falhar, a linha continua
+        aberta e a conclusão é tentada de novo no próximo ciclo.
+        """
+        self._completions[kind] = handler
+
+    def register_signer(self, private_key: str) -> str:
+        """Mantém a chave em memória para permitir bump de gas; retorna o endereço"""
+        address = self.w3.eth.account.from_key(private_key).address
+        with self._lock:
+            self._signers[address] = private_key
+            self._open_by_signer.setdefault(address, set())
+        return address
+
+    def _release_signer(self, address: str, tx_id: int):
+        """Descarta a chave quando não há mais transações abertas da conta neste processo"""
+        with self._lock:
+            open_ids = self._open_by_signer.get(address)
+            if open_ids is None:
+                return
+            open_ids.discard(tx_id)
+            if not open_ids and address != self._deployer_address:
+                self._open_by_signer.pop(address, None)
+                self._signers.pop(address, None)
+
+    def start_worker(self):
+        """Inicia a thread de acompanhamento (uma por processo, inclusive após fork)"""
+        with self._lock:
+            if self._worker and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            self._worker = threading.Thread(target=self._run_worker, name='tx-dispatcher', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def find_by_idempotency_key(self, idempotency_key: str) -> Optional[Dict]:
+        """Retorna a transação já gravada com esta chave de idempotência, se houver"""
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT id, tx_hash, nonce, status FROM tx_outbox WHERE idempotency_key = %s
+            """, (idempotency_key,))
+            row = cur.fetchone()
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+
+        if not row:
+            return None
+
+        return {
+            'tx_id': row['id'],
+            'transaction_hash': row['tx_hash'],
+            'nonce': row['nonce'],
+            'status': row['status']
+        }
+
+    def submit(self, kind: str, contract_function, private_key: str, gas: int, gas_price: Optional[int] = None,
+               idempotency_key: Optional[str] = None, urgency: Optional[str] = None,
+               context: Optional[Dict] = None) -> Dict:
+        """
+        Assina e envia uma chamada de contrato sem aguardar confirmação
+
+        Args:
+            kind: Tipo da operação (ex: 'mint_identity', 'cancel_nft', 'register_proof')
+            contract_function: Função de contrato já com argumentos (contract.functions.x(...))
+            private_key: Chave privada da conta assinante
+            gas: Limite de gas
+            gas_price: Preço do gas em wei para uma transação legada (default: taxas EIP-1559 do fee_oracle)
+            idempotency_key: Se informada e já usada, retorna a transação existente sem reenviar
+            urgency: Nível de urgência do fee_oracle (ex: 'slow', 'standard', 'fast')
+            context: Dados entregues ao handler de conclusão do tipo (ver register_completion)
+
+        Returns:
+            Dict com tx_id (handle estável na outbox), transaction_hash, nonce e status
+        """
+        if idempotency_key:
+            existing = self.find_by_idempotency_key(idempotency_key)
+            if existing:
+                logger.info(f"♻️ Transação {kind} já enviada para {idempotency_key} (tx_id {existing['tx_id']})")
+                return existing
+
+        from_address = self.register_signer(private_key)
+        fees = {'gasPrice': gas_price} if gas_price else fee_oracle.get_fee_params(urgency)
+        chain_id = self._get_chain_id()
+        chain_nonce = self.w3.eth.get_transaction_count(from_address, 'pending')
+
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+
+            # Reservar o nonce: a linha fica bloqueada até o commit
+            cur.execute("""
+                INSERT INTO tx_nonces (account, next_nonce, updated_at)
+                VALUES (%s, %s, NOW())
+                ON CONFLICT (account) DO UPDATE
+                SET next_nonce = GREATEST(tx_nonces.next_nonce, %s) + 1, updated_at = NOW()
+                RETURNING next_nonce - 1 AS nonce
+            """, (from_address, chain_nonce + 1, chain_nonce))
+            nonce = cur.fetchone()['nonce']
+
+            transaction = contract_function.build_transaction({
+                'from': from_address,
+                'nonce': nonce,
+                'gas': gas,
+                **fees,
+                'chainId': chain_id
+            })
+            signed_txn = self.w3.eth.account.sign_transaction(transaction, private_key)
+            tx_hash = signed_txn.hash.hex()
+
+            cur.execute("""
+                INSERT INTO tx_outbox
+                (kind, from_address, to_address, nonce, data, gas, gas_price, max_priority_fee, chain_id,
+                 raw_tx, tx_hash, tx_hashes, idempotency_key, context)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+            """, (
+                kind, from_address, transaction['to'], nonce, transaction['data'], gas,
+                fees.get('maxFeePerGas', fees.get('gasPrice')), fees.get('maxPriorityFeePerGas'),
+                chain_id, signed_txn.rawTransaction.hex(), tx_hash, Json([tx_hash]), idempotency_key,
+                Json(context) if context is not None else None
+            ))
+            tx_id = cur.fetchone()['id']
+
+            conn.commit()
+            cur.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._open_by_signer.setdefault(from_address, set()).add(tx_id)
+
+        status = 'pending'
+        try:
+            self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+            status = 'submitted'
+            self._update(tx_id, status='submitted', attempts=1, submitted=True)
+            logger.info(f"📤 Transação {kind} enviada: {tx_hash} (nonce {nonce}, tx_id {tx_id})")
+        except Exception as e:
+            # A transação já está na outbox: o worker retransmite
+            logger.warning(f"⚠️ Falha ao enviar {kind} (tx_id {tx_id}), será retransmitida: {str(e)}")
+            self._update(tx_id, last_error=str(e))
+
+        self.start_worker()
+        self._wake.set()
+
+        return {
+            'tx_id': tx_id,
+            'transaction_hash': tx_hash,
+            'nonce': nonce,
+            'status': status
+        }
+
+    def get_status(self, tx_id: int) -> Optional[Dict]:
+        """Retorna o estado de uma transação da outbox"""
+        self.start_worker()
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT id, kind, from_address, nonce, tx_hash, tx_hashes, status, attempts,
+                       last_error, block_number, gas_used, created_at, submitted_at, confirmed_at
+                FROM tx_outbox WHERE id = %s
+            """, (tx_id,))
+            row = cur.fetchone()
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+
+        if not row:
+            return None
+
+        return {
+            'tx_id': row['id'],
+            'kind': row['kind'],
+            'from_address': row['from_address'],
+            'nonce': row['nonce'],
+            'transaction_hash': row['tx_hash'],
+            'transaction_hashes': row['tx_hashes'],
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'last_error': row['last_error'],
+            'block_number': row['block_number'],
+            'gas_used': row['gas_used'],
+            'created_at': row['created_at'].isoformat() if row['created_at'] else None,
+            'submitted_at': row['submitted_at'].isoformat() if row['submitted_at'] else None,
+            'confirmed_at': row['confirmed_at'].isoformat() if row['confirmed_at'] else None
+        }
+
+    def wait_for_receipt(self, tx_id: int, timeout: int = 120):
+        """
+        Aguarda o worker confirmar a transação e retorna o receipt
+
+        Raises:
+            TimeoutError: se não houver confirmação em timeout segundos
+            RuntimeError: se a transação falhar (revert)
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = self.get_status(tx_id)
+            if status and status['status'] == 'confirmed':
+                return self.w3.eth.get_transaction_receipt(status['transaction_hash'])
+            if status and status['status'] == 'failed':
+                raise RuntimeError(f"Transação {tx_id} falhou: {status['last_error']}")
+            time.sleep(TX_RECEIPT_POLL_INTERVAL)
+
+        raise TimeoutError(f"Transação {tx_id} não confirmada em {timeout}s")
+
+    def _update(self, tx_id: int, status: Optional[str] = None, attempts: Optional[int] = None,
+                last_error: Optional[str] = None, submitted: bool = False):
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE tx_outbox
+                SET status = COALESCE(%s, status),
+                    attempts = COALESCE(%s, attempts),
+                    last_error = COALESCE(%s, last_error),
+                    submitted_at = CASE WHEN %s THEN NOW() ELSE submitted_at END,
+                    updated_at = NOW()
+                WHERE id = %s
+            """, (status, attempts, last_error, submitted, tx_id))
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+
+    def _run_worker(self):
+        logger.info("🧵 Worker de transações iniciado")
+        while True:
+            try:
+                if not self.process_open_transactions():
+                    self._wake.wait(TX_RECEIPT_POLL_INTERVAL)
+                    self._wake.clear()
+                else:
+                    time.sleep(TX_RECEIPT_POLL_INTERVAL)
+            except Exception as e:
+                logger.error(f"❌ Erro no worker de transações: {str(e)}")
+                time.sleep(TX_RECEIPT_POLL_INTERVAL)
+
+    def process_open_transactions(self, limit: int = 100) -> int:
+        """
+        Processa as transações abertas da outbox uma vez
+
+        Cada linha é tratada em sua própria transação com FOR UPDATE SKIP
+        LOCKED, de modo que os workers de processos diferentes não disputam
+        a mesma transação.
+
+        Returns:
+            Número de transações ainda abertas
+        """
+        conn = get_db_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT id FROM tx_outbox
+                WHERE status IN ('pending', 'submitted')
+                ORDER BY id
+                LIMIT %s
+            """, (limit,))
+            open_ids = [row['id'] for row in cur.fetchall()]
+            conn.commit()
+
+            for tx_id in open_ids:
+                cur.execute("""
+                    SELECT *, EXTRACT(EPOCH FROM NOW() - submitted_at) AS stuck_for
+                    FROM tx_outbox
+                    WHERE id = %s AND status IN ('pending', 'submitted')
+                    FOR UPDATE SKIP LOCKED
+                """, (tx_id,))
+                row = cur.fetchone()
+                if row:
+                    try:
+                        self._process_row(cur, row)
+                    except Exception as e:
+                        logger.error(f"❌ Erro ao processar tx_id {tx_id}: {str(e)}")
+                conn.commit()
+
+            cur.close()
+            return len(open_ids)
+        finally:
+            conn.close()
+
+    def _find_receipt(self, tx_hashes):
+        for tx_hash in reversed(tx_hashes):
+            try:
+                return self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                continue
+        return None
+
+    def _process_row(self, cur, row):
+        receipt = self._find_receipt(row['tx_hashes'])
+
+        if receipt is not None:
+            status = 'confirmed' if receipt['status'] == 1 else 'failed'
+            self._complete(cur, row, status, receipt)
+            cur.execute("""
+                UPDATE tx_outbox
+                SET status = %s, tx_hash = %s, block_number = %s, gas_used = %s,
+                    last_error = %s, confirmed_at = NOW(), updated_at = NOW()
+                WHERE id = %s
+            """, (
+                status, receipt['transactionHash'].hex(), receipt['blockNumber'], receipt['gasUsed'],
+                None if status == 'confirmed' else 'reverted', row['id']
+            ))
+            self._release_signer(row['from_address'], row['id'])
+
+            if status == 'confirmed':
+                logger.info(f"✅ Transação {row['kind']} confirmada no bloco {receipt['blockNumber']} (tx_id {row['id']})")
+            else:
+                logger.error(f"❌ Transação {row['kind']} revertida (tx_id {row['id']})")
+            return
+
+        # Nonce já consumido por outra transação da conta: esta nunca será minerada
+        # (o receipt é consultado de novo caso tenha sido minerada entre as duas chamadas)
+        nonce_used = self.w3.eth.get_transaction_count(row['from_address'], 'latest') > row['nonce']
+        if nonce_used and self._find_receipt(row['tx_hashes']) is None:
+            self._complete(cur, row, 'failed')
+            cur.execute("""
+                UPDATE tx_outbox
+                SET status = 'failed', last_error = 'nonce consumido por outra transação', updated_at = NOW()
+                WHERE id = %s
+            """, (row['id'],))
+            self._release_signer(row['from_address'], row['id'])
+            logger.error(f"❌ Nonce {row['nonce']} de {row['from_address']} já usado (tx_id {row['id']})")
+            return
+
+        if row['status'] == 'pending':
+            self._broadcast(cur, row, row['raw_tx'])
+            return
+
+        if row['stuck_for'] is not None and row['stuck_for'] < TX_STUCK_AFTER:
+            return
+
+        private_key = self._signers.get(row['from_address'])
+        if private_key is None or row['attempts'] >= TX_MAX_ATTEMPTS:
+            # Sem chave (restart) ou limite de bumps: manter a transação viva no mempool
+            self._broadcast(cur, row, row['raw_tx'])
+            return
+
+        self._bump(cur, row, private_key)
+
+    def _complete(self, cur, row, status, receipt=None):
+        """Executa o handler de conclusão do tipo em um savepoint (falha mantém a linha aberta)"""
+        handler = self._completions.get(row['kind'])
+        if handler is None or row.get('context') is None:
+            return
+
+        cur.execute("SAVEPOINT tx_completion")
+        try:
+            handler(cur, row, status, receipt)
+        except Exception:
+            cur.execute("ROLLBACK TO SAVEPOINT tx_completion")
+            raise
+        cur.execute("RELEASE SAVEPOINT tx_completion")
+
+    def _broadcast(self, cur, row, raw_tx):
+        """
+        Retransmite a transação assinada
+
+        Só uma recusa explícita do nó (resposta de erro JSON-RPC) conta para
+        TX_MAX_BROADCAST_FAILURES: timeouts e conexões perdidas podem ter
+        entregue a transação ao mempool. Antes de desistir, o nó ainda é
+        consultado (eth_getTransactionByHash) para cada hash enviado.
+        """
+        try:
+            self.w3.eth.send_raw_transaction(raw_tx)
+            error = None
+            rejected = False
+        except Exception as e:
+            error = str(e)
+            rejected = is_rpc_rejection(e)
+
+        # "already known": o nó já tem a transação no mempool
+        if error and 'already known' not in error.lower():
+            failures = row['broadcast_failures'] + rejected
+            if row['status'] == 'pending' and failures >= TX_MAX_BROADCAST_FAILURES:
+                if not self._known_to_node(row['tx_hashes']):
+                    self._fail_unsent(cur, row, error)
+                    return
+            else:
+                cur.execute("""
+                    UPDATE tx_outbox SET last_error = %s, broadcast_failures = %s, updated_at = NOW() WHERE id = %s
+                """, (error, failures, row['id']))
+                return
+
+        cur.execute("""
+            UPDATE tx_outbox
+            SET status = 'submitted', attempts = GREATEST(attempts, 1),
+                submitted_at = NOW(), updated_at = NOW()
+            WHERE id = %s
+        """, (row['id'],))
+
+    def _known_to_node(self, tx_hashes) -> bool:
+        for tx_hash in tx_hashes:
+            try:
+                self.w3.eth.get_transaction(tx_hash)
+                return True
+            except TransactionNotFound:
+                continue
+        return False
+
+    def _fail_unsent(self, cur, row, error):
+        """
+        Desiste de uma transação que nenhum nó aceitou e libera o nonce
+
+        Se o nonce ainda é o último reservado da conta, ele volta para
+        tx_nonces; se já há transações com nonces posteriores, a lacuna é
+        preenchida com uma transferência de 0 para a própria conta (com as
+        taxas atuais), senão todas ficariam presas atrás dela.
+        """
+        self._complete(cur, row, 'failed')
+        cur.execute("""
+            UPDATE tx_outbox
+            SET status = 'failed', last_error = %s, broadcast_failures = broadcast_failures + 1, updated_at = NOW()
+            WHERE id = %s
+        """, (f"envio recusado {TX_MAX_BROADCAST_FAILURES} vezes: {error}", row['id']))
+        logger.error(f"❌ Transação {row['kind']} (tx_id {row['id']}) recusada {TX_MAX_BROADCAST_FAILURES} vezes: {error}")
+
+        cur.execute("""
+            UPDATE tx_nonces SET next_nonce = %s, updated_at = NOW()
+            WHERE account = %s AND next_nonce = %s
+        """, (row['nonce'], row['from_address'], row['nonce'] + 1))
+
+        if cur.rowcount:
+            logger.info(f"♻️ Nonce {row['nonce']} de {row['from_address']} liberado")
+        else:
+            self._fill_nonce(row)
+
+        self._release_signer(row['from_address'], row['id'])
+
+    def _fill_nonce(self, row):
+        private_key = self._signers.get(row['from_address'])
+        if private_key is None:
+            logger.error(
+                f"🚨 Nonce {row['nonce']} de {row['from_address']} ficou vago sem chave para preenchê-lo: "
+                f"as transações seguintes da conta ficam presas"
+            )
+            return
+
+        try:
+            signed_txn = self.w3.eth.account.sign_transaction({
+                'to': row['from_address'],
+                'value': 0,
+                'gas': 21000,
+                **fee_oracle.get_fee_params(TX_BUMP_URGENCY),
+                'nonce': row['nonce'],
+                'chainId': row['chain_id']
+            }, private_key)
+            self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+            logger.warning(f"🧱 Nonce {row['nonce']} de {row['from_address']} preenchido: {signed_txn.hash.hex()}")
+        except Exception as e:
+            logger.error(f"❌ Falha ao preencher o nonce {row['nonce']} de {row['from_address']}: {str(e)}")
+
+    def _bump(self, cur, row, private_key):
+        """
+        Reassina a transação com o mesmo nonce e taxas maiores (substituição no mempool)
+
+        O nó só aceita a substituição se as taxas subirem pelo menos 10%
+        (em EIP-1559, maxFeePerGas e maxPriorityFeePerGas); o nível
+        TX_BUMP_URGENCY do fee_oracle serve de piso quando a rede subiu mais.
+        """
+        bump = 100 + max(TX_GAS_BUMP_PERCENT, 10)
+        current = fee_oracle.get_fee_params(TX_BUMP_URGENCY)
+        current_max_fee = current.get('maxFeePerGas', current.get('gasPrice'))
+
+        new_gas_price = max(int(row['gas_price']) * bump // 100 + 1, current_max_fee)
+        new_priority_fee = None
+        if row['max_priority_fee'] is None:
+            fees = {'gasPrice': new_gas_price}
+        else:
+            new_priority_fee = max(
+                int(row['max_priority_fee']) * bump // 100 + 1,
+                current.get('maxPriorityFeePerGas', 0)
+            )
+            new_gas_price = max(new_gas_price, new_priority_fee)
+            fees = {'maxFeePerGas': new_gas_price, 'maxPriorityFeePerGas': new_priority_fee}
+
+        max_gas_price = Web3.to_wei(TX_MAX_GAS_PRICE_GWEI, 'gwei')
+        if new_gas_price > max_gas_price:
+            logger.warning(f"⚠️ Bump de gas da tx_id {row['id']} excede o teto de {TX_MAX_GAS_PRICE_GWEI} gwei")
+            self._broadcast(cur, row, row['raw_tx'])
+            return
+
+        signed_txn = self.w3.eth.account.sign_transaction({
+            'to': row['to_address'],
+            'data': row['data'],
+            'value': 0,
+            'gas': row['gas'],
+            **fees,
+            'nonce': row['nonce'],
+            'chainId': row['chain_id']
+        }, private_key)
+
+        try:
+            self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+        except Exception as e:
+            cur.execute("""
+                UPDATE tx_outbox SET last_error = %s, updated_at = NOW() WHERE id = %s
+            """, (str(e), row['id']))
+            logger.warning(f"⚠️ Falha no reenvio da tx_id {row['id']}: {str(e)}")
+            return
+
+        tx_hash = signed_txn.hash.hex()
+        cur.execute("""
+            UPDATE tx_outbox
+            SET tx_hash = %s, tx_hashes = tx_hashes || %s, raw_tx = %s, gas_price = %s, max_priority_fee = %s,
+                attempts = attempts + 1, submitted_at = NOW(), updated_at = NOW()
+            WHERE id = %s
+        """, (tx_hash, Json([tx_hash]), signed_txn.rawTransaction.hex(), new_gas_price, new_priority_fee, row['id']))
+
+        logger.warning(
+            f"⛽ tx_id {row['id']} presa há mais de {TX_STUCK_AFTER}s - reenviada com gas "
+            f"{Web3.from_wei(new_gas_price, 'gwei')} gwei: {tx_hash}"
+        )
@@ -14,13 +14,18 @@ from typing import Dict, Tuple, Optional
 from eth_account import Account
 from eth_account.messages import encode_defunct
 from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.backends import default_backend
 import base64
+from api.utils.signing_session import signing_sessions
+from api.utils.crypto_pool import crypto_pool, CryptoPoolBusy
 
 logger = logging.getLogger(__name__)
 
+# Configurações
+WALLET_KDF_ITERATIONS = int(os.getenv('WALLET_KDF_ITERATIONS', '600000'))  # iterações PBKDF2 das chaves novas/recriptografadas
+WALLET_LEGACY_KDF_ITERATIONS = 10000  # chaves gravadas sem prefixo (formato antigo)
+WALLET_KEY_PREFIX = 'pbkdf2_sha256'
+
 class WalletManager:
     """Gerenciador de carteiras proprietárias locais"""
     
@@ -28,25 +33,46 @@ class WalletManager:
         """Inicializa o gerenciador de carteiras"""
         self.backend = default_backend()
     
-    def _derive_key_from_password(self, password: str, salt: bytes) -> bytes:
+    def _derive_key_from_password(self, password: str, salt: bytes, iterations: int = WALLET_KDF_ITERATIONS) -> bytes:
         """
         Deriva uma chave de criptografia a partir de uma senha usando PBKDF2
         
         Args:
             password: Senha do usuário
             salt: Salt para derivação
+            iterations: Número de iterações (o custo fica gravado junto da chave)
             
         Returns:
             Chave derivada de 32 bytes
         """
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=10000,  # Reduzido para melhorar performance no Render
-            backend=self.backend
-        )
-        return base64.urlsafe_b64encode(kdf.derive(password.encode()))
+        # Executado no pool de processos para não ocupar a thread da requisição
+        return base64.urlsafe_b64encode(crypto_pool.derive_key(password, salt, iterations))
+    
+    def _split_encrypted_key(self, encrypted_private_key: str) -> Tuple[int, str]:
+        """Separa o custo do KDF do token Fernet (pbkdf2_sha256$<iterações>$<token>)"""
+        if encrypted_private_key.startswith(WALLET_KEY_PREFIX + '$'):
+            _, iterations, token = encrypted_private_key.split('$', 2)
+            return int(iterations), token
+        return WALLET_LEGACY_KDF_ITERATIONS, encrypted_private_key
+    
+    def _encrypt_private_key(self, private_key: str, password: str, salt: bytes) -> str:
+        encryption_key = self._derive_key_from_password(password, salt, WALLET_KDF_ITERATIONS)
+        token = Fernet(encryption_key).encrypt(private_key.encode()).decode()
+        return f"{WALLET_KEY_PREFIX}${WALLET_KDF_ITERATIONS}${token}"
+    
+    def needs_rewrap(self, encrypted_private_key: str) -> bool:
+        """Indica se a chave foi criptografada com menos iterações que as atuais"""
+        iterations, _ = self._split_encrypted_key(encrypted_private_key)
+        return iterations < WALLET_KDF_ITERATIONS
+    
+    def rewrap_private_key(self, private_key: str, password: str, salt: str) -> str:
+        """
+        Recriptografa uma chave já descriptografada com o custo atual do KDF
+        
+        Returns:
+            Nova chave criptografada (mesmo salt)
+        """
+        return self._encrypt_private_key(private_key, password, base64.b64decode(salt))
     
     def generate_wallet(self, password: str) -> Dict:
         """
@@ -67,12 +93,8 @@ class WalletManager:
             # Gerar salt aleatório
             salt = secrets.token_bytes(16)
             
-            # Derivar chave de criptografia da senha
-            encryption_key = self._derive_key_from_password(password, salt)
-            
-            # Criptografar chave privada
-            fernet = Fernet(encryption_key)
-            encrypted_private_key = fernet.encrypt(private_key.encode())
+            # Criptografar chave privada com a chave derivada da senha
+            encrypted_private_key = self._encrypt_private_key(private_key, password, salt)
             
             # Gerar wallet_id único
             wallet_id = hashlib.sha256(f"{address}{salt.hex()}".encode()).hexdigest()[:16]
@@ -82,7 +104,7 @@ class WalletManager:
             return {
                 'wallet_id': wallet_id,
                 'address': address,
-                'encrypted_private_key': encrypted_private_key.decode(),
+                'encrypted_private_key': encrypted_private_key,
                 'salt': base64.b64encode(salt).decode(),
                 'public_key': address  # Endereço Ethereum é derivado da chave pública
             }
@@ -106,21 +128,52 @@ class WalletManager:
         try:
             # Decodificar salt
             salt_bytes = base64.b64decode(salt)
+            iterations, token = self._split_encrypted_key(encrypted_private_key)
             
             # Derivar chave de criptografia
-            encryption_key = self._derive_key_from_password(password, salt_bytes)
+            encryption_key = self._derive_key_from_password(password, salt_bytes, iterations)
             
             # Descriptografar
             fernet = Fernet(encryption_key)
-            private_key = fernet.decrypt(encrypted_private_key.encode()).decode()
+            private_key = fernet.decrypt(token.encode()).decode()
             
             return private_key
             
+        except CryptoPoolBusy:
+            raise
         except Exception as e:
             logger.error(f"❌ Erro ao descriptografar chave privada: {str(e)}")
             raise ValueError("Senha incorreta ou chave corrompida")
     
-    def sign_message(self, message: str, encrypted_private_key: str, password: str, salt: str) -> Dict:
+    def unlock_private_key(self, user_id: int, encrypted_private_key: str, salt: str,
+                           password: Optional[str] = None, session_token: Optional[str] = None) -> str:
+        """
+        Obtém a chave privada pela sessão de assinatura ou, sem ela, pela senha
+        
+        Args:
+            user_id: ID do usuário dono da carteira
+            encrypted_private_key: Chave privada criptografada
+            salt: Salt usado na derivação
+            password: Senha do usuário (opcional se houver sessão ativa)
+            session_token: Token retornado por POST /api/wallet/session
+            
+        Returns:
+            Chave privada descriptografada
+        """
+        if session_token:
+            private_key = signing_sessions.get(user_id, session_token)
+            if private_key:
+                return private_key
+            if not password:
+                raise ValueError("Sessão de assinatura inválida ou expirada")
+        
+        if not password:
+            raise ValueError("Senha ou sessão de assinatura é obrigatória")
+        
+        return self.decrypt_private_key(encrypted_private_key, password, salt)
+    
+    def sign_message(self, message: str, encrypted_private_key: str, password: str, salt: str,
+                     private_key: Optional[str] = None) -> Dict:
         """
         Assina uma mensagem usando a chave privada
         
@@ -129,13 +182,15 @@ class WalletManager:
             encrypted_private_key: Chave privada criptografada
             password: Senha do usuário
             salt: Salt usado na derivação
+            private_key: Chave já descriptografada (evita repetir o PBKDF2)
             
         Returns:
             Dict com signature, message_hash, address
         """
         try:
             # Descriptografar chave privada
-            private_key = self.decrypt_private_key(encrypted_private_key, password, salt)
+            if private_key is None:
+                private_key = self.decrypt_private_key(encrypted_private_key, password, salt)
             
             # Criar conta a partir da chave privada
             account = Account.from_key(private_key)
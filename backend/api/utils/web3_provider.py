@@ -0,0 +1,186 @@
+"""
+Registro Compartilhado de Conexões Web3
+Um Web3 por URL de RPC, todos sobre uma única requests.Session com pool de
+conexões keep-alive (sem handshake TCP/TLS por chamada) e timeouts
+configuráveis. ABIs, contratos e chain_id ficam em cache por processo, então
+uma requisição paga apenas as chamadas RPC que realmente faz.
+"""
+
+import os
+import json
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3.providers.rpc import HTTPProvider
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+DEFAULT_RPC_URL = os.getenv('POLYGON_RPC_URL', 'https://polygon-mumbai.infura.io/v3/demo')
+WEB3_CONNECT_TIMEOUT = float(os.getenv('WEB3_CONNECT_TIMEOUT', '5'))  # segundos para abrir a conexão com o RPC
+WEB3_READ_TIMEOUT = float(os.getenv('WEB3_READ_TIMEOUT', '30'))  # segundos aguardando a resposta de uma chamada
+WEB3_POOL_SIZE = int(os.getenv('WEB3_POOL_SIZE', '20'))  # conexões keep-alive mantidas por host
+
+CONTRACTS_DIR = os.path.join(os.path.dirname(__file__), '../../contracts')
+
+class PooledHTTPProvider(HTTPProvider):
+    """
+    HTTPProvider que envia pela sessão compartilhada do registro
+
+    O HTTPProvider padrão guarda uma sessão por thread (cache interno do
+    web3), então cada thread (listener, dispatcher, requisições) abriria
+    suas próprias conexões. Aqui todas usam o mesmo pool do urllib3. A
+    sessão é obtida a cada chamada para que um fork troque o pool mesmo em
+    instâncias Web3 criadas antes dele.
+    """
+
+    def __init__(self, endpoint_uri: str, registry: 'Web3Registry'):
+        super().__init__(endpoint_uri, request_kwargs={'timeout': (WEB3_CONNECT_TIMEOUT, WEB3_READ_TIMEOUT)})
+        self._registry = registry
+
+    def make_request(self, method, params):
+        request_data = self.encode_rpc_request(method, params)
+        response = self._registry.get_session().post(self.endpoint_uri, data=request_data, **self.get_request_kwargs())
+        response.raise_for_status()
+        return self.decode_rpc_response(response.content)
+
+    def make_batch_request(self, calls: List) -> List[Dict]:
+        """
+        Envia várias chamadas em uma única requisição JSON-RPC (array)
+
+        Args:
+            calls: Lista de (método, parâmetros) já serializáveis em JSON
+
+        Returns:
+            Respostas na mesma ordem das chamadas (cada uma com 'result' ou 'error')
+
+        Raises:
+            ValueError: se o provedor não aceitar requisições em lote
+        """
+        payload = [
+            {'jsonrpc': '2.0', 'method': method, 'params': params, 'id': index}
+            for index, (method, params) in enumerate(calls)
+        ]
+        response = self._registry.get_session().post(self.endpoint_uri, data=json.dumps(payload), **self.get_request_kwargs())
+        response.raise_for_status()
+        responses = response.json()
+
+        if not isinstance(responses, list):
+            raise ValueError(f"RPC não aceitou requisição em lote: {responses.get('error') if isinstance(responses, dict) else responses}")
+
+        by_id = {item.get('id'): item for item in responses}
+        return [by_id.get(index, {'error': {'message': 'Resposta ausente no lote'}}) for index in range(len(calls))]
+
+class Web3Registry:
+    """Cache por processo de sessões HTTP, instâncias Web3, ABIs, contratos e chain_id"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session = None
+        self._session_pid = None
+        self._web3 = {}
+        self._abis = {}
+        self._contracts = {}
+        self._chain_ids = {}
+
+    def get_session(self) -> requests.Session:
+        """Sessão HTTP compartilhada (recriada após fork: sockets não podem ser herdados)"""
+        with self._lock:
+            if self._session is None or self._session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=WEB3_POOL_SIZE, pool_maxsize=WEB3_POOL_SIZE)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+                self._session_pid = os.getpid()
+            return self._session
+
+    def get_web3(self, rpc_url: Optional[str] = None) -> Web3:
+        """Instância Web3 compartilhada para a URL (default: POLYGON_RPC_URL)"""
+        rpc_url = rpc_url or DEFAULT_RPC_URL
+        with self._lock:
+            w3 = self._web3.get(rpc_url)
+            if w3 is None:
+                w3 = Web3(PooledHTTPProvider(rpc_url, self))
+                self._web3[rpc_url] = w3
+            return w3
+
+    def get_chain_id(self, w3: Optional[Web3] = None) -> int:
+        """chain_id da rede (consultado uma vez por URL)"""
+        w3 = w3 or self.get_web3()
+        rpc_url = w3.provider.endpoint_uri
+        chain_id = self._chain_ids.get(rpc_url)
+        if chain_id is None:
+            chain_id = w3.eth.chain_id
+            self._chain_ids[rpc_url] = chain_id
+        return chain_id
+
+    def load_abi(self, name: str, fallback: Optional[List] = None) -> List:
+        """
+        ABI de contracts/<name>.abi.json (lida do disco uma vez)
+
+        Args:
+            name: Nome do contrato (ex: 'IdentityNFT')
+            fallback: ABI usada se o arquivo não existir
+        """
+        with self._lock:
+            if name in self._abis:
+                return self._abis[name]
+
+        abi_path = os.path.join(CONTRACTS_DIR, f'{name}.abi.json')
+        if os.path.exists(abi_path):
+            with open(abi_path, 'r') as f:
+                abi = json.load(f)
+        else:
+            abi = fallback
+
+        with self._lock:
+            return self._abis.setdefault(name, abi)
+
+    def get_contract(self, w3: Web3, address: str, abi: List):
+        """
+        Contrato em cache por (RPC, endereço, ABI)
+
+        A ABI é identificada pelo objeto, então deve vir de load_abi ou de uma
+        constante de módulo (o mesmo objeto a cada chamada).
+        """
+        address = Web3.to_checksum_address(address)
+        key = (w3.provider.endpoint_uri, address, id(abi))
+        with self._lock:
+            cached = self._contracts.get(key)
+            if cached is None:
+                # Guarda a ABI junto para que o id não seja reutilizado por outro objeto
+                cached = (abi, w3.eth.contract(address=address, abi=abi))
+                self._contracts[key] = cached
+            return cached[1]
+
+    def get_stats(self) -> Dict:
+        """Estado dos caches e do pool de conexões"""
+        with self._lock:
+            return {
+                'rpc_urls': len(self._web3),
+                'contracts': len(self._contracts),
+                'abis': len(self._abis),
+                'chain_ids': dict(self._chain_ids),
+                'pool_size': WEB3_POOL_SIZE,
+                'timeouts': [WEB3_CONNECT_TIMEOUT, WEB3_READ_TIMEOUT]
+            }
+
+# Instância global
+web3_registry = Web3Registry()
+
+def get_web3(rpc_url: Optional[str] = None) -> Web3:
+    return web3_registry.get_web3(rpc_url)
+
+def get_contract(w3: Web3, address: str, abi: List):
+    return web3_registry.get_contract(w3, address, abi)
+
+def load_abi(name: str, fallback: Optional[List] = None) -> List:
+    return web3_registry.load_abi(name, fallback)
+
+def get_chain_id(w3: Optional[Web3] = None) -> int:
+    return web3_registry.get_chain_id(w3)
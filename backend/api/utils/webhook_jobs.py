@@ -0,0 +1,353 @@
+"""
+Módulo de Processamento de Webhooks em Background
+O webhook do Sumsub apenas valida o HMAC, grava o evento bruto com uma
+chave de deduplicação e responde 200. Uma thread por processo reivindica
+os eventos pendentes e executa a transição de KYC e o cancelamento/mint do
+NFT, com retentativas e backoff exponencial. O progresso de cada evento
+fica em webhook_events.state, então uma reexecução continua do passo onde
+parou e o mint é enviado uma única vez (chave de idempotência na outbox).
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+from psycopg2.extras import Json
+from api.utils.db import db_connection
+
+logger = logging.getLogger(__name__)
+
+# Configurações
+WEBHOOK_JOB_POLL_INTERVAL = int(os.getenv('WEBHOOK_JOB_POLL_INTERVAL', '5'))  # segundos entre buscas por eventos pendentes
+WEBHOOK_JOB_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_JOB_MAX_ATTEMPTS', '8'))  # falhas até marcar o evento como failed
+WEBHOOK_JOB_RETRY_BASE = int(os.getenv('WEBHOOK_JOB_RETRY_BASE', '30'))  # segundos; dobra a cada falha
+WEBHOOK_JOB_RETRY_MAX = int(os.getenv('WEBHOOK_JOB_RETRY_MAX', '3600'))
+WEBHOOK_JOB_LEASE = int(os.getenv('WEBHOOK_JOB_LEASE', '300'))  # segundos até outro worker poder reassumir o evento
+WEBHOOK_MINT_POLL_INTERVAL = int(os.getenv('WEBHOOK_MINT_POLL_INTERVAL', '15'))  # segundos entre verificações do mint enviado
+WEBHOOK_MINT_MAX_WAIT = int(os.getenv('WEBHOOK_MINT_MAX_WAIT', '1800'))  # segundos aguardando o mint antes de cada verificação contar como falha
+
+def init_webhook_tables(cur):
+    """Cria a tabela de eventos de webhook se não existir"""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS webhook_events (
+            id SERIAL PRIMARY KEY,
+            provider VARCHAR(50) NOT NULL,
+            dedup_key VARCHAR(255) NOT NULL,
+            event_type VARCHAR(100),
+            payload JSONB NOT NULL,
+            state JSONB NOT NULL DEFAULT '{}',
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            next_attempt_at TIMESTAMP DEFAULT NOW(),
+            locked_until TIMESTAMP,
+            created_at TIMESTAMP DEFAULT NOW(),
+            processed_at TIMESTAMP,
+            UNIQUE (provider, dedup_key)
+        )
+    """)
+
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_webhook_events_due ON webhook_events(next_attempt_at) WHERE status IN ('pending', 'processing');
+    """)
+
+def sumsub_dedup_key(payload: Dict, raw_body: bytes) -> str:
+    """
+    Chave de deduplicação de um evento do Sumsub
+
+    Reenvios do mesmo evento trazem o mesmo correlationId/createdAtMs; sem
+    esses campos, usa o SHA-256 do corpo (o HMAC também é sobre o corpo).
+    """
+    marker = payload.get('correlationId') or payload.get('createdAtMs')
+    if marker:
+        return f"{payload.get('type')}:{payload.get('applicantId')}:{payload.get('reviewStatus')}:{marker}"
+    return hashlib.sha256(raw_body).hexdigest()
+
+class WebhookJobRunner:
+    """
+    Fila persistente de eventos de webhook (tabela webhook_events)
+
+    Os eventos são reivindicados com FOR UPDATE SKIP LOCKED e um lease
+    (locked_until): se o processo morrer no meio, outro worker reassume o
+    evento quando o lease vence. Um handler retorna None quando terminou ou
+    um número de segundos para ser chamado de novo sem contar como falha
+    (ex: mint aguardando receipt).
+    """
+
+    def __init__(self):
+        self._handlers = {}
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._tables_ready = False
+        self._worker = None
+        self._worker_pid = None
+
+    def _ensure_tables(self, cur):
+        if not self._tables_ready:
+            init_webhook_tables(cur)
+            self._tables_ready = True
+
+    def register_handler(self, provider: str, handler):
+        """Registra handler(event_id, payload, state, save_state) para um provedor"""
+        self._handlers[provider] = handler
+
+    def start_worker(self):
+        """Inicia a thread de processamento (uma por processo, inclusive após fork)"""
+        with self._lock:
+            if self._worker and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            self._worker = threading.Thread(target=self._run_worker, name='webhook-jobs', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def enqueue(self, provider: str, dedup_key: str, event_type: Optional[str], payload: Dict) -> Tuple[int, bool]:
+        """
+        Grava um evento recebido (idempotente pela chave de deduplicação)
+
+        Returns:
+            (id do evento, True se é novo / False se já tinha sido recebido)
+        """
+        with db_connection() as conn:
+            cur = conn.cursor()
+            self._ensure_tables(cur)
+            cur.execute("""
+                INSERT INTO webhook_events (provider, dedup_key, event_type, payload)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (provider, dedup_key) DO NOTHING
+                RETURNING id
+            """, (provider, dedup_key, event_type, Json(payload)))
+            row = cur.fetchone()
+
+            if row is None:
+                cur.execute("""
+                    SELECT id FROM webhook_events WHERE provider = %s AND dedup_key = %s
+                """, (provider, dedup_key))
+                event_id, created = cur.fetchone()['id'], False
+            else:
+                event_id, created = row['id'], True
+
+            conn.commit()
+            cur.close()
+
+        if created:
+            self.start_worker()
+            self._wake.set()
+        return event_id, created
+
+    def _run_worker(self):
+        logger.info("🧵 Worker de webhooks iniciado")
+        while True:
+            try:
+                if not self.process_due():
+                    self._wake.wait(WEBHOOK_JOB_POLL_INTERVAL)
+                    self._wake.clear()
+            except Exception as e:
+                logger.error(f"❌ Erro no worker de webhooks: {str(e)}")
+                self._wake.wait(WEBHOOK_JOB_POLL_INTERVAL)
+                self._wake.clear()
+
+    def _claim(self, limit: int):
+        with db_connection() as conn:
+            cur = conn.cursor()
+            self._ensure_tables(cur)
+            cur.execute("""
+                UPDATE webhook_events
+                SET status = 'processing',
+                    locked_until = NOW() + make_interval(secs => %s)
+                WHERE id IN (
+                    SELECT id FROM webhook_events
+                    WHERE (status = 'pending' AND next_attempt_at <= NOW())
+                       OR (status = 'processing' AND locked_until < NOW())
+                    ORDER BY id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, provider, payload, state, attempts
+            """, (WEBHOOK_JOB_LEASE, limit))
+            rows = cur.fetchall()
+            conn.commit()
+            cur.close()
+        return sorted(rows, key=lambda row: row['id'])
+
+    def process_due(self, limit: int = 20) -> int:
+        """Processa os eventos vencidos; retorna quantos foram reivindicados"""
+        rows = self._claim(limit)
+        for row in rows:
+            self._process(row)
+        return len(rows)
+
+    def _save_state(self, event_id: int, state: Dict, cur=None):
+        if cur is not None:
+            cur.execute("UPDATE webhook_events SET state = %s WHERE id = %s", (Json(state), event_id))
+            return
+
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("UPDATE webhook_events SET state = %s WHERE id = %s", (Json(state), event_id))
+            conn.commit()
+            cur.close()
+
+    def _finish(self, event_id: int, status: str, attempts: int, delay: Optional[int] = None, error: Optional[str] = None):
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE webhook_events
+                SET status = %s,
+                    attempts = %s,
+                    last_error = %s,
+                    next_attempt_at = CASE WHEN %s::int IS NULL THEN next_attempt_at ELSE NOW() + make_interval(secs => %s::int) END,
+                    locked_until = NULL,
+                    processed_at = CASE WHEN %s = 'done' THEN NOW() ELSE processed_at END
+                WHERE id = %s
+            """, (status, attempts, error, delay, delay, status, event_id))
+            conn.commit()
+            cur.close()
+
+    def _process(self, row):
+        event_id = row['id']
+        handler = self._handlers.get(row['provider'])
+        state = dict(row['state'] or {})
+
+        try:
+            if handler is None:
+                raise ValueError(f"Nenhum handler para o provedor {row['provider']}")
+
+            retry_in = handler(event_id, row['payload'], state, lambda cur=None: self._save_state(event_id, state, cur))
+        except Exception as e:
+            attempts = row['attempts'] + 1
+            if attempts >= WEBHOOK_JOB_MAX_ATTEMPTS:
+                logger.error(f"❌ Evento de webhook {event_id} falhou definitivamente após {attempts} tentativas: {str(e)}")
+                self._finish(event_id, 'failed', attempts, error=str(e))
+            else:
+                delay = min(WEBHOOK_JOB_RETRY_BASE * 2 ** (attempts - 1), WEBHOOK_JOB_RETRY_MAX)
+                logger.warning(f"⚠️ Evento de webhook {event_id} falhou (tentativa {attempts}), nova tentativa em {delay}s: {str(e)}")
+                self._finish(event_id, 'pending', attempts, delay, str(e))
+            return
+
+        if retry_in:
+            self._finish(event_id, 'pending', row['attempts'], retry_in)
+        else:
+            self._finish(event_id, 'done', row['attempts'])
+            logger.info(f"✅ Evento de webhook {event_id} processado")
+
+def process_sumsub_event(event_id: int, payload: Dict, state: Dict, save_state) -> Optional[int]:
+    """
+    Aplica um evento do Sumsub: status de KYC e, se aprovado, cancelamento do
+    NFT ativo e mint de um novo
+
+    Cada passo concluído é gravado em state antes do próximo, então uma
+    reexecução não repete efeitos já aplicados.
+
+    Returns:
+        None quando concluído, ou segundos até verificar o mint de novo
+    """
+    from api.utils.sumsub import parse_verification_status
+    from api.utils.audit import log_kyc_event, log_nft_event
+    from api.utils.nft import check_active_nft, cancel_nft, submit_mint_nft, complete_mint_nft
+
+    external_user_id = payload.get('externalUserId')
+    review_status = payload.get('reviewStatus')
+    applicant_id = payload.get('applicantId')
+    review_result = payload.get('reviewResult', {})
+
+    if not (external_user_id and review_status):
+        return None
+
+    user_id = int(external_user_id)
+
+    # 1. Status de KYC (atualização e progresso na mesma transação)
+    if 'kyc_status' not in state:
+        parsed_status = parse_verification_status(payload)
+        state['kyc_status'] = parsed_status['status']
+
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE users
+                SET kyc_status = %s,
+                    kyc_updated_at = NOW(),
+                    sumsub_data = %s
+                WHERE id = %s
+            """, (parsed_status['status'], str(payload), user_id))
+            save_state(cur)
+            conn.commit()
+            cur.close()
+
+        logger.info(f"✅ Status KYC atualizado para usuário {user_id}: {parsed_status['status']}")
+
+        log_kyc_event(
+            user_id=user_id,
+            event_type=parsed_status['status'],
+            applicant_id=applicant_id,
+            review_status=review_status,
+            details={'review_result': review_result}
+        )
+
+    if state['kyc_status'] != 'approved':
+        return None
+
+    # 2. Cancelar o NFT ativo e enviar o mint (uma única vez)
+    if 'mint' not in state:
+        logger.info(f"🎯 KYC aprovado para usuário {user_id} - Iniciando processo de mint de NFT")
+
+        existing_nft = check_active_nft(user_id)
+        if existing_nft:
+            logger.info(f"⚠️  Usuário {user_id} já possui NFT ativo (ID: {existing_nft['nft_id']}) - Cancelando...")
+            cancel_result = cancel_nft(user_id, existing_nft['nft_id'])
+            if not cancel_result['success']:
+                raise RuntimeError(f"Erro ao cancelar NFT anterior: {cancel_result.get('error')}")
+            logger.info(f"✅ NFT anterior cancelado: {cancel_result['tx_hash']}")
+
+        mint_result = submit_mint_nft(
+            user_id=user_id,
+            kyc_data={
+                'applicant_id': applicant_id,
+                'review_status': review_status,
+                'review_result': review_result
+            },
+            idempotency_key=f"webhook_event:{event_id}:mint:{state.get('mint_round', 0)}"
+        )
+        if not mint_result['success']:
+            raise RuntimeError(f"Erro ao mintar NFT: {mint_result.get('error')}")
+
+        state['mint'] = mint_result
+        state['mint_submitted_at'] = time.time()
+        save_state()
+
+    # 3. Aguardar a confirmação do mint sem segurar o worker
+    mint_result = state['mint']
+    if mint_result.get('pending'):
+        completed = complete_mint_nft(user_id, mint_result['tx_id'], mint_result['previous_nft_id'], mint_result['wallet_address'])
+        if completed.get('pending'):
+            waited = time.time() - state.setdefault('mint_submitted_at', time.time())
+            if waited < WEBHOOK_MINT_MAX_WAIT:
+                return WEBHOOK_MINT_POLL_INTERVAL
+            # Prazo vencido: cada nova verificação conta como tentativa até o evento falhar
+            raise RuntimeError(f"Mint (tx_id {mint_result['tx_id']}) sem confirmação após {int(waited)}s")
+        if completed.get('tx_failed'):
+            # Revertida on-chain: a próxima tentativa envia um novo mint
+            state.pop('mint')
+            state['mint_round'] = state.get('mint_round', 0) + 1
+            save_state()
+        if not completed['success']:
+            raise RuntimeError(completed.get('error'))
+
+        state['mint'] = completed
+        save_state()
+        mint_result = completed
+
+    logger.info(f"✅ NFT mintado com sucesso: ID={mint_result['nft_id']}, TX={mint_result['tx_hash']}")
+    log_nft_event(
+        user_id=user_id,
+        event_type='minted',
+        nft_id=mint_result['nft_id'],
+        tx_hash=mint_result['tx_hash'],
+        details={'kyc_applicant_id': applicant_id}
+    )
+    return None
+
+# Instância global
+webhook_jobs = WebhookJobRunner()
+webhook_jobs.register_handler('sumsub', process_sumsub_event)
@@ -16,6 +16,7 @@ from api.routes.pgp_routes import pgp_bp, dual_bp
 from api.routes.failsafe_routes import failsafe_bp
 from api.routes.document_routes import document_bp
 from api.routes.user_management_routes import user_mgmt_bp
+from api.utils.crypto_pool import CryptoPoolBusy
 
 app = Flask(__name__, static_folder="static", static_url_path="")
 CORS(app)
@@ -45,14 +46,21 @@ def health():
 @app.route('/api/db/health', methods=['GET'])
 def db_health():
     from api.utils.db_engine import engine
+    from api.utils.db import get_pool_stats
     from sqlalchemy import text
     try:
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
-        return {'success': True, 'message': 'DB connection OK'}, 200
+        return {'success': True, 'message': 'DB connection OK', 'pool': get_pool_stats()}, 200
     except Exception as e:
         return {'success': False, 'error': str(e)}, 500
 
+# Crypto pool health check (fila de bcrypt/PBKDF2)
+@app.route('/api/crypto/health', methods=['GET'])
+def crypto_health():
+    from api.utils.crypto_pool import crypto_pool
+    return {'success': True, 'pool': crypto_pool.get_stats()}, 200
+
 # Init database endpoint
 @app.route('/api/init-db', methods=['POST'])
 def init_database():
@@ -84,6 +92,13 @@ def serve_frontend(path):
         return send_from_directory(app.static_folder, path)
     return send_from_directory(app.static_folder, 'index.html')
 
+# Pool de criptografia saturado (bcrypt/PBKDF2) - 503 com Retry-After
+@app.errorhandler(CryptoPoolBusy)
+def crypto_pool_busy(e):
+    response = jsonify({'error': str(e)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 # Handle 404 errors - serve index.html for React Router
 @app.errorhandler(404)
 def not_found(e):
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos backends de verificação PGP (gnupg x native)
+Gera chaves temporárias, assina um documento e mede import + verify no
+mesmo fluxo de /api/dual/sign (chave já conhecida, verificação por requisição).
+
+Uso:
+    python benchmark_pgp.py --iterations 200 --keys 50
+"""
+
+import argparse
+import importlib
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import gnupg
+
+def generate_keys(count, key_type):
+    """Gera chaves e assinaturas em um keyring separado (o 'cliente')"""
+    signer = gnupg.GPG(gnupghome=tempfile.mkdtemp())
+    params = {'key_type': 'EDDSA', 'key_curve': 'ed25519'} if key_type == 'ed25519' else {'key_type': 'RSA', 'key_length': 2048}
+
+    samples = []
+    for i in range(count):
+        key = signer.gen_key(signer.gen_key_input(name_email=f'bench{i}@example.com', no_protection=True, **params))
+        data = f'0x{os.urandom(32).hex()}'
+        signature = str(signer.sign(data, keyid=key.fingerprint, detach=True))
+        samples.append((key.fingerprint, signer.export_keys(key.fingerprint), data, signature))
+    return samples
+
+def run_backend(backend, samples, iterations):
+    """Executa import_public_key + verify_signature com o backend informado"""
+    os.environ['PGP_BACKEND'] = backend
+    os.environ['PGP_GNUPGHOME'] = tempfile.mkdtemp()
+
+    # Recarrega o módulo para que PGP_BACKEND/PGP_GNUPGHOME sejam relidos
+    for name in [m for m in sys.modules if m.startswith('api.utils.pgp')]:
+        del sys.modules[name]
+    pgp = importlib.import_module('api.utils.pgp')
+
+    # Primeira importação de cada chave (equivale ao /api/pgp/import)
+    for fingerprint, armored, _, _ in samples:
+        assert pgp.import_public_key(armored)['success']
+
+    timings = []
+    for i in range(iterations):
+        fingerprint, armored, data, signature = samples[i % len(samples)]
+        started = time.perf_counter()
+        assert pgp.import_public_key(armored, fingerprint=fingerprint)['success']
+        result = pgp.verify_signature(data, signature, fingerprint)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert result['valid'], result
+
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dos backends de verificação PGP')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--keys', type=int, default=20)
+    parser.add_argument('--key-type', choices=['rsa', 'ed25519'], default='rsa')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    print(f"🔑 Gerando {args.keys} chaves {args.key_type}...")
+    samples = generate_keys(args.keys, args.key_type)
+
+    for backend in ('gnupg', 'native'):
+        timings = run_backend(backend, samples, args.iterations)
+        timings.sort()
+        print(
+            f"📊 {backend:7s} | {args.iterations} verificações | "
+            f"média {statistics.mean(timings):.2f} ms | "
+            f"p50 {timings[len(timings) // 2]:.2f} ms | "
+            f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms | "
+            f"total {sum(timings) / 1000:.2f} s"
+        )
+
+if __name__ == '__main__':
+    main()
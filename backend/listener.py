@@ -7,10 +7,17 @@ import os
 import json
 import time
 import logging
+from collections import deque, OrderedDict, Counter
+from concurrent.futures import ThreadPoolExecutor
+import requests
 from web3 import Web3
+from eth_utils import event_abi_to_log_topic
+from api.utils.web3_provider import get_web3, get_contract
+from api.utils.proof_index import STORED_PROOF_KEY_SQL, stored_proof_key
+from api.utils.new_heads import NewHeadsSubscriber
 # geth_poa_middleware não é mais necessário no web3.py >= 6.0
 import psycopg2
-from psycopg2.extras import Json
+from psycopg2.extras import Json, execute_values
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,9 +29,19 @@ logger = logging.getLogger(__name__)
 POLYGON_RPC_URL = os.getenv('POLYGON_RPC_URL', 'https://rpc-mumbai.maticvigil.com')
 DATABASE_URL = os.getenv('DATABASE_URL')
 POLL_INTERVAL = int(os.getenv('LISTENER_POLL_INTERVAL', '15'))  # segundos
+BATCH_SIZE = int(os.getenv('LISTENER_BATCH_SIZE', '1000'))  # linhas por INSERT multi-row
+MAX_BLOCK_RANGE = int(os.getenv('LISTENER_MAX_BLOCK_RANGE', '2000'))  # blocos por eth_getLogs
+MIN_BLOCK_RANGE = int(os.getenv('LISTENER_MIN_BLOCK_RANGE', '10'))
+BACKFILL_WORKERS = int(os.getenv('LISTENER_BACKFILL_WORKERS', '4'))  # chamadas eth_getLogs simultâneas no backfill
+CONFIRMATIONS = int(os.getenv('LISTENER_CONFIRMATIONS', '32'))  # blocos até um evento ser considerado final
+BLOCK_RING_SIZE = int(os.getenv('LISTENER_BLOCK_RING_SIZE', '256'))  # blocos recentes guardados para detectar reorgs
+POLYGON_WS_URL = os.getenv('POLYGON_WS_URL')  # opcional: ativa o modo WebSocket (newHeads)
+HOURLY_RETENTION_DAYS = int(os.getenv('LISTENER_HOURLY_RETENTION_DAYS', '30'))  # dias de buckets por hora mantidos
+NFT_INVALIDATION_RETENTION_HOURS = int(os.getenv('LISTENER_NFT_INVALIDATION_RETENTION_HOURS', '24'))  # horas de invalidações de cache mantidas
+LISTENER_LOCK_ID = 0x626c6b74  # pg_advisory_lock compartilhado pelo listener e pelo backfill
 
-# Conectar ao Web3
-w3 = Web3(Web3.HTTPProvider(POLYGON_RPC_URL))
+# Conectar ao Web3 (sessão keep-alive compartilhada, ver api/utils/web3_provider.py)
+w3 = get_web3(POLYGON_RPC_URL)
 # POA middleware não é mais necessário no web3.py >= 6.0
 
 if not w3.is_connected():
@@ -44,184 +61,1051 @@ except FileNotFoundError:
     exit(1)
 
 # Inicializar contratos
-identity_nft = w3.eth.contract(
-    address=Web3.to_checksum_address(contracts_config['IdentityNFT']['address']),
-    abi=contracts_config['IdentityNFT']['abi']
-)
-
-proof_registry = w3.eth.contract(
-    address=Web3.to_checksum_address(contracts_config['ProofRegistry']['address']),
-    abi=contracts_config['ProofRegistry']['abi']
-)
-
-failsafe = w3.eth.contract(
-    address=Web3.to_checksum_address(contracts_config['FailSafe']['address']),
-    abi=contracts_config['FailSafe']['abi']
-)
+identity_nft = get_contract(w3, contracts_config['IdentityNFT']['address'], contracts_config['IdentityNFT']['abi'])
+proof_registry = get_contract(w3, contracts_config['ProofRegistry']['address'], contracts_config['ProofRegistry']['abi'])
+failsafe = get_contract(w3, contracts_config['FailSafe']['address'], contracts_config['FailSafe']['abi'])
 
 logger.info(f"✅ Contratos inicializados:")
 logger.info(f"  IdentityNFT:   {contracts_config['IdentityNFT']['address']}")
 logger.info(f"  ProofRegistry: {contracts_config['ProofRegistry']['address']}")
 logger.info(f"  FailSafe:      {contracts_config['FailSafe']['address']}")
 
+CONTRACTS = {
+    'IdentityNFT': identity_nft,
+    'ProofRegistry': proof_registry,
+    'FailSafe': failsafe
+}
+
+# Streams monitorados: (contrato, evento on-chain, tipo gravado em events.type)
+# Cada stream tem seu próprio checkpoint em listener_checkpoints
+EVENT_STREAMS = [
+    ('IdentityNFT', 'MintingEvent', 'Minted'),
+    ('IdentityNFT', 'CancelamentoEvent', 'Canceled'),
+    ('IdentityNFT', 'CancelamentoSimples', 'CanceledSimple'),
+    ('ProofRegistry', 'ProofRegistered', 'ProofStored'),
+    ('ProofRegistry', 'ProofRevoked', 'ProofRevoked'),
+    ('FailSafe', 'FailsafeEvent', 'FailSafeTriggered'),
+]
+
+# Eventos que mudam o NFT ativo de uma carteira: tipo -> (arg da carteira, args de tokenId)
+# Cada um gera invalidações em nft_state_invalidations (ver api/utils/nft_state_cache.py)
+NFT_STATE_EVENTS = {
+    'Minted': ('user', ('tokenId',)),
+    'Canceled': (None, ('oldTokenId', 'newTokenId')),
+    'CanceledSimple': (None, ('tokenId',)),
+    'FailSafeTriggered': ('user', ('tokenId',)),
+}
+
+# Eventos do ProofRegistry que mantêm a tabela proofs (ver api/utils/proof_index.py)
+PROOF_EVENT_TYPES = ('ProofStored', 'ProofRevoked')
+
+def build_topic_lookup():
+    """
+    Monta a tabela (endereço, topic0) -> stream usada para decodificar logs localmente
+
+    Returns:
+        Dict {(address, topic0_hex): (contract, event_name, event_type, event)}
+    """
+    lookup = {}
+    for contract_name, event_name, event_type in EVENT_STREAMS:
+        contract = CONTRACTS[contract_name]
+        event_abi = next(
+            (item for item in contract.abi if item.get('type') == 'event' and item.get('name') == event_name),
+            None
+        )
+        if not event_abi:
+            logger.warning(f"⚠️ Evento {contract_name}.{event_name} não encontrado na ABI - ignorando")
+            continue
+        
+        topic = Web3.to_hex(event_abi_to_log_topic(event_abi))
+        lookup[(contract.address.lower(), topic)] = (
+            contract_name,
+            event_name,
+            event_type,
+            getattr(contract.events, event_name)()
+        )
+    return lookup
+
+TOPIC_LOOKUP = build_topic_lookup()
+LOG_FILTER_ADDRESSES = [contract.address for contract in CONTRACTS.values()]
+LOG_FILTER_TOPICS = [sorted({topic for _, topic in TOPIC_LOOKUP})]
+ACTIVE_STREAMS = [(contract_name, event_name) for contract_name, event_name, _, _ in TOPIC_LOOKUP.values()]
+STREAM_BY_TYPE = {event_type: (contract_name, event_name) for contract_name, event_name, event_type in EVENT_STREAMS}
+
 def get_db_connection():
     """Cria conexão com o banco de dados"""
     return psycopg2.connect(DATABASE_URL)
 
-def save_event(event_type, event_data):
-    """Salva evento no banco de dados"""
+def acquire_listener_lock():
+    """
+    Tenta obter o advisory lock que impede listener e backfill simultâneos
+
+    Returns:
+        Conexão dedicada que mantém o lock enquanto aberta, ou None se
+        outro processo já o detém
+    """
+    conn = get_db_connection()
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute("SELECT pg_try_advisory_lock(%s)", (LISTENER_LOCK_ID,))
+    acquired = cur.fetchone()[0]
+    cur.close()
+    
+    if not acquired:
+        conn.close()
+        return None
+    return conn
+
+def init_tables():
+    """Cria as tabelas usadas pelo listener se não existirem"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    # Criar tabela de eventos se não existir
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS events (
+            id SERIAL PRIMARY KEY,
+            type VARCHAR(50) NOT NULL,
+            data JSONB NOT NULL,
+            timestamp TIMESTAMP DEFAULT NOW()
+        )
+    """)
+    
+    # Criar índices
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_events_type ON events(type);
+        CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp DESC);
+    """)
+    
+    # Índice composto para paginação por cursor filtrada por tipo (index-only)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_type_id ON events (type, id)")
+    
+    # Índice por número de bloco (rollback em reorgs e visão "finalized")
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_events_block_number
+        ON events (((data->>'blockNumber')::BIGINT))
+    """)
+    
+    # Checkpoint por contrato/evento (avança junto com cada lote de eventos)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS listener_checkpoints (
+            contract VARCHAR(50) NOT NULL,
+            event_name VARCHAR(100) NOT NULL,
+            last_block BIGINT NOT NULL,
+            updated_at TIMESTAMP DEFAULT NOW(),
+            PRIMARY KEY (contract, event_name)
+        )
+    """)
+    
+    # Hashes dos blocos recentes processados (ring buffer para detectar reorgs)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS listener_blocks (
+            block_number BIGINT PRIMARY KEY,
+            block_hash VARCHAR(66) NOT NULL,
+            parent_hash VARCHAR(66) NOT NULL
+        )
+    """)
+    
+    # Cabeça da cadeia vista pelo listener e último bloco finalizado
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS listener_head (
+            id INTEGER PRIMARY KEY,
+            head_block BIGINT NOT NULL,
+            finalized_block BIGINT NOT NULL,
+            updated_at TIMESTAMP DEFAULT NOW()
+        )
+    """)
+    
+    # Contadores por tipo de evento (evita COUNT(*) na paginação do explorer)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS event_counts (
+            type VARCHAR(50) PRIMARY KEY,
+            count BIGINT NOT NULL DEFAULT 0
+        )
+    """)
+    
+    # Semear os contadores uma única vez a partir dos eventos já existentes
+    cur.execute("""
+        INSERT INTO event_counts (type, count)
+        SELECT type, COUNT(*) FROM events
+        WHERE NOT EXISTS (SELECT 1 FROM event_counts)
+        GROUP BY type
+    """)
+    
+    # Eventos por hora e tipo (eventos das últimas 24h em /stats sem varrer a tabela)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS event_hourly_counts (
+            bucket TIMESTAMP NOT NULL,
+            type VARCHAR(50) NOT NULL,
+            count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket, type)
+        )
+    """)
+    
+    cur.execute("""
+        INSERT INTO event_hourly_counts (bucket, type, count)
+        SELECT date_trunc('hour', timestamp), type, COUNT(*) FROM events
+        WHERE timestamp >= NOW() - %s * INTERVAL '1 day'
+        AND NOT EXISTS (SELECT 1 FROM event_hourly_counts)
+        GROUP BY 1, 2
+    """, (HOURLY_RETENTION_DAYS,))
+    
+    # Carteiras/tokens cujo estado on-chain mudou (invalida o cache de NFT da API)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS nft_state_invalidations (
+            id BIGSERIAL PRIMARY KEY,
+            wallet_address VARCHAR(42),
+            token_id VARCHAR(78),
+            block_number BIGINT,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_nft_state_invalidations_created_at ON nft_state_invalidations(created_at)")
+    
+    # Índice local de provas (chave: keccak256 do docHash, como no topic do evento)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS proofs (
+            doc_hash_key VARCHAR(66) PRIMARY KEY,
+            signer VARCHAR(42) NOT NULL,
+            block_number BIGINT NOT NULL,
+            transaction_hash VARCHAR(66) NOT NULL,
+            log_index INTEGER NOT NULL,
+            registered_at TIMESTAMP,
+            revoked BOOLEAN NOT NULL DEFAULT FALSE,
+            revoked_block BIGINT,
+            revoked_tx VARCHAR(66),
+            updated_block BIGINT NOT NULL,
+            updated_log_index INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT NOW()
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_proofs_updated_block ON proofs(updated_block)")
+    
+    conn.commit()
+    
+    # Semear proofs em uma transação própria: uma linha inválida não desfaz a criação das tabelas
+    try:
+        seed_proofs(cur)
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        logger.error(f"❌ Falha ao semear a tabela proofs a partir dos eventos: {str(e)}")
+    
+    cur.close()
+    conn.close()
+
+def seed_proofs(cur):
+    """
+    Semeia proofs uma única vez a partir dos eventos já ingeridos
+
+    Eventos gravados por versões anteriores do listener não têm logIndex;
+    nesses casos a posição dentro do bloco é considerada 0.
+    """
+    cur.execute("""
+        INSERT INTO proofs (doc_hash_key, signer, block_number, transaction_hash, log_index,
+                            registered_at, updated_block, updated_log_index)
+        SELECT DISTINCT ON ({key})
+            {key}, lower(data->'args'->>'signer'),
+            (data->>'blockNumber')::BIGINT, data->>'transactionHash', COALESCE((data->>'logIndex')::INTEGER, 0),
+            to_timestamp((data->'args'->>'timestamp')::BIGINT) AT TIME ZONE 'UTC',
+            (data->>'blockNumber')::BIGINT, COALESCE((data->>'logIndex')::INTEGER, 0)
+        FROM events
+        WHERE type = 'ProofStored' AND NOT EXISTS (SELECT 1 FROM proofs)
+        ORDER BY {key}, (data->>'blockNumber')::BIGINT DESC, COALESCE((data->>'logIndex')::INTEGER, 0) DESC
+    """.format(key=STORED_PROOF_KEY_SQL))
+    if cur.rowcount:
+        cur.execute("""
+            UPDATE proofs p
+            SET revoked = TRUE, revoked_block = r.block_number, revoked_tx = r.transaction_hash,
+                updated_block = r.block_number, updated_log_index = r.log_index
+            FROM (
+                SELECT DISTINCT ON ({key})
+                    {key} AS doc_hash_key, data->>'transactionHash' AS transaction_hash,
+                    (data->>'blockNumber')::BIGINT AS block_number, COALESCE((data->>'logIndex')::INTEGER, 0) AS log_index
+                FROM events
+                WHERE type = 'ProofRevoked'
+                ORDER BY {key}, (data->>'blockNumber')::BIGINT DESC, COALESCE((data->>'logIndex')::INTEGER, 0) DESC
+            ) r
+            WHERE p.doc_hash_key = r.doc_hash_key
+            AND (r.block_number, r.log_index) > (p.block_number, p.log_index)
+        """.format(key=STORED_PROOF_KEY_SQL))
+
+def adjust_event_counts(cur, deltas, hourly_deltas):
+    """
+    Aplica variações aos agregados de eventos na transação corrente
+
+    Mantém os contadores por tipo (event_counts) e os buckets por hora
+    (event_hourly_counts) usados por /api/explorer/events e /stats.
+
+    Args:
+        cur: Cursor da transação que inseriu/removeu os eventos
+        deltas: Dict {event_type: variação} (negativa para remoções)
+        hourly_deltas: Dict {(bucket, event_type): variação}; bucket None
+            significa a hora corrente do banco (eventos recém-inseridos)
+    """
+    deltas = [(event_type, delta) for event_type, delta in deltas.items() if delta]
+    if deltas:
+        execute_values(
+            cur,
+            """
+            INSERT INTO event_counts (type, count) VALUES %s
+            ON CONFLICT (type) DO UPDATE
+            SET count = event_counts.count + EXCLUDED.count
+            """,
+            deltas
+        )
+    
+    hourly_deltas = [(bucket, event_type, delta) for (bucket, event_type), delta in hourly_deltas.items() if delta]
+    if hourly_deltas:
+        execute_values(
+            cur,
+            """
+            INSERT INTO event_hourly_counts (bucket, type, count)
+            SELECT COALESCE(t.bucket, date_trunc('hour', NOW())), t.type, t.count
+            FROM (VALUES %s) AS t (bucket, type, count)
+            ON CONFLICT (bucket, type) DO UPDATE
+            SET count = event_hourly_counts.count + EXCLUDED.count
+            """,
+            hourly_deltas,
+            template="(%s::TIMESTAMP, %s, %s::BIGINT)"
+        )
+
+def delete_events(cur, where, params):
+    """
+    Remove eventos e desconta os agregados na mesma transação
+
+    Returns:
+        Número de eventos removidos
+    """
+    cur.execute(f"""
+        WITH deleted AS (
+            DELETE FROM events WHERE {where} RETURNING type, timestamp
+        )
+        SELECT type, date_trunc('hour', timestamp), COUNT(*)
+        FROM deleted
+        GROUP BY 1, 2
+    """, params)
+    
+    deltas = Counter()
+    hourly_deltas = {}
+    for event_type, bucket, count in cur.fetchall():
+        deltas[event_type] -= count
+        hourly_deltas[(bucket, event_type)] = -count
+    
+    adjust_event_counts(cur, deltas, hourly_deltas)
+    return -sum(deltas.values())
+
+class BlockHashRing:
+    """
+    Ring buffer com os hashes dos últimos blocos processados
+
+    Espelha a tabela listener_blocks para que a detecção de reorg não
+    precise consultar o banco a cada janela.
+    """
+    
+    def __init__(self, size=BLOCK_RING_SIZE):
+        self.size = size
+        self.blocks = OrderedDict()
+    
+    def add(self, block_number, block_hash):
+        self.blocks[block_number] = block_hash
+        self.blocks.move_to_end(block_number)
+        while len(self.blocks) > self.size:
+            self.blocks.popitem(last=False)
+    
+    def get(self, block_number):
+        return self.blocks.get(block_number)
+    
+    def numbers(self):
+        """Números dos blocos guardados, do mais recente para o mais antigo"""
+        return sorted(self.blocks, reverse=True)
+    
+    def truncate_above(self, block_number):
+        for number in [n for n in self.blocks if n > block_number]:
+            del self.blocks[number]
+
+def load_block_ring():
+    """Carrega o ring buffer de hashes a partir de listener_blocks"""
+    ring = BlockHashRing()
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT block_number, block_hash
+        FROM listener_blocks
+        ORDER BY block_number DESC
+        LIMIT %s
+    """, (BLOCK_RING_SIZE,))
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    
+    for block_number, block_hash in reversed(rows):
+        ring.add(block_number, block_hash)
+    return ring
+
+def load_checkpoints(default_block):
+    """
+    Carrega o último bloco processado de cada stream
+
+    Streams sem checkpoint começam em default_block (o valor do antigo
+    listener_cursor é aproveitado quando existir). Sem nenhum checkpoint e
+    sem listener_cursor, mas com eventos já gravados (banco anterior aos
+    checkpoints), o início é o maior blockNumber em events, para não
+    pular o intervalo entre ele e default_block.
+
+    Returns:
+        Dict {(contract, event_name): last_block}
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    cur.execute("SELECT contract, event_name, last_block FROM listener_checkpoints")
+    checkpoints = {(row[0], row[1]): row[2] for row in cur.fetchall()}
+    
+    if len(checkpoints) < len(EVENT_STREAMS):
+        legacy = None
+        cur.execute("SELECT to_regclass('listener_cursor')")
+        if cur.fetchone()[0]:
+            cur.execute("SELECT last_block FROM listener_cursor WHERE id = 1")
+            legacy = cur.fetchone()
+        if legacy:
+            default_block = legacy[0]
+        elif not checkpoints:
+            cur.execute("SELECT MAX((data->>'blockNumber')::BIGINT) FROM events")
+            last_event_block = cur.fetchone()[0]
+            if last_event_block is not None:
+                logger.info(f"📍 Sem checkpoints: retomando do último evento gravado (bloco {last_event_block})")
+                default_block = last_event_block
+    
+    cur.close()
+    conn.close()
+    
+    for contract, event_name, _ in EVENT_STREAMS:
+        checkpoints.setdefault((contract, event_name), default_block)
+    
+    return checkpoints
+
+def save_events(events, to_block, streams, head_block=None):
+    """
+    Salva os eventos de uma janela de blocos em uma única transação
+
+    Os eventos são gravados com INSERT multi-row e os checkpoints dos
+    streams consultados avançam para to_block no mesmo commit: ou a janela
+    inteira é persistida, ou nada é (e a janela é reprocessada no próximo ciclo).
+
+    Args:
+        events: Lista de tuplas (event_type, event_data) em ordem de bloco/log
+        to_block: Último bloco coberto pela janela
+        streams: Streams (contract, event_name) cobertos pela janela
+        head_block: Bloco to_block retornado por eth_getBlock; quando informado,
+            seu hash entra no ring buffer e listener_head é atualizado
+    """
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
         
-        cur.execute("""
-            INSERT INTO events (type, data, timestamp)
-            VALUES (%s, %s, NOW())
-        """, (event_type, Json(event_data)))
+        if events:
+            execute_values(
+                cur,
+                "INSERT INTO events (type, data, timestamp) VALUES %s",
+                [(event_type, Json(event_data)) for event_type, event_data in events],
+                template="(%s, %s, NOW())",
+                page_size=BATCH_SIZE
+            )
+            deltas = Counter(event_type for event_type, _ in events)
+            adjust_event_counts(cur, deltas, {(None, event_type): count for event_type, count in deltas.items()})
+            
+            cur.execute(
+                "DELETE FROM event_hourly_counts WHERE bucket < NOW() - %s * INTERVAL '1 day'",
+                (HOURLY_RETENTION_DAYS,)
+            )
+            
+            apply_proof_events(cur, events)
+            
+            invalidations = build_nft_invalidations(events)
+            if invalidations:
+                execute_values(
+                    cur,
+                    "INSERT INTO nft_state_invalidations (wallet_address, token_id, block_number) VALUES %s",
+                    invalidations
+                )
+                cur.execute(
+                    "DELETE FROM nft_state_invalidations WHERE created_at < NOW() - %s * INTERVAL '1 hour'",
+                    (NFT_INVALIDATION_RETENTION_HOURS,)
+                )
+        
+        if streams:
+            execute_values(
+                cur,
+                """
+                INSERT INTO listener_checkpoints (contract, event_name, last_block, updated_at)
+                VALUES %s
+                ON CONFLICT (contract, event_name) DO UPDATE
+                SET last_block = EXCLUDED.last_block, updated_at = NOW()
+                """,
+                [(contract, event_name, to_block) for contract, event_name in streams],
+                template="(%s, %s, %s, NOW())"
+            )
+        
+        if head_block is not None:
+            cur.execute("""
+                INSERT INTO listener_blocks (block_number, block_hash, parent_hash)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (block_number) DO UPDATE
+                SET block_hash = EXCLUDED.block_hash, parent_hash = EXCLUDED.parent_hash
+            """, (to_block, Web3.to_hex(head_block['hash']), Web3.to_hex(head_block['parentHash'])))
+            
+            cur.execute("DELETE FROM listener_blocks WHERE block_number <= %s", (to_block - BLOCK_RING_SIZE,))
+            
+            cur.execute("""
+                INSERT INTO listener_head (id, head_block, finalized_block, updated_at)
+                VALUES (1, %s, %s, NOW())
+                ON CONFLICT (id) DO UPDATE
+                SET head_block = EXCLUDED.head_block,
+                    finalized_block = GREATEST(listener_head.finalized_block, EXCLUDED.finalized_block),
+                    updated_at = NOW()
+            """, (to_block, to_block - CONFIRMATIONS))
         
         conn.commit()
         cur.close()
-        conn.close()
         
-        logger.info(f"✅ Evento salvo: {event_type}")
+        if events:
+            logger.info(f"✅ {len(events)} eventos salvos (até o bloco {to_block})")
         
-    except Exception as e:
-        logger.error(f"❌ Erro ao salvar evento: {str(e)}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
-def process_event(event, event_type):
-    """Processa um evento e extrai dados relevantes"""
-    try:
-        event_data = {
-            'blockNumber': event['blockNumber'],
-            'transactionHash': event['transactionHash'].hex(),
-            'address': event['address'],
-            'args': {}
-        }
-        
-        # Extrair argumentos do evento
-        for key, value in event['args'].items():
-            if isinstance(value, bytes):
-                event_data['args'][key] = value.hex()
-            else:
-                event_data['args'][key] = str(value)
+def build_nft_invalidations(events):
+    """
+    Linhas de nft_state_invalidations para os eventos que mudam o NFT ativo
+
+    Returns:
+        Lista de tuplas (wallet_address, token_id, block_number)
+    """
+    rows = []
+    for event_type, event_data in events:
+        if event_type not in NFT_STATE_EVENTS:
+            continue
+        wallet_arg, token_args = NFT_STATE_EVENTS[event_type]
+        args = event_data['args']
+        wallet_address = args.get(wallet_arg).lower() if wallet_arg and args.get(wallet_arg) else None
+        for token_arg in token_args:
+            rows.append((wallet_address, args.get(token_arg), event_data['blockNumber']))
+    return rows
+
+def apply_proof_events(cur, events):
+    """
+    Aplica eventos ProofStored/ProofRevoked à tabela proofs na transação corrente
+
+    Os eventos de uma janela são reduzidos ao estado final de cada docHash
+    (um registro pode ser revogado e registrado de novo) antes do upsert,
+    já que um INSERT multi-row não pode alterar a mesma linha duas vezes.
+    Cada linha guarda a posição (bloco, logIndex) do último evento aplicado
+    e só é alterada por eventos posteriores, então reprocessar uma janela
+    (reindex_stream) não muda nada.
+
+    Args:
+        cur: Cursor da transação de save_events/rollback_to
+        events: Lista de (event_type, event_data) em ordem de bloco/log
+    """
+    registered = {}
+    revoked = {}
+    
+    for event_type, event_data in events:
+        if event_type not in PROOF_EVENT_TYPES:
+            continue
         
-        save_event(event_type, event_data)
+        args = event_data['args']
+        doc_hash_key = stored_proof_key(args['docHash'])
+        log_index = event_data.get('logIndex', 0)  # ausente em eventos de versões anteriores
+        position = (event_data['blockNumber'], log_index)
         
-    except Exception as e:
-        logger.error(f"❌ Erro ao processar evento {event_type}: {str(e)}")
+        if event_type == 'ProofStored':
+            registered[doc_hash_key] = {
+                'signer': args['signer'].lower(),
+                'block_number': event_data['blockNumber'],
+                'transaction_hash': event_data['transactionHash'],
+                'log_index': log_index,
+                'timestamp': int(args['timestamp']),
+                'revoked': False,
+                'revoked_block': None,
+                'revoked_tx': None,
+                'position': position
+            }
+            revoked.pop(doc_hash_key, None)
+        elif doc_hash_key in registered:
+            registered[doc_hash_key].update(
+                revoked=True,
+                revoked_block=event_data['blockNumber'],
+                revoked_tx=event_data['transactionHash'],
+                position=position
+            )
+        else:
+            # Registro em uma janela anterior: só marca a revogação
+            revoked[doc_hash_key] = (event_data['blockNumber'], event_data['transactionHash'], log_index)
+    
+    if registered:
+        execute_values(
+            cur,
+            """
+            INSERT INTO proofs (doc_hash_key, signer, block_number, transaction_hash, log_index, registered_at,
+                                revoked, revoked_block, revoked_tx, updated_block, updated_log_index)
+            VALUES %s
+            ON CONFLICT (doc_hash_key) DO UPDATE
+            SET signer = EXCLUDED.signer,
+                block_number = EXCLUDED.block_number,
+                transaction_hash = EXCLUDED.transaction_hash,
+                log_index = EXCLUDED.log_index,
+                registered_at = EXCLUDED.registered_at,
+                revoked = EXCLUDED.revoked,
+                revoked_block = EXCLUDED.revoked_block,
+                revoked_tx = EXCLUDED.revoked_tx,
+                updated_block = EXCLUDED.updated_block,
+                updated_log_index = EXCLUDED.updated_log_index,
+                updated_at = NOW()
+            WHERE (proofs.updated_block, proofs.updated_log_index) < (EXCLUDED.updated_block, EXCLUDED.updated_log_index)
+            """,
+            [
+                (key, row['signer'], row['block_number'], row['transaction_hash'], row['log_index'], row['timestamp'],
+                 row['revoked'], row['revoked_block'], row['revoked_tx'], row['position'][0], row['position'][1])
+                for key, row in registered.items()
+            ],
+            template="(%s, %s, %s, %s, %s, to_timestamp(%s) AT TIME ZONE 'UTC', %s, %s, %s, %s, %s)",
+            page_size=BATCH_SIZE
+        )
+    
+    if revoked:
+        execute_values(
+            cur,
+            """
+            UPDATE proofs p
+            SET revoked = TRUE, revoked_block = v.block_number, revoked_tx = v.transaction_hash,
+                updated_block = v.block_number, updated_log_index = v.log_index, updated_at = NOW()
+            FROM (VALUES %s) AS v (doc_hash_key, block_number, transaction_hash, log_index)
+            WHERE p.doc_hash_key = v.doc_hash_key
+            AND (p.updated_block, p.updated_log_index) < (v.block_number, v.log_index)
+            """,
+            [(key, block_number, transaction_hash, log_index) for key, (block_number, transaction_hash, log_index) in revoked.items()],
+            page_size=BATCH_SIZE
+        )
 
-def listen_events():
-    """Loop principal que escuta eventos da blockchain"""
-    logger.info("🎧 Iniciando listener de eventos...")
+def find_fork_block(block_ring):
+    """
+    Procura o último bloco do ring buffer que ainda pertence à cadeia canônica
+
+    Returns:
+        Número do bloco de fork (eventos acima dele devem ser descartados)
+    """
+    for block_number in block_ring.numbers():
+        canonical = w3.eth.get_block(block_number)
+        if Web3.to_hex(canonical['hash']) == block_ring.get(block_number):
+            return block_number
     
-    # Obter último bloco processado do banco
+    # Reorg mais profundo que o ring buffer: recuar até o bloco mais antigo conhecido
+    oldest = min(block_ring.numbers())
+    logger.critical(f"🚨 Reorg mais profundo que {BLOCK_RING_SIZE} blocos - recuando até {oldest - 1}")
+    return oldest - 1
+
+def rollback_to(fork_block, block_ring, checkpoints):
+    """
+    Desfaz tudo o que foi ingerido acima de fork_block após um reorg
+
+    Remove os eventos órfãos, os hashes de bloco acima do fork e recua os
+    checkpoints em uma única transação; os blocos são reingeridos pelo
+    loop principal a partir de fork_block + 1.
+    """
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
         cur = conn.cursor()
         
-        # Criar tabela de eventos se não existir
+        deleted = delete_events(cur, "(data->>'blockNumber')::BIGINT > %s", (fork_block,))
+        
+        # Provas alteradas acima do fork são refeitas a partir dos eventos que ficaram
+        cur.execute("DELETE FROM proofs WHERE updated_block > %s RETURNING doc_hash_key", (fork_block,))
+        proof_keys = [row[0] for row in cur.fetchall()]
+        if proof_keys:
+            cur.execute("""
+                SELECT type, data FROM events
+                WHERE type IN %s AND {key} = ANY(%s)
+                ORDER BY (data->>'blockNumber')::BIGINT, COALESCE((data->>'logIndex')::INTEGER, 0)
+            """.format(key=STORED_PROOF_KEY_SQL), (PROOF_EVENT_TYPES, proof_keys))
+            apply_proof_events(cur, cur.fetchall())
+        
+        # Estado on-chain dos NFTs pode ter voltado atrás: invalida o cache inteiro
+        cur.execute(
+            "INSERT INTO nft_state_invalidations (wallet_address, token_id, block_number) VALUES (NULL, NULL, %s)",
+            (fork_block,)
+        )
+        
+        cur.execute("DELETE FROM listener_blocks WHERE block_number > %s", (fork_block,))
+        
         cur.execute("""
-            CREATE TABLE IF NOT EXISTS events (
-                id SERIAL PRIMARY KEY,
-                type VARCHAR(50) NOT NULL,
-                data JSONB NOT NULL,
-                timestamp TIMESTAMP DEFAULT NOW()
-            )
-        """)
+            UPDATE listener_checkpoints
+            SET last_block = %s, updated_at = NOW()
+            WHERE last_block > %s
+        """, (fork_block, fork_block))
         
-        # Criar índices
         cur.execute("""
-            CREATE INDEX IF NOT EXISTS idx_events_type ON events(type);
-            CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp DESC);
-        """)
+            UPDATE listener_head
+            SET head_block = %s,
+                finalized_block = LEAST(finalized_block, %s),
+                updated_at = NOW()
+            WHERE id = 1
+        """, (fork_block, fork_block))
         
         conn.commit()
+        cur.close()
+        
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    
+    block_ring.truncate_above(fork_block)
+    for stream, last_block in checkpoints.items():
+        checkpoints[stream] = min(last_block, fork_block)
+    
+    logger.warning(f"♻️ Reorg: {deleted} eventos acima do bloco {fork_block} removidos para reingestão")
+
+def reindex_stream(contract, event_name, from_block):
+    """
+    Prepara a reindexação de um único stream a partir de from_block
+
+    Remove os eventos já gravados desse stream a partir do bloco e recua
+    somente o checkpoint dele; os demais streams não são afetados. O loop
+    principal reprocessa o intervalo na próxima execução.
+    """
+    stream = next((s for s in EVENT_STREAMS if s[0] == contract and s[1] == event_name), None)
+    if not stream:
+        raise ValueError(f"Stream desconhecido: {contract}.{event_name}")
+    
+    event_type = stream[2]
+    
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
         
-        # Obter último bloco processado
-        cur.execute("SELECT MAX((data->>'blockNumber')::INTEGER) FROM events")
-        result = cur.fetchone()
-        last_block = result[0] if result[0] else w3.eth.block_number - 100
+        deleted = delete_events(
+            cur,
+            "type = %s AND (data->>'blockNumber')::BIGINT >= %s",
+            (event_type, from_block)
+        )
         
+        cur.execute("""
+            INSERT INTO listener_checkpoints (contract, event_name, last_block, updated_at)
+            VALUES (%s, %s, %s, NOW())
+            ON CONFLICT (contract, event_name) DO UPDATE
+            SET last_block = EXCLUDED.last_block, updated_at = NOW()
+        """, (contract, event_name, from_block - 1))
+        
+        conn.commit()
         cur.close()
+        
+        logger.info(f"♻️ Stream {contract}.{event_name} será reindexado a partir do bloco {from_block} ({deleted} eventos removidos)")
+        
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
         conn.close()
+
+def process_event(event, event_type):
+    """
+    Extrai os dados relevantes de um evento decodificado
+
+    Returns:
+        Tupla (event_type, event_data) pronta para save_events
+    """
+    event_data = {
+        'blockNumber': event['blockNumber'],
+        'logIndex': event['logIndex'],
+        'blockHash': Web3.to_hex(event['blockHash']),
+        'transactionHash': event['transactionHash'].hex(),
+        'address': event['address'],
+        'args': {}
+    }
+    
+    # Extrair argumentos do evento
+    for key, value in event['args'].items():
+        if isinstance(value, bytes):
+            event_data['args'][key] = value.hex()
+        else:
+            event_data['args'][key] = str(value)
+    
+    return event_type, event_data
+
+def fetch_window_events(from_block, to_block, checkpoints):
+    """
+    Busca e decodifica os eventos dos contratos em uma janela de blocos
+
+    Faz uma única chamada eth_getLogs filtrando pelos endereços dos três
+    contratos e pela união dos topic0 monitorados; cada log é decodificado
+    localmente com a ABI do seu stream (TOPIC_LOOKUP). Logs de um stream
+    abaixo do seu próprio checkpoint são descartados, de modo que um stream
+    em reindexação não duplica os demais. Qualquer erro de RPC, ou um log
+    que não decodifica, é propagado para que a janela inteira seja refeita.
+
+    Returns:
+        Tupla (events, streams): eventos (event_type, event_data) ordenados
+        por bloco e logIndex, e os streams cobertos pela janela
+    """
+    logs = w3.eth.get_logs({
+        'fromBlock': from_block,
+        'toBlock': to_block,
+        'address': LOG_FILTER_ADDRESSES,
+        'topics': LOG_FILTER_TOPICS
+    })
+    
+    events = []
+    for log in logs:
+        if not log['topics']:
+            continue
+        
+        stream = TOPIC_LOOKUP.get((log['address'].lower(), Web3.to_hex(log['topics'][0])))
+        if not stream:
+            continue
+        
+        contract_name, event_name, event_type, event = stream
+        if log['blockNumber'] <= checkpoints[(contract_name, event_name)]:
+            continue
+        
+        try:
+            events.append(process_event(event.process_log(log), event_type))
+        except Exception as e:
+            # Descartar o log avançaria o checkpoint sem o evento: a janela falha e é refeita
+            raise ValueError(
+                f"Evento {contract_name}.{event_name} não decodificado "
+                f"(bloco {log['blockNumber']}, tx {Web3.to_hex(log['transactionHash'])}): {str(e)}"
+            ) from e
+    
+    events.sort(key=lambda item: (item[1]['blockNumber'], item[1]['logIndex']))
+    # Streams já adiante de to_block (ex.: durante a reindexação de outro) não recuam
+    streams = [stream for stream in ACTIVE_STREAMS if checkpoints[stream] < to_block]
+    return events, streams
+
+# Trechos de mensagens de erro de provedores RPC quando o intervalo é grande demais
+RANGE_ERROR_MARKERS = (
+    'too many',
+    'more than',
+    'limit exceeded',
+    'block range',
+    'range is too large',
+    'response size',
+    'timeout',
+    'timed out'
+)
+
+def is_range_error(error):
+    """Indica se o erro de eth_getLogs se resolve consultando um intervalo menor"""
+    if isinstance(error, requests.exceptions.Timeout):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in RANGE_ERROR_MARKERS)
+
+class AdaptiveBlockRange:
+    """
+    Tamanho de janela de blocos que se adapta às respostas do provedor RPC
+
+    Cai pela metade quando o provedor recusa o intervalo (muitos resultados
+    ou timeout) e dobra novamente a cada consulta bem-sucedida.
+    """
+    
+    def __init__(self, min_size=MIN_BLOCK_RANGE, max_size=MAX_BLOCK_RANGE):
+        self.min_size = max(min_size, 1)
+        self.max_size = max(max_size, self.min_size)
+        self.size = self.max_size
+    
+    def shrink(self):
+        """Reduz a janela; retorna False se ela já estava no mínimo"""
+        if self.size <= self.min_size:
+            return False
+        self.size = max(self.size // 2, self.min_size)
+        return True
+    
+    def grow(self):
+        self.size = min(self.size * 2, self.max_size)
+
+def fetch_range_adaptive(from_block, to_block, checkpoints):
+    """
+    Busca os eventos de um intervalo, dividindo-o ao meio enquanto o provedor recusar
+
+    Usado pelo backfill, em que cada chunk é buscado de forma independente.
+    """
+    try:
+        return fetch_window_events(from_block, to_block, checkpoints)
+    except Exception as e:
+        if from_block >= to_block or not is_range_error(e):
+            raise
+        
+        middle = (from_block + to_block) // 2
+        logger.warning(f"⚠️ Intervalo {from_block}-{to_block} recusado pelo RPC, dividindo em dois")
+        left_events, streams = fetch_range_adaptive(from_block, middle, checkpoints)
+        right_events, _ = fetch_range_adaptive(middle + 1, to_block, checkpoints)
+        return left_events + right_events, streams
+
+def backfill(from_block, to_block):
+    """
+    Ingere um intervalo histórico de blocos com paralelismo limitado
+
+    Os chunks são buscados em paralelo (até BACKFILL_WORKERS chamadas
+    eth_getLogs simultâneas) mas gravados estritamente em ordem, um commit
+    por chunk. Blocos já cobertos pelo checkpoint de um stream são ignorados;
+    para reprocessá-los use --reindex antes. Um FROM além do checkpoint
+    mais atrasado é recuado até ele (senão o intervalo entre os dois nunca
+    seria ingerido), e só eventos de streams contíguos ao chunk são gravados.
+
+    Não roda junto com o listener (advisory lock LISTENER_LOCK_ID): os dois
+    avançariam os mesmos checkpoints e duplicariam eventos.
+    """
+    lock_conn = acquire_listener_lock()
+    if lock_conn is None:
+        logger.error("❌ Listener ou outro backfill em execução: pare-o antes do backfill")
+        return
+    
+    try:
+        _backfill(from_block, to_block)
+    finally:
+        lock_conn.close()
+
+def _backfill(from_block, to_block):
+    init_tables()
+    checkpoints = load_checkpoints(from_block - 1)
+    chunk_size = max(MAX_BLOCK_RANGE, 1)
+    
+    first_missing = min((checkpoints[stream] for stream in ACTIVE_STREAMS), default=from_block - 1) + 1
+    if from_block > first_missing:
+        logger.warning(f"⚠️ Blocos {first_missing}-{from_block - 1} ainda não ingeridos: backfill começa em {first_missing}")
+        from_block = first_missing
+    
+    chunks = [
+        (start, min(start + chunk_size - 1, to_block))
+        for start in range(from_block, to_block + 1, chunk_size)
+    ]
+    logger.info(f"⏩ Backfill dos blocos {from_block} até {to_block} em {len(chunks)} chunks ({BACKFILL_WORKERS} em paralelo)")
+    
+    total_events = 0
+    with ThreadPoolExecutor(max_workers=BACKFILL_WORKERS) as executor:
+        pending = deque()
+        next_chunk = 0
         
-        logger.info(f"📍 Último bloco processado: {last_block}")
+        while pending or next_chunk < len(chunks):
+            # Manter no máximo 2x BACKFILL_WORKERS chunks em memória
+            while next_chunk < len(chunks) and len(pending) < BACKFILL_WORKERS * 2:
+                chunk_from, chunk_to = chunks[next_chunk]
+                snapshot = dict(checkpoints)
+                pending.append((chunk_from, chunk_to, executor.submit(fetch_range_adaptive, chunk_from, chunk_to, snapshot)))
+                next_chunk += 1
+            
+            chunk_from, chunk_to, future = pending.popleft()
+            events, streams = future.result()
+            
+            contiguous = [
+                stream for stream in streams
+                if chunk_from - 1 <= checkpoints[stream] < chunk_to
+            ]
+            events = [event for event in events if STREAM_BY_TYPE[event[0]] in contiguous]
+            save_events(events, chunk_to, contiguous)
+            for stream in contiguous:
+                checkpoints[stream] = chunk_to
+            
+            total_events += len(events)
+            logger.info(f"✅ Chunk {chunk_from}-{chunk_to}: {len(events)} eventos")
+    
+    logger.info(f"🏁 Backfill concluído: {total_events} eventos")
+
+def listen_events():
+    """Loop principal que escuta eventos da blockchain"""
+    logger.info("🎧 Iniciando listener de eventos...")
+    
+    # Um único listener por banco, e nunca junto com um backfill
+    lock_conn = None
+    while lock_conn is None:
+        try:
+            lock_conn = acquire_listener_lock()
+            if lock_conn is None:
+                logger.warning(f"⏳ Outro listener ou backfill em execução, nova tentativa em {POLL_INTERVAL}s")
+        except psycopg2.Error as e:
+            logger.error(f"❌ Erro ao obter o lock do listener: {str(e)}")
+        if lock_conn is None:
+            time.sleep(POLL_INTERVAL)
+    
+    # Obter checkpoints do banco (O(1) por stream, sem varrer a tabela events)
+    try:
+        init_tables()
+        checkpoints = load_checkpoints(w3.eth.block_number - 100)
+        logger.info(f"📍 Último bloco processado: {max(checkpoints.values())}")
         
     except Exception as e:
         logger.error(f"❌ Erro ao inicializar banco: {str(e)}")
-        last_block = w3.eth.block_number - 100
+        default_block = w3.eth.block_number - 100
+        checkpoints = {(contract, event_name): default_block for contract, event_name, _ in EVENT_STREAMS}
+    
+    try:
+        block_ring = load_block_ring()
+    except Exception as e:
+        logger.error(f"❌ Erro ao carregar hashes de blocos: {str(e)}")
+        block_ring = BlockHashRing()
+    
+    block_range = AdaptiveBlockRange()
+    
+    subscriber = None
+    if POLYGON_WS_URL:
+        subscriber = NewHeadsSubscriber(POLYGON_WS_URL)
+        subscriber.start()
+        logger.info(f"⚡ Modo WebSocket ativo (fallback para polling HTTP a cada {POLL_INTERVAL}s)")
     
-    current_block = last_block
+    ws_head = None
     
     while True:
         try:
-            latest_block = w3.eth.block_number
+            # O head anunciado pelo WebSocket evita um eth_blockNumber extra por bloco
+            latest_block = ws_head if ws_head is not None else w3.eth.block_number
+            current_block = min(checkpoints[stream] for stream in ACTIVE_STREAMS) + 1
             
-            if current_block < latest_block:
+            if current_block <= latest_block:
                 logger.info(f"🔍 Processando blocos {current_block} até {latest_block}...")
                 
-                # Eventos do IdentityNFT
-                try:
-                    # MintingEvent
-                    minting_events = identity_nft.events.MintingEvent().get_logs(
-                        fromBlock=current_block,
-                        toBlock=latest_block
-                    )
-                    for event in minting_events:
-                        process_event(event, 'Minted')
+                # Processar em chunks adaptativos até alcançar o último bloco
+                while current_block <= latest_block:
+                    to_block = min(current_block + block_range.size - 1, latest_block)
                     
-                    # CancelamentoEvent
-                    cancel_events = identity_nft.events.CancelamentoEvent().get_logs(
-                        fromBlock=current_block,
-                        toBlock=latest_block
-                    )
-                    for event in cancel_events:
-                        process_event(event, 'Canceled')
+                    # Detectar reorg: o pai do primeiro bloco novo deve ser o último bloco processado
+                    expected_parent = block_ring.get(current_block - 1)
+                    if expected_parent:
+                        first_block = w3.eth.get_block(current_block)
+                        if Web3.to_hex(first_block['parentHash']) != expected_parent:
+                            fork_block = find_fork_block(block_ring)
+                            logger.warning(f"🔀 Reorg detectado no bloco {current_block} (fork em {fork_block})")
+                            rollback_to(fork_block, block_ring, checkpoints)
+                            current_block = fork_block + 1
+                            continue
                     
-                    # CancelamentoSimples
-                    cancel_simple_events = identity_nft.events.CancelamentoSimples().get_logs(
-                        fromBlock=current_block,
-                        toBlock=latest_block
-                    )
-                    for event in cancel_simple_events:
-                        process_event(event, 'CanceledSimple')
-                        
-                except Exception as e:
-                    logger.error(f"❌ Erro ao processar eventos IdentityNFT: {str(e)}")
-                
-                # Eventos do ProofRegistry
-                try:
-                    proof_events = proof_registry.events.ProofRegistered().get_logs(
-                        fromBlock=current_block,
-                        toBlock=latest_block
-                    )
-                    for event in proof_events:
-                        process_event(event, 'ProofStored')
+                    head_block = w3.eth.get_block(to_block)
                     
-                    revoke_events = proof_registry.events.ProofRevoked().get_logs(
-                        fromBlock=current_block,
-                        toBlock=latest_block
-                    )
-                    for event in revoke_events:
-                        process_event(event, 'ProofRevoked')
-                        
-                except Exception as e:
-                    logger.error(f"❌ Erro ao processar eventos ProofRegistry: {str(e)}")
-                
-                # Eventos do FailSafe
-                try:
-                    failsafe_events = failsafe.events.FailsafeEvent().get_logs(
-                        fromBlock=current_block,
-                        toBlock=latest_block
-                    )
-                    for event in failsafe_events:
-                        process_event(event, 'FailSafeTriggered')
-                        
-                except Exception as e:
-                    logger.error(f"❌ Erro ao processar eventos FailSafe: {str(e)}")
-                
-                current_block = latest_block + 1
-                logger.info(f"✅ Blocos processados. Próximo: {current_block}")
+                    try:
+                        events, streams = fetch_window_events(current_block, to_block, checkpoints)
+                    except Exception as e:
+                        if is_range_error(e) and block_range.shrink():
+                            logger.warning(f"⚠️ Intervalo {current_block}-{to_block} recusado pelo RPC, reduzindo janela para {block_range.size} blocos")
+                            continue
+                        raise
+                    
+                    block_range.grow()
+                    
+                    # Gravar todos os eventos do chunk em um único commit
+                    save_events(events, to_block, streams, head_block)
+                    
+                    for stream in streams:
+                        checkpoints[stream] = to_block
+                    block_ring.add(to_block, Web3.to_hex(head_block['hash']))
+                    
+                    current_block = to_block + 1
+                    logger.info(f"✅ Blocos processados até {to_block} ({len(events)} eventos). Próximo: {current_block}")
                 
                 # Heartbeat para monitoramento
                 try:
@@ -236,7 +1120,10 @@ def listen_events():
             else:
                 logger.debug(f"⏳ Aguardando novos blocos... (atual: {current_block})")
             
-            time.sleep(POLL_INTERVAL)
+            if subscriber:
+                ws_head = subscriber.wait_for_head(POLL_INTERVAL)
+            else:
+                time.sleep(POLL_INTERVAL)
             
         except KeyboardInterrupt:
             logger.info("\n🛑 Listener interrompido pelo usuário")
@@ -244,11 +1131,36 @@ def listen_events():
             
         except Exception as e:
             logger.error(f"❌ Erro no listener: {str(e)}")
+            ws_head = None
             time.sleep(POLL_INTERVAL)
 
 if __name__ == '__main__':
-    logger.info("=" * 60)
-    logger.info("🎧 BLOCKTRUST BLOCKCHAIN EVENT LISTENER v1.2")
-    logger.info("=" * 60)
-    listen_events()
-
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Listener de eventos Blocktrust')
+    parser.add_argument(
+        '--reindex',
+        nargs=3,
+        metavar=('CONTRACT', 'EVENT', 'FROM_BLOCK'),
+        help='Reindexa um único stream (ex: --reindex IdentityNFT MintingEvent 12345678)'
+    )
+    parser.add_argument(
+        '--backfill',
+        nargs=2,
+        type=int,
+        metavar=('FROM', 'TO'),
+        help='Ingere o intervalo de blocos FROM..TO em paralelo e sai'
+    )
+    args = parser.parse_args()
+    
+    if args.reindex:
+        contract, event_name, from_block = args.reindex
+        init_tables()
+        reindex_stream(contract, event_name, int(from_block))
+    elif args.backfill:
+        backfill(*args.backfill)
+    else:
+        logger.info("=" * 60)
+        logger.info("🎧 BLOCKTRUST BLOCKCHAIN EVENT LISTENER v1.2")
+        logger.info("=" * 60)
+        listen_events()
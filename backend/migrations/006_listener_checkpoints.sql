@@ -0,0 +1,15 @@
+-- Migration 006: Checkpoints do listener por contrato/evento
+
+-- Último bloco processado de cada stream de eventos
+-- Atualizado na mesma transação que grava os eventos do lote
+CREATE TABLE IF NOT EXISTS listener_checkpoints (
+    contract VARCHAR(50) NOT NULL,
+    event_name VARCHAR(100) NOT NULL,
+    last_block BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (contract, event_name)
+);
+
+-- Comentários
+COMMENT ON TABLE listener_checkpoints IS 'Último bloco processado pelo listener para cada contrato/evento';
+COMMENT ON COLUMN listener_checkpoints.last_block IS 'Último bloco cujos eventos já foram gravados em events';
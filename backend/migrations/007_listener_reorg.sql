@@ -0,0 +1,23 @@
+-- Migration 007: Proteção contra reorgs no listener
+
+-- Índice por número de bloco (rollback de reorg e visão "finalized" do explorer)
+CREATE INDEX IF NOT EXISTS idx_events_block_number ON events (((data->>'blockNumber')::BIGINT));
+
+-- Hashes dos blocos recentes processados pelo listener (ring buffer)
+CREATE TABLE IF NOT EXISTS listener_blocks (
+    block_number BIGINT PRIMARY KEY,
+    block_hash VARCHAR(66) NOT NULL,
+    parent_hash VARCHAR(66) NOT NULL
+);
+
+-- Cabeça da cadeia vista pelo listener e último bloco com confirmações suficientes
+CREATE TABLE IF NOT EXISTS listener_head (
+    id INTEGER PRIMARY KEY,
+    head_block BIGINT NOT NULL,
+    finalized_block BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Comentários
+COMMENT ON TABLE listener_blocks IS 'Hashes dos últimos LISTENER_BLOCK_RING_SIZE blocos processados (detecção de reorg)';
+COMMENT ON COLUMN listener_head.finalized_block IS 'head_block - LISTENER_CONFIRMATIONS; eventos até este bloco são considerados finais';
@@ -0,0 +1,19 @@
+-- Migration 008: Paginação por cursor e contadores de eventos
+
+-- Índice composto (type, id): paginação filtrada por tipo sem varrer a tabela
+CREATE INDEX IF NOT EXISTS idx_events_type_id ON events (type, id);
+
+-- Contadores por tipo, mantidos pelo listener na mesma transação dos INSERT/DELETE
+CREATE TABLE IF NOT EXISTS event_counts (
+    type VARCHAR(50) PRIMARY KEY,
+    count BIGINT NOT NULL DEFAULT 0
+);
+
+-- Semear a partir dos eventos existentes
+INSERT INTO event_counts (type, count)
+SELECT type, COUNT(*) FROM events
+GROUP BY type
+ON CONFLICT (type) DO UPDATE SET count = EXCLUDED.count;
+
+-- Comentários
+COMMENT ON TABLE event_counts IS 'Total de eventos por tipo (usado no total de /api/explorer/events sem COUNT(*))';
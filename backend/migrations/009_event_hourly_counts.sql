@@ -0,0 +1,19 @@
+-- Migration 009: Buckets por hora para /api/explorer/stats
+
+-- Eventos por hora e tipo, mantidos pelo listener junto com event_counts
+CREATE TABLE IF NOT EXISTS event_hourly_counts (
+    bucket TIMESTAMP NOT NULL,
+    type VARCHAR(50) NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, type)
+);
+
+-- Semear com os últimos 30 dias (LISTENER_HOURLY_RETENTION_DAYS)
+INSERT INTO event_hourly_counts (bucket, type, count)
+SELECT date_trunc('hour', timestamp), type, COUNT(*) FROM events
+WHERE timestamp >= NOW() - INTERVAL '30 days'
+GROUP BY 1, 2
+ON CONFLICT (bucket, type) DO UPDATE SET count = EXCLUDED.count;
+
+-- Comentários
+COMMENT ON TABLE event_hourly_counts IS 'Eventos por hora (date_trunc) e tipo; buckets mais antigos que LISTENER_HOURLY_RETENTION_DAYS são removidos pelo listener';
@@ -0,0 +1,40 @@
+-- Migration 010: Outbox de transações e nonces por conta (api/utils/tx_dispatcher.py)
+
+-- Próximo nonce reservado por conta assinante (linha bloqueada durante a reserva)
+CREATE TABLE IF NOT EXISTS tx_nonces (
+    account VARCHAR(42) PRIMARY KEY,
+    next_nonce BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Transações assinadas, gravadas antes do envio e acompanhadas até o receipt
+CREATE TABLE IF NOT EXISTS tx_outbox (
+    id SERIAL PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    from_address VARCHAR(42) NOT NULL,
+    to_address VARCHAR(42) NOT NULL,
+    nonce BIGINT NOT NULL,
+    data TEXT NOT NULL,
+    gas BIGINT NOT NULL,
+    gas_price NUMERIC(78, 0) NOT NULL,
+    chain_id BIGINT NOT NULL,
+    raw_tx TEXT NOT NULL,
+    tx_hash VARCHAR(66) NOT NULL,
+    tx_hashes JSONB NOT NULL DEFAULT '[]',
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    block_number BIGINT,
+    gas_used BIGINT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    submitted_at TIMESTAMP,
+    confirmed_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_tx_outbox_open ON tx_outbox(id) WHERE status IN ('pending', 'submitted');
+CREATE INDEX IF NOT EXISTS idx_tx_outbox_tx_hash ON tx_outbox(tx_hash);
+
+-- Comentários
+COMMENT ON COLUMN tx_outbox.status IS 'pending (não enviada), submitted, confirmed ou failed';
+COMMENT ON COLUMN tx_outbox.tx_hashes IS 'Todos os hashes enviados para o nonce (original + reenvios com bump de gas)';
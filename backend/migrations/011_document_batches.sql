@@ -0,0 +1,26 @@
+-- Migration 011: Ancoragem em lote de documentos (raiz de Merkle por lote)
+
+-- Lotes ancorados no ProofRegistry
+CREATE TABLE IF NOT EXISTS document_batches (
+    id SERIAL PRIMARY KEY,
+    merkle_root VARCHAR(66) NOT NULL,
+    leaf_count INTEGER NOT NULL,
+    tx_id INTEGER,
+    tx_hash VARCHAR(66),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Prova de inclusão de cada registro
+ALTER TABLE document_registrations
+ADD COLUMN IF NOT EXISTS anchor_status VARCHAR(20),
+ADD COLUMN IF NOT EXISTS batch_id INTEGER REFERENCES document_batches(id),
+ADD COLUMN IF NOT EXISTS leaf_index INTEGER,
+ADD COLUMN IF NOT EXISTS merkle_proof JSONB;
+
+-- Fila de registros aguardando o próximo lote
+CREATE INDEX IF NOT EXISTS idx_doc_anchor_queued ON document_registrations(id) WHERE anchor_status = 'queued';
+
+-- Comentários
+COMMENT ON COLUMN document_registrations.anchor_status IS 'NULL (tx própria, modo direct), queued ou batched';
+COMMENT ON COLUMN document_registrations.merkle_proof IS 'Hashes irmãos (keccak256, pares ordenados) da folha até document_batches.merkle_root';
+COMMENT ON COLUMN document_batches.tx_id IS 'Transação da raiz em tx_outbox';
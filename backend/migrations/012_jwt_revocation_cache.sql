@@ -0,0 +1,4 @@
+-- Migration 012: Cache de revogação de JWT (delta pull por revoked_at)
+
+-- Cada worker busca apenas as revogações novas desde a última leitura
+CREATE INDEX IF NOT EXISTS idx_jwt_blacklist_revoked_at ON jwt_blacklist(revoked_at);
@@ -0,0 +1,15 @@
+-- Migration 013: Tabela de eventos de auditoria (gravada em lote pelo audit_writer)
+
+-- Antes criada por log_audit_event a cada evento; agora criada uma vez
+CREATE TABLE IF NOT EXISTS audit_events (
+    id SERIAL PRIMARY KEY,
+    event_type VARCHAR(100) NOT NULL,
+    user_id INTEGER,
+    payload JSONB,
+    status VARCHAR(50) DEFAULT 'success',
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_audit_events_type ON audit_events(event_type);
+CREATE INDEX IF NOT EXISTS idx_audit_events_user_id ON audit_events(user_id);
+CREATE INDEX IF NOT EXISTS idx_audit_events_created_at ON audit_events(created_at DESC);
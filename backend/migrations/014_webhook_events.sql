@@ -0,0 +1,25 @@
+-- Migration 014: Fila persistente de webhooks (api/utils/webhook_jobs.py)
+
+-- Eventos recebidos, deduplicados por provedor + chave, processados em background
+CREATE TABLE IF NOT EXISTS webhook_events (
+    id SERIAL PRIMARY KEY,
+    provider VARCHAR(50) NOT NULL,
+    dedup_key VARCHAR(255) NOT NULL,
+    event_type VARCHAR(100),
+    payload JSONB NOT NULL,
+    state JSONB NOT NULL DEFAULT '{}',
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP DEFAULT NOW(),
+    locked_until TIMESTAMP,
+    created_at TIMESTAMP DEFAULT NOW(),
+    processed_at TIMESTAMP,
+    UNIQUE (provider, dedup_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_webhook_events_due ON webhook_events(next_attempt_at) WHERE status IN ('pending', 'processing');
+
+-- Reexecuções de um job não enviam a mesma transação duas vezes
+ALTER TABLE tx_outbox ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(255);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_tx_outbox_idempotency_key ON tx_outbox(idempotency_key) WHERE idempotency_key IS NOT NULL;
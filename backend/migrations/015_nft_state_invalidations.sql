@@ -0,0 +1,18 @@
+-- Migration 015: Invalidações do cache de estado on-chain dos NFTs
+
+-- Uma linha por evento que muda o NFT ativo (Minted, Canceled, CanceledSimple,
+-- FailSafeTriggered), gravada pelo listener junto com os eventos; carteira e
+-- token nulos (reorg) invalidam o cache inteiro
+CREATE TABLE IF NOT EXISTS nft_state_invalidations (
+    id BIGSERIAL PRIMARY KEY,
+    wallet_address VARCHAR(42),
+    token_id VARCHAR(78),
+    block_number BIGINT,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Limpeza por idade (LISTENER_NFT_INVALIDATION_RETENTION_HOURS)
+CREATE INDEX IF NOT EXISTS idx_nft_state_invalidations_created_at ON nft_state_invalidations(created_at);
+
+-- Comentários
+COMMENT ON TABLE nft_state_invalidations IS 'Carteiras/tokens com estado on-chain alterado; lidas por id pelo cache de NFT de cada processo da API';
@@ -0,0 +1,64 @@
+-- Migration 016: Índice local de provas do ProofRegistry
+
+-- Estado de cada docHash derivado dos eventos ProofRegistered/ProofRevoked,
+-- mantido pelo listener; a chave é keccak256(docHash), que é o que o log
+-- traz para um `string indexed`
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS proofs (
+    doc_hash_key VARCHAR(66) PRIMARY KEY,
+    signer VARCHAR(42) NOT NULL,
+    block_number BIGINT NOT NULL,
+    transaction_hash VARCHAR(66) NOT NULL,
+    log_index INTEGER NOT NULL,
+    registered_at TIMESTAMP,
+    revoked BOOLEAN NOT NULL DEFAULT FALSE,
+    revoked_block BIGINT,
+    revoked_tx VARCHAR(66),
+    updated_block BIGINT NOT NULL,
+    updated_log_index INTEGER NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Rollback em reorgs (provas alteradas acima do bloco de fork)
+CREATE INDEX IF NOT EXISTS idx_proofs_updated_block ON proofs(updated_block);
+
+-- Comentários
+COMMENT ON TABLE proofs IS 'Provas do ProofRegistry por keccak256(docHash); /api/document/verify responde daqui sem eth_call';
+
+COMMIT;
+
+-- Semear em uma transação própria, depois da tabela criada (eventos gravados
+-- por versões anteriores do listener não têm logIndex: posição 0 no bloco).
+-- events guarda o docHash sem 0x; a chave leva o prefixo, como proof_key()
+BEGIN;
+
+-- Último registro de cada docHash já ingerido
+INSERT INTO proofs (doc_hash_key, signer, block_number, transaction_hash, log_index,
+                    registered_at, updated_block, updated_log_index)
+SELECT DISTINCT ON ('0x' || regexp_replace(lower(data->'args'->>'docHash'), '^0x', ''))
+    '0x' || regexp_replace(lower(data->'args'->>'docHash'), '^0x', ''), lower(data->'args'->>'signer'),
+    (data->>'blockNumber')::BIGINT, data->>'transactionHash', COALESCE((data->>'logIndex')::INTEGER, 0),
+    to_timestamp((data->'args'->>'timestamp')::BIGINT) AT TIME ZONE 'UTC',
+    (data->>'blockNumber')::BIGINT, COALESCE((data->>'logIndex')::INTEGER, 0)
+FROM events
+WHERE type = 'ProofStored'
+ORDER BY '0x' || regexp_replace(lower(data->'args'->>'docHash'), '^0x', ''), (data->>'blockNumber')::BIGINT DESC, COALESCE((data->>'logIndex')::INTEGER, 0) DESC
+ON CONFLICT (doc_hash_key) DO NOTHING;
+
+-- Revogações posteriores ao último registro
+UPDATE proofs p
+SET revoked = TRUE, revoked_block = r.block_number, revoked_tx = r.transaction_hash,
+    updated_block = r.block_number, updated_log_index = r.log_index
+FROM (
+    SELECT DISTINCT ON ('0x' || regexp_replace(lower(data->'args'->>'docHash'), '^0x', ''))
+        '0x' || regexp_replace(lower(data->'args'->>'docHash'), '^0x', '') AS doc_hash_key, data->>'transactionHash' AS transaction_hash,
+        (data->>'blockNumber')::BIGINT AS block_number, COALESCE((data->>'logIndex')::INTEGER, 0) AS log_index
+    FROM events
+    WHERE type = 'ProofRevoked'
+    ORDER BY '0x' || regexp_replace(lower(data->'args'->>'docHash'), '^0x', ''), (data->>'blockNumber')::BIGINT DESC, COALESCE((data->>'logIndex')::INTEGER, 0) DESC
+) r
+WHERE p.doc_hash_key = r.doc_hash_key
+AND (r.block_number, r.log_index) > (p.block_number, p.log_index);
+
+COMMIT;
@@ -0,0 +1,8 @@
+-- Migration 017: Taxas EIP-1559 na outbox de transações
+
+-- Transações tipo 2: gas_price guarda maxFeePerGas e esta coluna a
+-- maxPriorityFeePerGas; NULL indica transação legada (gasPrice)
+ALTER TABLE tx_outbox ADD COLUMN IF NOT EXISTS max_priority_fee NUMERIC(78, 0);
+
+-- Comentários
+COMMENT ON COLUMN tx_outbox.max_priority_fee IS 'maxPriorityFeePerGas da transação EIP-1559 (NULL = legada; gas_price é então o gasPrice)';
@@ -0,0 +1,8 @@
+-- Migration 018: Limite de envios recusados na outbox de transações
+
+-- Envios recusados pelo nó; ao atingir TX_MAX_BROADCAST_FAILURES uma transação
+-- nunca aceita é marcada como failed e o nonce é liberado
+ALTER TABLE tx_outbox ADD COLUMN IF NOT EXISTS broadcast_failures INTEGER NOT NULL DEFAULT 0;
+
+-- Comentários
+COMMENT ON COLUMN tx_outbox.broadcast_failures IS 'Envios recusados pelo nó (saldo insuficiente, taxa abaixo do mínimo...)';
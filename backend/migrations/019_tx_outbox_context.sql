@@ -0,0 +1,8 @@
+-- Migration 019: Contexto de conclusão na outbox de transações
+
+-- Dados da aplicação (ex: usuário do mint/cancelamento) entregues ao handler
+-- registrado para o kind quando a transação é confirmada ou falha
+ALTER TABLE tx_outbox ADD COLUMN IF NOT EXISTS context JSONB;
+
+-- Comentários
+COMMENT ON COLUMN tx_outbox.context IS 'Dados do passo de conclusão executado pelo worker no status final';
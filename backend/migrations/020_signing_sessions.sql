@@ -0,0 +1,19 @@
+-- Migration 020: Sessões de assinatura compartilhadas entre os workers
+
+-- Uma linha por sessão aberta em POST /api/wallet/session. Guarda apenas o
+-- SHA-256 do token e a chave privada cifrada com uma chave derivada do token
+CREATE TABLE IF NOT EXISTS signing_sessions (
+    token_id VARCHAR(64) PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    wrapped_key TEXT NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_signing_sessions_user ON signing_sessions(user_id);
+CREATE INDEX IF NOT EXISTS idx_signing_sessions_expires ON signing_sessions(expires_at);
+
+-- Comentários
+COMMENT ON TABLE signing_sessions IS 'Sessões de assinatura (X-Signing-Session) visíveis a todos os workers';
+COMMENT ON COLUMN signing_sessions.token_id IS 'SHA-256 do token da sessão (o token nunca é gravado)';
+COMMENT ON COLUMN signing_sessions.wrapped_key IS 'Chave privada cifrada (Fernet) com SHA-256(prefixo + token)';
@@ -0,0 +1,16 @@
+-- Migration 021: Prefixo 0x nas chaves de proofs semeadas pela 016
+
+-- A semeadura original copiava o docHash de events (gravado sem 0x), enquanto
+-- o listener e proof_key() usam a chave com 0x; linhas sem prefixo nunca eram
+-- encontradas por /api/document/verify
+BEGIN;
+
+-- Se o listener já gravou a chave com prefixo, a linha dele é a mais recente
+DELETE FROM proofs p
+WHERE p.doc_hash_key NOT LIKE '0x%'
+AND EXISTS (SELECT 1 FROM proofs q WHERE q.doc_hash_key = '0x' || p.doc_hash_key);
+
+UPDATE proofs SET doc_hash_key = '0x' || doc_hash_key
+WHERE doc_hash_key NOT LIKE '0x%';
+
+COMMIT;
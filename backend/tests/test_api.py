@@ -4,12 +4,15 @@ Testes automatizados para a API do BTS Blocktrust
 import pytest
 import sys
 import os
+import io
+import hashlib
 
 # Adicionar o diretório backend ao path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from app import app
-from api.utils.db import get_db_connection
+from api.utils.db import get_db_connection, db_connection, get_pool_stats
+from api.auth import generate_token
 
 @pytest.fixture
 def client():
@@ -191,7 +194,22 @@ class TestDatabase:
             conn.close()
         except Exception as e:
             pytest.fail(f"Falha na conexão com o banco de dados: {e}")
-    
+
+    def test_db_connection_returns_to_pool(self):
+        """Testa que close() devolve a conexão ao pool em vez de encerrá-la"""
+        stats_before = get_pool_stats()
+
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute('SELECT 1 AS ok')
+            assert cur.fetchone()['ok'] == 1
+            cur.close()
+            assert get_pool_stats()['checked_out'] == stats_before['checked_out'] + 1
+
+        stats_after = get_pool_stats()
+        assert stats_after['checked_out'] == stats_before['checked_out']
+        assert stats_after['checkouts'] == stats_before['checkouts'] + 1
+
     def test_init_db(self, client):
         """Testa inicialização do banco de dados"""
         response = client.post('/api/init-db')
@@ -199,6 +217,243 @@ class TestDatabase:
         assert response.status_code == 200
         assert response.json['status'] == 'success'
 
+class TestExplorerEvents:
+    """Testes para a paginação de /api/explorer/events"""
+    
+    def _explorer_token(self, client):
+        response = client.post('/api/explorer/login', json={
+            'email': 'admin@bts.com',
+            'password': '123'
+        })
+        return response.json['token']
+    
+    def test_events_rejects_both_cursors(self, client):
+        """Testa que before_id e after_id não podem ser usados juntos"""
+        token = self._explorer_token(client)
+        response = client.get('/api/explorer/events?before_id=10&after_id=5',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        
+        assert response.status_code == 400
+        assert 'error' in response.json
+    
+    def test_events_cursor_pages(self, client):
+        """Testa que before_id retorna a página seguinte sem repetir eventos"""
+        token = self._explorer_token(client)
+        headers = {'Authorization': f'Bearer {token}'}
+        
+        first = client.get('/api/explorer/events?limit=2', headers=headers)
+        assert first.status_code == 200
+        
+        if not first.json['has_more']:
+            pytest.skip('Eventos insuficientes para paginar')
+        
+        cursor = first.json['next_before_id']
+        second = client.get(f'/api/explorer/events?limit=2&before_id={cursor}', headers=headers)
+        
+        assert second.status_code == 200
+        assert all(event['id'] < cursor for event in second.json['events'])
+
+class TestHashFile:
+    """Testes para o hash de arquivos em streaming"""
+    
+    def _headers(self):
+        return {'Authorization': f"Bearer {generate_token(1, 'hash@test.com')}"}
+    
+    def test_hash_raw_body(self, client):
+        """Testa hash do corpo binário com os três algoritmos em uma passada"""
+        content = os.urandom(200 * 1024)
+        response = client.post('/api/signature/hash-file?algorithms=sha256,sha3_256,keccak256',
+            data=content,
+            content_type='application/octet-stream',
+            headers=self._headers()
+        )
+        
+        assert response.status_code == 200
+        assert response.json['file_hash'] == hashlib.sha256(content).hexdigest()
+        assert response.json['hashes']['sha3_256'] == hashlib.sha3_256(content).hexdigest()
+        assert len(response.json['hashes']['keccak256']) == 64
+        assert response.json['size'] == len(content)
+    
+    def test_hash_multipart(self, client):
+        """Testa hash de arquivo enviado via multipart/form-data"""
+        content = b'conteudo do documento'
+        response = client.post('/api/signature/hash-file',
+            data={'file': (io.BytesIO(content), 'documento.pdf')},
+            content_type='multipart/form-data',
+            headers=self._headers()
+        )
+        
+        assert response.status_code == 200
+        assert response.json['file_hash'] == hashlib.sha256(content).hexdigest()
+    
+    def test_hash_legacy_json(self, client):
+        """Testa que o corpo JSON legado continua com o mesmo hash"""
+        response = client.post('/api/signature/hash-file',
+            json={'file_content': 'Y29udGV1ZG8='},
+            headers=self._headers()
+        )
+        
+        assert response.status_code == 200
+        assert response.json['file_hash'] == hashlib.sha256(b'Y29udGV1ZG8=').hexdigest()
+    
+    def test_hash_unknown_algorithm(self, client):
+        """Testa algoritmo não suportado"""
+        response = client.post('/api/signature/hash-file?algorithms=md5',
+            data=b'abc',
+            content_type='application/octet-stream',
+            headers=self._headers()
+        )
+        
+        assert response.status_code == 400
+
+class TestDocumentBatch:
+    """Testes para registro e verificação em lote"""
+
+    def test_verify_batch_requires_hashes(self, client):
+        """Testa lista de hashes vazia"""
+        response = client.post('/api/document/verify-batch', json={'hashes': []})
+        assert response.status_code == 400
+
+    def test_register_batch_requires_token(self, client):
+        """Testa registro em lote sem autenticação"""
+        response = client.post('/api/document/register-batch', json={'hashes': ['0x' + '0' * 64]})
+        assert response.status_code == 401
+
+    def test_verify_and_verify_batch_agree(self, client, monkeypatch):
+        """Testa que /verify e /verify-batch usam a mesma consulta, inclusive para hashes com maiúsculas"""
+        import json
+        from api.routes import document_routes
+
+        class FakeConnection:
+            def cursor(self):
+                return self
+
+            def execute(self, sql, params=None):
+                pass
+
+            def fetchall(self):
+                return []
+
+            def commit(self):
+                pass
+
+            def close(self):
+                pass
+
+        legacy = '0x' + 'AB' * 32
+        proof = {'valid': True, 'revoked': False, 'confirmations': 3}
+        looked_up = []
+
+        def find_proofs(cur, doc_hashes, min_confirmations):
+            looked_up.append(sorted(doc_hashes))
+            return {legacy: proof} if legacy in doc_hashes else {}
+
+        monkeypatch.setattr(document_routes, 'get_db_connection', FakeConnection)
+        monkeypatch.setattr(document_routes, 'find_batched_registrations', lambda cur, doc_hashes: {})
+        monkeypatch.setattr(document_routes, 'find_proofs', find_proofs)
+
+        single = client.post('/api/document/verify', json={'hash': legacy}).get_json()
+        lines = client.post('/api/document/verify-batch', json={'hashes': [legacy, '0x' + 'cd' * 32]}).data.decode().splitlines()
+        batch = [json.loads(line) for line in lines]
+
+        assert looked_up[0] == sorted(['0x' + 'ab' * 32, legacy])
+        assert single['document_hash'] == '0x' + 'ab' * 32
+        assert single['registered'] is True and single['proof'] == proof
+        assert batch[0]['registered'] is True and batch[0]['proof'] == proof
+        assert batch[1]['registered'] is False
+        assert batch[-1]['summary']['registered'] == 1
+
+        response = client.post('/api/document/verify', json={'hash': '0x' + 'zz' * 32})
+        assert response.status_code == 400
+
+    def test_register_batch_reports_only_saved_rows(self, client, monkeypatch):
+        """Testa que cada sucesso do register-batch só é enviado depois da linha gravada"""
+        import json
+        from api.routes import document_routes
+
+        class FakeConnection:
+            def cursor(self):
+                return self
+
+            def execute(self, sql, params=None):
+                pass
+
+            def fetchone(self):
+                return {'wallet_address': '0x' + '11' * 20, 'encrypted_private_key': None,
+                        'wallet_salt': None, 'nft_active': True}
+
+            def commit(self):
+                committed.extend(staged)
+                staged.clear()
+
+            def rollback(self):
+                staged.clear()
+
+            def close(self):
+                pass
+
+        staged, committed = [], []
+        monkeypatch.setattr(document_routes, 'get_db_connection', FakeConnection)
+        monkeypatch.setattr(document_routes, 'execute_values', lambda cur, sql, rows, template: staged.extend(rows))
+        monkeypatch.setattr(document_routes, 'batch_mode_enabled', lambda: True)
+        monkeypatch.setattr(document_routes, 'DOCUMENT_BULK_CHUNK_SIZE', 2)
+        monkeypatch.setattr(document_routes.document_batcher, 'start_worker', lambda: None)
+        monkeypatch.setattr(document_routes.document_batcher, 'notify_queued', lambda count: None)
+
+        response = client.post('/api/document/register-batch',
+            json={'hashes': ['0x' + 'a1' * 32, '0x' + 'a2' * 32, '0x' + 'a3' * 32]},
+            headers={'Authorization': f"Bearer {generate_token(1, 'batch@test.com')}"},
+            buffered=False
+        )
+        chunks = response.response
+        first = [json.loads(line) for line in next(chunks).decode().splitlines()]
+        assert [item['success'] for item in first] == [True, True]
+        assert [row[1] for row in committed] == [item['hash'] for item in first]
+
+        rest = b''.join(chunks).decode().splitlines()
+        assert json.loads(rest[-1])['summary']['registered'] == 3
+        assert len(committed) == 3
+        response.close()
+
+class TestNFTStatus:
+    """Testes para /api/nft/status"""
+
+    def _get(self, client, monkeypatch, contract, onchain):
+        from api.routes import nft_routes
+
+        class FakeConnection:
+            def cursor(self):
+                return self
+
+            def execute(self, sql, params=None):
+                pass
+
+            def fetchone(self):
+                return {'wallet_address': '0x' + '11' * 20, 'nft_id': 4, 'nft_active': True}
+
+            def close(self):
+                pass
+
+        monkeypatch.setattr(nft_routes, 'get_db_connection', FakeConnection)
+        monkeypatch.setattr(nft_routes.nft_manager, 'identity_nft_contract', contract)
+        monkeypatch.setattr(nft_routes.nft_state_cache, 'get_status_batch', lambda wallets, fetch: onchain)
+        monkeypatch.setattr(nft_routes.nft_manager.tx_dispatcher, 'start_worker', lambda: None)
+
+        return client.get('/api/nft/status', headers={'Authorization': f"Bearer {generate_token(1, 'nft@test.com')}"})
+
+    def test_status_without_contract_uses_database(self, client, monkeypatch):
+        """Testa que sem o contrato configurado o status vem do banco"""
+        response = self._get(client, monkeypatch, contract=None, onchain={})
+        assert response.status_code == 200
+        assert response.get_json()['nft_id'] == 4
+        assert response.get_json()['is_active'] is True
+
+    def test_status_read_failure_is_503(self, client, monkeypatch):
+        """Testa que uma leitura on-chain falha responde 503 em vez de 'sem NFT'"""
+        response = self._get(client, monkeypatch, contract=object(), onchain={})
+        assert response.status_code == 503
+
 class TestErrorHandling:
     """Testes para tratamento de erros"""
     
@@ -0,0 +1,64 @@
+"""
+Testes da gravação assíncrona de auditoria
+"""
+
+import json
+import os
+import stat
+import psycopg2
+from api.utils.audit_writer import AuditWriter
+
+
+def _writer(tmp_path, maxsize=100):
+    writer = AuditWriter(maxsize=maxsize, spill_dir=str(tmp_path))
+    writer.start_worker = lambda: None
+    return writer
+
+
+class TestAuditWriter:
+    """Testes da fila, do fallback em disco e da regravação"""
+
+    def test_full_queue_and_unavailable_db_spill_to_disk(self, tmp_path):
+        """Testa que a fila cheia e o banco fora do ar levam os eventos para o disco"""
+        writer = _writer(tmp_path, maxsize=1)
+
+        def unavailable(batch):
+            raise psycopg2.OperationalError('could not connect to server')
+        writer._write = unavailable
+
+        assert writer.enqueue('audit_events', event_type='kyc_approved', user_id=1, payload={'a': 1})
+        assert writer.enqueue('audit_logs', user_id=1, action='admin_login', endpoint='/api/admin/login')
+        assert writer.get_stats()['spilled'] == 1
+
+        # Banco fora do ar: o flush também vai para o disco
+        writer.flush()
+
+        lines = (tmp_path / f'audit-{os.getpid()}.jsonl').read_text().splitlines()
+        entries = [json.loads(line) for line in lines]
+        assert sorted(entry['table'] for entry in entries) == ['audit_events', 'audit_logs']
+        assert all(entry['row']['created_at'] for entry in entries)
+        assert writer.get_stats()['queued'] == 0
+
+    def test_spill_is_private(self, tmp_path):
+        """Testa que o diretório fica 0700 e o arquivo de eventos 0600"""
+        spill_dir = tmp_path / 'audit'
+        spill_dir.mkdir(mode=0o755)
+        spill_dir.chmod(0o755)
+        writer = AuditWriter(spill_dir=str(spill_dir))
+
+        assert writer._spill([('audit_events', {'event_type': 'e'})])
+        assert stat.S_IMODE(spill_dir.stat().st_mode) == 0o700
+        assert stat.S_IMODE((spill_dir / f'audit-{os.getpid()}.jsonl').stat().st_mode) == 0o600
+
+    def test_replay_writes_and_truncates(self, tmp_path):
+        """Testa que a regravação envia tudo em uma transação e esvazia o arquivo"""
+        writer = _writer(tmp_path)
+        writer._spill([('audit_events', {'event_type': f'e{i}', 'created_at': '2026-01-01T00:00:00+00:00'}) for i in range(3)])
+
+        written = []
+        writer._write = written.append
+
+        assert writer.replay_spilled() == 3
+        assert [row['event_type'] for _, row in written[0]] == ['e0', 'e1', 'e2']
+        assert (tmp_path / f'audit-{os.getpid()}.jsonl').read_text() == ''
+        assert writer.replay_spilled() == 0
@@ -0,0 +1,84 @@
+"""
+Testes da ancoragem em lote de documentos
+"""
+
+from types import SimpleNamespace
+from api.utils import document_anchor
+from api.utils.nft import nft_manager
+
+
+class FakeCursor:
+    def __init__(self, log, results):
+        self.log = log
+        self.results = results
+
+    def execute(self, sql, params=None):
+        self.log.append(' '.join(sql.split())[:30])
+        self.current = self.results.pop(0) if 'SELECT' in sql or 'RETURNING' in sql else None
+
+    def fetchall(self):
+        return self.current
+
+    def fetchone(self):
+        return self.current
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, log, results):
+        self.log = log
+        self.cur = FakeCursor(log, results)
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        self.log.append('commit')
+
+    def rollback(self):
+        self.log.append('rollback')
+
+    def close(self):
+        pass
+
+
+def test_root_is_submitted_after_claim_commits(monkeypatch):
+    """Testa que a raiz só é enviada depois do commit que marca os registros como batched"""
+    log = []
+    results = [[], [{'id': 1, 'file_hash': '0x' + 'ab' * 32}, {'id': 2, 'file_hash': '0x' + 'cd' * 32}], {'id': 9}]
+    submitted = []
+
+    def submit(kind, fn, private_key, gas, urgency=None, idempotency_key=None, context=None):
+        log.append('submit')
+        submitted.append(idempotency_key)
+        return {'tx_id': 3, 'transaction_hash': '0x3'}
+
+    monkeypatch.setattr(document_anchor, 'get_db_connection', lambda: FakeConnection(log, results))
+    monkeypatch.setattr(document_anchor, 'execute_values', lambda cur, sql, rows, **kwargs: log.append('UPDATE registrations'))
+    monkeypatch.setattr(document_anchor, 'DEPLOYER_PRIVATE_KEY', '0x' + '11' * 32)
+    monkeypatch.setattr(nft_manager, 'proof_registry_contract', SimpleNamespace(
+        functions=SimpleNamespace(registerProof=lambda root, url: (root, url))
+    ))
+    monkeypatch.setattr(nft_manager.tx_dispatcher, 'submit', submit)
+
+    assert document_anchor.DocumentBatcher().anchor_pending() == 2
+
+    assert submitted == ['anchor_batch:9']
+    claim_commit = log.index('commit', log.index('UPDATE registrations'))
+    assert claim_commit < log.index('submit')
+
+
+def test_failed_root_requeues_documents():
+    """Testa que uma raiz que falhou devolve os documentos do lote à fila"""
+    log = []
+    cur = FakeCursor(log, [])
+    cur.rowcount = 2
+
+    nft_manager.tx_dispatcher._completions['anchor_batch'](cur, {'id': 3, 'context': {'batch_id': 9}}, 'failed', None)
+    assert [sql.strip() for sql in log] == ['UPDATE document_registrations']
+
+    log.clear()
+    document_anchor.complete_anchor_batch(cur, {'id': 3, 'context': {'batch_id': 9}}, 'confirmed', {})
+    assert log == []
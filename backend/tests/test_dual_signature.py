@@ -43,6 +43,59 @@ class TestPGPUtils:
         """Testa conversão de fingerprint curto (deve falhar)"""
         with pytest.raises(ValueError):
             fingerprint_to_bytes20("SHORT")
+    
+    def test_import_public_key_cached(self, tmp_path, monkeypatch):
+        """Testa que uma chave já importada não é importada novamente"""
+        import gnupg
+        from api.utils import pgp
+        
+        signer = gnupg.GPG(gnupghome=str(tmp_path))
+        key = signer.gen_key(signer.gen_key_input(
+            key_type='RSA', key_length=1024, name_email='cache@example.com', no_protection=True
+        ))
+        armored = signer.export_keys(key.fingerprint)
+        
+        first = import_public_key(armored)
+        assert first['success']
+        assert first['fingerprint'] == key.fingerprint
+        
+        def fail_import(*args, **kwargs):
+            raise AssertionError('chave reimportada')
+        monkeypatch.setattr(pgp.gpg, 'import_keys', fail_import)
+        
+        assert import_public_key(armored)['fingerprint'] == key.fingerprint
+        assert import_public_key('', fingerprint=key.fingerprint)['fingerprint'] == key.fingerprint
+    
+    @pytest.mark.parametrize('key_params', [
+        {'key_type': 'RSA', 'key_length': 2048},
+        {'key_type': 'EDDSA', 'key_curve': 'ed25519'}
+    ])
+    def test_backends_agree(self, tmp_path, monkeypatch, key_params):
+        """Testa que os backends gnupg e native aceitam e rejeitam as mesmas assinaturas"""
+        import gnupg
+        from api.utils import pgp
+        
+        signer = gnupg.GPG(gnupghome=str(tmp_path))
+        key = signer.gen_key(signer.gen_key_input(name_email='native@example.com', no_protection=True, **key_params))
+        armored = signer.export_keys(key.fingerprint)
+        signature = str(signer.sign('0xabc', keyid=key.fingerprint, detach=True))
+        
+        for backend in ('gnupg', 'native'):
+            monkeypatch.setattr(pgp, 'PGP_BACKEND', backend)
+            imported = import_public_key(armored)
+            
+            assert imported['success']
+            assert imported['fingerprint'] == key.fingerprint
+            assert pgp.verify_signature('0xabc', signature, key.fingerprint)['valid']
+            assert not pgp.verify_signature('0xabd', signature, key.fingerprint)['valid']
+            assert not pgp.verify_signature('0xabc', signature, MOCK_FINGERPRINT)['valid']
+    
+    def test_native_rejects_invalid_key(self, monkeypatch):
+        """Testa que o backend native rejeita chave malformada sem exceção"""
+        from api.utils import pgp
+        
+        monkeypatch.setattr(pgp, 'PGP_BACKEND', 'native')
+        assert not import_public_key(MOCK_PUBLIC_KEY)['success']
 
 class TestPGPRoutes:
     """Testes das rotas PGP"""
@@ -189,6 +242,100 @@ class TestDualSignatureRoutes:
         
         assert response.status_code == 400
 
+class FakeCursor:
+    """Cursor que devolve linhas como dict (RealDictCursor), uma resposta por consulta"""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def execute(self, sql, params=None):
+        self.current = self.rows.pop(0)
+
+    def fetchone(self):
+        return self.current
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.cur = FakeCursor(rows)
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class TestDualSignatureDbRows:
+    """Testes das rotas de assinatura dupla com linhas do banco em formato dict"""
+
+    @pytest.fixture
+    def client(self):
+        """Fixture do cliente Flask"""
+        from app import app
+        app.config['TESTING'] = True
+        with app.test_client() as client:
+            yield client
+
+    @pytest.fixture
+    def fake_pgp(self, monkeypatch):
+        from api.routes import pgp_routes
+
+        monkeypatch.setattr(pgp_routes, 'import_public_key', lambda key, fingerprint=None: {'success': True})
+        monkeypatch.setattr(pgp_routes, 'verify_signature', lambda doc_hash, signature, fingerprint: {'valid': True})
+        return pgp_routes
+
+    def _use_rows(self, monkeypatch, rows):
+        from api.utils import db
+        monkeypatch.setattr(db, 'get_db_connection', lambda: FakeConnection(rows))
+
+    def _auth(self, pgp_routes):
+        import jwt
+        token = jwt.encode({'user_id': 1, 'email': 'dual@example.com'}, pgp_routes.JWT_SECRET, algorithm='HS256')
+        return {'Authorization': f'Bearer {token}'}
+
+    def test_sign_dual_reads_user_row(self, client, fake_pgp, monkeypatch):
+        """Testa que /api/dual/sign passa da consulta do usuário e grava o log"""
+        self._use_rows(monkeypatch, [
+            {'pgp_fingerprint': MOCK_FINGERPRINT, 'pgp_public_key': MOCK_PUBLIC_KEY},
+            {'id': 42}
+        ])
+
+        response = client.post('/api/dual/sign', json={
+            'doc_hash': '0x1234',
+            'pgp_signature': MOCK_SIGNATURE,
+            'pgp_fingerprint': MOCK_FINGERPRINT.lower(),
+            'nft_id': 1
+        }, headers=self._auth(fake_pgp))
+
+        assert response.status_code == 200
+        assert json.loads(response.data)['log_id'] == 42
+
+    def test_verify_dual_reads_log_row(self, client, fake_pgp, monkeypatch):
+        """Testa que /api/dual/verify lê o usuário e o log por nome de coluna"""
+        from datetime import datetime
+
+        self._use_rows(monkeypatch, [
+            {'id': 1, 'pgp_public_key': MOCK_PUBLIC_KEY},
+            {'id': 42, 'nft_id': 7, 'blockchain_tx': '0xabc', 'created_at': datetime(2026, 1, 1)}
+        ])
+
+        response = client.post('/api/dual/verify', json={
+            'doc_hash': '0x1234',
+            'pgp_signature': MOCK_SIGNATURE,
+            'pgp_fingerprint': MOCK_FINGERPRINT
+        }, headers=self._auth(fake_pgp))
+
+        data = json.loads(response.data)
+        assert response.status_code == 200
+        assert data['valid'] and data['nft_id'] == 7 and data['tx_hash'] == '0xabc'
+
 class TestExplorerDualProofs:
     """Testes do endpoint de dual proofs no explorer"""
     
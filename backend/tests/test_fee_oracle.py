@@ -0,0 +1,80 @@
+"""
+Testes do oráculo de taxas EIP-1559
+"""
+
+import pytest
+from web3 import Web3
+from api.utils.fee_oracle import FeeOracle, parse_tiers
+
+GWEI = 10 ** 9
+
+
+class FakeEth:
+    def __init__(self, history=None, gas_price=50 * GWEI, chain_id=80001):
+        self.history = history
+        self.chain_id = chain_id
+        self._gas_price = gas_price
+        self.calls = 0
+
+    def fee_history(self, block_count, newest_block, percentiles):
+        self.calls += 1
+        if self.history is None:
+            raise ValueError('the method eth_feeHistory does not exist')
+        return self.history
+
+    @property
+    def gas_price(self):
+        self.calls += 1
+        return self._gas_price
+
+
+class FakeWeb3:
+    def __init__(self, eth):
+        self.eth = eth
+
+
+def _oracle(eth):
+    oracle = FeeOracle(FakeWeb3(eth), tiers=parse_tiers('slow:10,fast:90'))
+    oracle.start_worker = lambda: None
+    return oracle
+
+
+def test_tiers_from_fee_history():
+    """Testa base fee do próximo bloco, mediana por percentil e blocos vazios ignorados"""
+    eth = FakeEth({
+        'oldestBlock': 100,
+        'baseFeePerGas': [80 * GWEI, 90 * GWEI, 100 * GWEI],
+        'reward': [[31 * GWEI, 40 * GWEI], [0, 0], [35 * GWEI, 60 * GWEI]]
+    })
+    oracle = _oracle(eth)
+
+    slow = oracle.get_fee_params('slow')
+    fast = oracle.get_fee_params('fast')
+
+    assert slow == {'maxPriorityFeePerGas': 33 * GWEI, 'maxFeePerGas': 233 * GWEI}
+    assert fast == {'maxPriorityFeePerGas': 50 * GWEI, 'maxFeePerGas': 250 * GWEI}
+    assert eth.calls == 1
+
+
+def test_priority_floor_and_unknown_tier():
+    """Testa o piso de priority fee e a recusa de nível desconhecido"""
+    eth = FakeEth({'oldestBlock': 1, 'baseFeePerGas': [GWEI, GWEI], 'reward': [[GWEI, GWEI]]})
+    oracle = _oracle(eth)
+
+    assert oracle.get_fee_params('slow')['maxPriorityFeePerGas'] == Web3.to_wei(30, 'gwei')
+    with pytest.raises(ValueError):
+        oracle.get_fee_params('urgent')
+
+
+def test_priority_floor_only_on_polygon():
+    """Testa que fora da Polygon não há piso de priority fee"""
+    eth = FakeEth({'oldestBlock': 1, 'baseFeePerGas': [GWEI, GWEI], 'reward': [[GWEI, GWEI]]}, chain_id=1)
+
+    assert _oracle(eth).get_fee_params('slow')['maxPriorityFeePerGas'] == GWEI
+
+
+def test_legacy_network_uses_gas_price():
+    """Testa que sem eth_feeHistory o oráculo devolve gasPrice"""
+    oracle = _oracle(FakeEth(history=None))
+
+    assert oracle.get_fee_params('fast') == {'gasPrice': 50 * GWEI}
@@ -0,0 +1,64 @@
+"""
+Tests for the process-local JWT revocation cache
+"""
+
+import time
+from api.utils.jwt_revocation import BloomFilter, RevocationCache
+
+
+def _loaded_cache(revoked):
+    cache = RevocationCache()
+    cache._bloom = BloomFilter(1000)
+    for jti in revoked:
+        cache._bloom.add(jti)
+    cache._refreshed_at = time.time()
+    cache.start_worker = lambda: None
+    return cache
+
+
+class TestRevocationCache:
+    """Bloom filter and LRU lookups"""
+
+    def test_bloom_filter(self):
+        """Added values are always found; unknown values rarely are"""
+        bloom = BloomFilter(1000)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+
+        assert all(f'jti-{i}' in bloom for i in range(1000))
+        assert sum(f'other-{i}' in bloom for i in range(10000)) < 50
+
+    def test_not_revoked_skips_db(self):
+        """A token missing from the bloom filter is answered without the DB"""
+        cache = _loaded_cache(['revoked'])
+        queries = []
+
+        assert not cache.is_revoked('valid', lambda jti: queries.append(jti) or False)
+        assert queries == []
+
+    def test_revoked_is_cached(self):
+        """A bloom hit is confirmed once in the DB and then served from the LRU"""
+        cache = _loaded_cache(['revoked'])
+        queries = []
+
+        def query_db(jti):
+            queries.append(jti)
+            return True
+
+        assert cache.is_revoked('revoked', query_db)
+        assert cache.is_revoked('revoked', query_db)
+        assert queries == ['revoked']
+
+    def test_stale_cache_uses_db(self):
+        """A cache that stopped refreshing falls back to the DB"""
+        cache = _loaded_cache([])
+        cache._refreshed_at = 0
+
+        assert cache.is_revoked('revoked', lambda jti: True)
+
+    def test_local_revocation(self):
+        """Revocations made by this process are visible immediately"""
+        cache = _loaded_cache([])
+        cache.add('logout')
+
+        assert cache.is_revoked('logout', lambda jti: False)
@@ -0,0 +1,37 @@
+"""
+Testes da árvore de Merkle usada na ancoragem em lote de documentos
+"""
+
+import pytest
+import hashlib
+from api.utils.merkle import build_tree, get_root, get_proof, verify_proof
+
+def _doc_hash(i):
+    return '0x' + hashlib.sha256(f'documento_{i}'.encode()).hexdigest()
+
+class TestMerkle:
+    """Testes de construção e verificação de provas"""
+
+    @pytest.mark.parametrize('size', [1, 2, 3, 7, 8, 33])
+    def test_all_leaves_verify(self, size):
+        """Testa que todas as folhas verificam contra a raiz, inclusive com níveis ímpares"""
+        doc_hashes = [_doc_hash(i) for i in range(size)]
+        layers = build_tree(doc_hashes)
+        root = get_root(layers)
+
+        for index, doc_hash in enumerate(doc_hashes):
+            proof = get_proof(layers, index)
+            assert len(proof) <= (size - 1).bit_length()
+            assert verify_proof(doc_hash, proof, root)
+
+    def test_foreign_document_fails(self):
+        """Testa que um documento fora do lote não verifica"""
+        doc_hashes = [_doc_hash(i) for i in range(5)]
+        layers = build_tree(doc_hashes)
+
+        assert not verify_proof(_doc_hash(99), get_proof(layers, 0), get_root(layers))
+
+    def test_empty_batch(self):
+        """Testa que um lote vazio é rejeitado"""
+        with pytest.raises(ValueError):
+            build_tree([])
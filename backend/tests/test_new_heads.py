@@ -0,0 +1,23 @@
+"""
+Testes da assinatura de newHeads do listener
+"""
+
+from api.utils.new_heads import NewHeadsSubscriber, head_number
+
+# Como listen_to_websocket() entrega uma notificação do eth_subscription
+MESSAGE = {'subscription': '0x9ce59a13059e417087c02d3236a0b1cc', 'result': {'number': '0x1b4', 'hash': '0x' + 'ab' * 32}}
+
+
+def test_head_number_from_formatted_message():
+    """Testa que o número do bloco é lido do cabeçalho em message['result']"""
+    assert head_number(MESSAGE) == 436
+    assert head_number({'subscription': '0x1', 'result': {}}) is None
+
+
+def test_message_sets_latest_block():
+    """Testa que a notificação acorda o loop com o head conhecido (sem eth_blockNumber)"""
+    subscriber = NewHeadsSubscriber('ws://localhost:8546')
+    subscriber.connected = True
+
+    subscriber.on_message(MESSAGE)
+    assert subscriber.wait_for_head(0) == 436
@@ -0,0 +1,98 @@
+"""
+Testes do cache de estado on-chain dos NFTs
+"""
+
+import time
+from api.utils.nft_state_cache import NFTStateCache
+
+WALLET = '0xAbC0000000000000000000000000000000000001'
+
+
+def _loaded_cache():
+    cache = NFTStateCache()
+    cache._cursor = 0
+    cache._refreshed_at = time.time()
+    cache.start_worker = lambda: None
+    return cache
+
+
+def _fetcher(statuses, calls):
+    def fetch(wallets):
+        calls.append(list(wallets))
+        return {wallet: dict(statuses[wallet]) for wallet in wallets}
+    return fetch
+
+
+def test_repeat_reads_skip_rpc():
+    """Testa que a segunda leitura da mesma carteira não chama o RPC"""
+    cache = _loaded_cache()
+    calls = []
+    fetch = _fetcher({WALLET: {'nft_id': 5, 'is_active': True}}, calls)
+
+    assert cache.get_status_batch([WALLET], fetch)[WALLET] == {'nft_id': 5, 'is_active': True}
+    assert cache.get_status_batch([WALLET], fetch)[WALLET] == {'nft_id': 5, 'is_active': True}
+    assert calls == [[WALLET]]
+
+
+def test_cancel_event_invalidates_by_token():
+    """Testa que um cancelamento (só tokenId) remove a carteira dona do token"""
+    cache = _loaded_cache()
+    calls = []
+    statuses = {WALLET: {'nft_id': 5, 'is_active': True}}
+    fetch = _fetcher(statuses, calls)
+    cache.get_status_batch([WALLET], fetch)
+
+    cache._invalidate(None, '5', 120)
+    statuses[WALLET] = {'nft_id': None, 'is_active': False}
+
+    assert cache.get_status_batch([WALLET], fetch)[WALLET]['is_active'] is False
+    assert len(calls) == 2
+    assert cache._entries[WALLET.lower()]['block'] == 120
+
+
+def test_invalidation_during_fetch_is_not_cached():
+    """Testa que uma leitura concorrente com uma invalidação não entra no cache"""
+    cache = _loaded_cache()
+
+    def fetch(wallets):
+        cache._invalidate(WALLET, '5', 121)
+        return {WALLET: {'nft_id': 4, 'is_active': True}}
+
+    cache.get_status_batch([WALLET], fetch)
+    assert WALLET.lower() not in cache._entries
+
+
+def test_stale_cache_bypasses():
+    """Testa que sem leitura recente de invalidações o cache não é usado"""
+    cache = _loaded_cache()
+    cache._refreshed_at = 0
+    calls = []
+    fetch = _fetcher({WALLET: {'nft_id': 5, 'is_active': True}}, calls)
+
+    cache.get_status_batch([WALLET], fetch)
+    cache.get_status_batch([WALLET], fetch)
+    assert len(calls) == 2
+
+
+def test_failed_read_is_not_cached():
+    """Testa que uma carteira omitida pelo fetch (leitura falhou) não vira 'sem NFT' no cache"""
+    cache = _loaded_cache()
+    calls = []
+
+    def fetch(wallets):
+        calls.append(list(wallets))
+        return {} if len(calls) == 1 else {WALLET: {'nft_id': 5, 'is_active': True}}
+
+    assert WALLET not in cache.get_status_batch([WALLET], fetch)
+    assert WALLET.lower() not in cache._entries
+    assert cache.get_status_batch([WALLET], fetch)[WALLET]['nft_id'] == 5
+
+
+def test_status_batch_omits_failed_reads(monkeypatch):
+    """Testa que get_nft_status_batch omite carteiras com leitura falha em vez de reportar 'sem NFT'"""
+    from api.utils.nft import nft_manager
+
+    other = '0xAbC0000000000000000000000000000000000002'
+    monkeypatch.setattr(nft_manager, 'batch_read', lambda calls: [None, None, 0, False])
+
+    assert nft_manager.get_nft_status_batch([WALLET, other]) == {other: {'nft_id': None, 'is_active': False}}
@@ -0,0 +1,133 @@
+"""
+Testes da outbox de transações
+"""
+
+import pytest
+import requests
+from web3.exceptions import TransactionNotFound
+from api.utils.tx_dispatcher import TxDispatcher, TX_MAX_BROADCAST_FAILURES
+
+
+class FakeEth:
+    known = False
+
+    def send_raw_transaction(self, raw_tx):
+        # Como o web3 levanta uma resposta de erro JSON-RPC
+        raise ValueError({'code': -32000, 'message': 'insufficient funds for gas * price + value'})
+
+    def get_transaction(self, tx_hash):
+        if not self.known:
+            raise TransactionNotFound(tx_hash)
+        return {'hash': tx_hash}
+
+
+class TimeoutEth(FakeEth):
+    def send_raw_transaction(self, raw_tx):
+        raise requests.exceptions.ReadTimeout('timeout')
+
+
+class FakeWeb3:
+    def __init__(self):
+        self.eth = FakeEth()
+
+
+class FakeCursor:
+    def __init__(self, nonce_released=True):
+        self.statements = []
+        self.rowcount = 0
+        self.nonce_released = nonce_released
+
+    def execute(self, sql, params=None):
+        self.statements.append((' '.join(sql.split()), params))
+        self.rowcount = 1 if 'UPDATE tx_nonces' in sql and self.nonce_released else 0
+
+
+def _row(failures):
+    return {
+        'id': 7, 'kind': 'mint_identity', 'status': 'pending', 'raw_tx': '0x00', 'nonce': 12,
+        'from_address': '0x' + '11' * 20, 'chain_id': 80001, 'broadcast_failures': failures,
+        'tx_hashes': ['0x' + 'ab' * 32]
+    }
+
+
+def test_rejected_broadcast_is_counted():
+    """Testa que um envio recusado incrementa o contador sem falhar a transação"""
+    cur = FakeCursor()
+    TxDispatcher(FakeWeb3())._broadcast(cur, _row(0), '0x00')
+
+    sql, params = cur.statements[-1]
+    assert 'broadcast_failures = %s' in sql
+    assert params[1] == 1
+
+
+def test_permanently_rejected_tx_fails_and_releases_nonce():
+    """Testa que após TX_MAX_BROADCAST_FAILURES recusas a transação falha e o nonce volta"""
+    cur = FakeCursor()
+    TxDispatcher(FakeWeb3())._broadcast(cur, _row(TX_MAX_BROADCAST_FAILURES - 1), '0x00')
+
+    assert "SET status = 'failed'" in cur.statements[0][0]
+    assert cur.statements[1][1] == (12, '0x' + '11' * 20, 13)
+
+
+def test_network_error_is_not_counted():
+    """Testa que um timeout no envio não conta como recusa (a tx pode ter chegado ao mempool)"""
+    w3 = FakeWeb3()
+    w3.eth = TimeoutEth()
+
+    cur = FakeCursor()
+    TxDispatcher(w3)._broadcast(cur, _row(TX_MAX_BROADCAST_FAILURES - 1), '0x00')
+
+    sql, params = cur.statements[-1]
+    assert 'broadcast_failures = %s' in sql
+    assert params[1] == TX_MAX_BROADCAST_FAILURES - 1
+
+
+def test_tx_known_to_node_is_not_failed():
+    """Testa que uma tx recusada mas presente no nó (eth_getTransactionByHash) segue como enviada"""
+    w3 = FakeWeb3()
+    w3.eth.known = True
+
+    cur = FakeCursor()
+    TxDispatcher(w3)._broadcast(cur, _row(TX_MAX_BROADCAST_FAILURES - 1), '0x00')
+
+    assert [sql for sql, _ in cur.statements if "status = 'submitted'" in sql]
+    assert not [sql for sql, _ in cur.statements if "status = 'failed'" in sql]
+
+
+def test_nonce_gap_is_filled(monkeypatch):
+    """Testa que o nonce é preenchido quando já há nonces posteriores reservados"""
+    filled = []
+    dispatcher = TxDispatcher(FakeWeb3())
+    monkeypatch.setattr(dispatcher, '_fill_nonce', filled.append)
+
+    dispatcher._broadcast(FakeCursor(nonce_released=False), _row(TX_MAX_BROADCAST_FAILURES - 1), '0x00')
+    assert [row['nonce'] for row in filled] == [12]
+
+
+def test_completion_runs_before_final_status():
+    """Testa que o handler de conclusão roda quando a transação falha em definitivo"""
+    completed = []
+    dispatcher = TxDispatcher(FakeWeb3())
+    dispatcher.register_completion('mint_identity', lambda cur, row, status, receipt: completed.append(status))
+
+    cur = FakeCursor()
+    dispatcher._broadcast(cur, {**_row(TX_MAX_BROADCAST_FAILURES - 1), 'context': {'user_id': 3}}, '0x00')
+
+    assert completed == ['failed']
+    assert cur.statements[0][0] == 'SAVEPOINT tx_completion'
+    assert "SET status = 'failed'" in cur.statements[2][0]
+
+
+def test_failed_completion_keeps_row_open():
+    """Testa que um handler com erro desfaz o savepoint e não grava o status final"""
+    def handler(cur, row, status, receipt):
+        raise RuntimeError('banco indisponível')
+
+    dispatcher = TxDispatcher(FakeWeb3())
+    dispatcher.register_completion('mint_identity', handler)
+
+    cur = FakeCursor()
+    with pytest.raises(RuntimeError):
+        dispatcher._broadcast(cur, {**_row(TX_MAX_BROADCAST_FAILURES - 1), 'context': {'user_id': 3}}, '0x00')
+
+    assert [sql for sql, _ in cur.statements] == ['SAVEPOINT tx_completion', 'ROLLBACK TO SAVEPOINT tx_completion']
@@ -0,0 +1,179 @@
+"""
+Testes da carteira proprietária e das sessões de assinatura
+"""
+
+import time
+import base64
+from contextlib import contextmanager
+import secrets
+import pytest
+from cryptography.fernet import Fernet
+from api.utils.wallet import wallet_manager, WALLET_LEGACY_KDF_ITERATIONS
+from api.utils.signing_session import SigningSessionStore
+
+PASSWORD = 'Test@12345678'
+
+class TestWalletKdf:
+    """Testes do custo do KDF gravado junto da chave"""
+
+    def test_new_wallet_roundtrip(self):
+        """Testa que carteiras novas usam o formato com custo e descriptografam"""
+        wallet = wallet_manager.generate_wallet(PASSWORD)
+
+        assert wallet['encrypted_private_key'].startswith('pbkdf2_sha256$')
+        assert not wallet_manager.needs_rewrap(wallet['encrypted_private_key'])
+
+        private_key = wallet_manager.decrypt_private_key(wallet['encrypted_private_key'], PASSWORD, wallet['salt'])
+        assert wallet_manager.sign_message('ok', None, None, None, private_key=private_key)['address'] == wallet['address']
+
+        with pytest.raises(ValueError):
+            wallet_manager.decrypt_private_key(wallet['encrypted_private_key'], 'errada', wallet['salt'])
+
+    def test_legacy_key_and_rewrap(self):
+        """Testa que chaves sem prefixo (10000 iterações) continuam válidas e são recriptografadas"""
+        salt = secrets.token_bytes(16)
+        private_key = '0x' + secrets.token_hex(32)
+        legacy_key = wallet_manager._derive_key_from_password(PASSWORD, salt, WALLET_LEGACY_KDF_ITERATIONS)
+        encrypted = Fernet(legacy_key).encrypt(private_key.encode()).decode()
+        salt_b64 = base64.b64encode(salt).decode()
+
+        assert wallet_manager.needs_rewrap(encrypted)
+        assert wallet_manager.decrypt_private_key(encrypted, PASSWORD, salt_b64) == private_key
+
+        rewrapped = wallet_manager.rewrap_private_key(private_key, PASSWORD, salt_b64)
+        assert not wallet_manager.needs_rewrap(rewrapped)
+        assert wallet_manager.decrypt_private_key(rewrapped, PASSWORD, salt_b64) == private_key
+
+    def test_busy_pool_is_not_a_wrong_password(self, monkeypatch):
+        """Testa que a fila cheia do pool chega à rota como CryptoPoolBusy (503), não como senha incorreta"""
+        from api.utils import crypto_pool as module
+
+        def busy(*args):
+            raise module.CryptoPoolBusy('ocupado')
+
+        wallet = wallet_manager.generate_wallet(PASSWORD)
+        monkeypatch.setattr(module.crypto_pool, 'derive_key', busy)
+
+        with pytest.raises(module.CryptoPoolBusy):
+            wallet_manager.decrypt_private_key(wallet['encrypted_private_key'], PASSWORD, wallet['salt'])
+
+class FakeSessionTable:
+    """Tabela signing_sessions em memória (só as consultas de SigningSessionStore)"""
+
+    def __init__(self):
+        self.rows = {}
+
+    @contextmanager
+    def connect(self):
+        yield self
+
+    def cursor(self):
+        return self
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def execute(self, sql, params=None):
+        self.rowcount = 0
+        if sql.strip().startswith('INSERT'):
+            token_id, user_id, wrapped_key, ttl = params
+            self.rows[token_id] = {'user_id': user_id, 'wrapped_key': wrapped_key, 'expires_at': time.time() + ttl}
+        elif sql.strip().startswith('SELECT'):
+            row = self.rows.get(params[0])
+            valid = row and row['user_id'] == params[1] and row['expires_at'] > time.time()
+            self.result = {'wrapped_key': row['wrapped_key']} if valid else None
+        elif sql.strip().startswith('DELETE'):
+            if 'expires_at' in sql:
+                keys = [key for key, row in self.rows.items() if row['expires_at'] <= time.time()]
+            elif 'token_id' in sql:
+                keys = [key for key, row in self.rows.items() if key == params[0] and row['user_id'] == params[1]]
+            else:
+                keys = [key for key, row in self.rows.items() if row['user_id'] == params[0]]
+            for key in keys:
+                del self.rows[key]
+            self.rowcount = len(keys)
+
+    def fetchone(self):
+        return self.result
+
+
+class TestSigningSession:
+    """Testes das sessões de assinatura compartilhadas pelo banco"""
+
+    @pytest.fixture
+    def store(self, monkeypatch):
+        from api.utils import signing_session
+
+        table = FakeSessionTable()
+        monkeypatch.setattr(signing_session, 'db_connection', table.connect)
+        store = SigningSessionStore()
+        store._tables_ready = True
+        store._start_sweeper = lambda: None
+        store.table = table
+        return store
+
+    def test_session_lifecycle(self, store):
+        """Testa abertura, uso restrito ao usuário e revogação"""
+        session = store.open(1, '0xabc', ttl=60)
+        token = session['session_token']
+
+        assert store.get(1, token) == '0xabc'
+        assert store.get(2, token) is None
+        assert SigningSessionStore().get(1, token) == '0xabc'
+
+        assert store.revoke(1, token) == 1
+        assert store.get(1, token) is None
+
+    def test_only_wrapped_key_is_stored(self, store):
+        """Testa que o banco não guarda o token nem a chave em claro"""
+        token = store.open(1, '0xabc', ttl=60)['session_token']
+        (token_id, row), = store.table.rows.items()
+
+        assert token not in token_id and token not in row['wrapped_key']
+        assert '0xabc' not in row['wrapped_key']
+        assert store.get(1, token + 'x') is None
+
+    def test_session_expires(self, store):
+        """Testa que sessões expiradas deixam de valer e são removidas"""
+        token = store.open(1, '0xabc', ttl=1)['session_token']
+
+        time.sleep(1.1)
+        assert store.get(1, token) is None
+        assert store.purge_expired() == 1
+
+    def test_unlock_requires_password_or_session(self, store):
+        """Testa que sessão inválida sem senha é rejeitada"""
+        with pytest.raises(ValueError):
+            wallet_manager.unlock_private_key(1, 'x', 'x', None, 'token-inexistente')
+
+class TestCryptoPool:
+    """Testes do pool de criptografia"""
+
+    def test_pool_roundtrip_and_stats(self):
+        """Testa bcrypt no pool de processos e as métricas de fila"""
+        from api.utils.crypto_pool import CryptoExecutor
+
+        pool = CryptoExecutor(workers=1, max_queue=2)
+        hashed = pool.hashpw(PASSWORD)
+
+        assert pool.checkpw(PASSWORD, hashed)
+        assert not pool.checkpw('errada', hashed)
+
+        stats = pool.get_stats()
+        assert stats['completed'] == 3
+        assert stats['in_flight'] == 0
+
+    def test_pool_rejects_when_full(self, monkeypatch):
+        """Testa que a fila cheia recusa novas tarefas"""
+        from api.utils import crypto_pool as module
+
+        monkeypatch.setattr(module, 'CRYPTO_POOL_QUEUE_TIMEOUT', 0.01)
+        pool = module.CryptoExecutor(workers=0, max_queue=0)
+        pool._slots.acquire()
+
+        with pytest.raises(module.CryptoPoolBusy):
+            pool.submit(module.bcrypt_hashpw, PASSWORD)
+        assert pool.get_stats()['rejected'] == 1
@@ -0,0 +1,109 @@
+"""
+Testes do registro compartilhado de conexões Web3
+"""
+
+import json
+import threading
+import http.server
+import pytest
+from api.utils.web3_provider import Web3Registry
+
+GET_ACTIVE_SELECTOR = '0x20ba4541'
+ABI = [{"inputs": [], "name": "totalSupply", "outputs": [{"name": "", "type": "uint256"}], "stateMutability": "view", "type": "function"}]
+
+
+def _eth_call(item):
+    # getActiveNFT devolve 7 para carteiras terminadas em 1; isActiveNFT devolve o mesmo critério
+    data = item['params'][0]['data']
+    active = data.endswith('1')
+    if data.startswith(GET_ACTIVE_SELECTOR):
+        return '0x' + (7 if active else 0).to_bytes(32, 'big').hex()
+    return '0x' + int(active).to_bytes(32, 'big').hex()
+
+
+@pytest.fixture
+def rpc_server():
+    """Servidor JSON-RPC local que registra as conexões TCP recebidas"""
+    requests_seen = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            requests_seen.append((self.client_address, [item['method'] for item in body] if isinstance(body, list) else body['method']))
+            if isinstance(body, list):
+                out = json.dumps([{'jsonrpc': '2.0', 'id': item['id'], 'result': _eth_call(item)} for item in body]).encode()
+            else:
+                out = json.dumps({'jsonrpc': '2.0', 'id': body['id'], 'result': '0x89'}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}', requests_seen
+    server.shutdown()
+
+
+class TestWeb3Registry:
+    """Testes de reuso de conexão e dos caches"""
+
+    def test_keep_alive_and_chain_id_cache(self, rpc_server):
+        """Testa que as chamadas reutilizam a conexão e que o chain_id é consultado uma vez"""
+        url, requests_seen = rpc_server
+        registry = Web3Registry()
+        w3 = registry.get_web3(url)
+
+        assert registry.get_web3(url) is w3
+        for _ in range(5):
+            assert registry.get_chain_id(w3) == 137
+            w3.eth.block_number
+
+        assert [method for _, method in requests_seen].count('eth_chainId') == 1
+        assert len({address for address, _ in requests_seen}) == 1
+
+    def test_contract_and_abi_cache(self, tmp_path, monkeypatch):
+        """Testa que ABI e contrato são criados uma vez por endereço"""
+        from api.utils import web3_provider
+
+        (tmp_path / 'Token.abi.json').write_text(json.dumps(ABI))
+        monkeypatch.setattr(web3_provider, 'CONTRACTS_DIR', str(tmp_path))
+        registry = Web3Registry()
+        w3 = registry.get_web3('http://127.0.0.1:1')
+
+        abi = registry.load_abi('Token')
+        assert abi == ABI and registry.load_abi('Token') is abi
+        assert registry.load_abi('Missing', ABI) is ABI
+
+        address = '0x' + '11' * 20
+        contract = registry.get_contract(w3, address, abi)
+        assert registry.get_contract(w3, address.upper().replace('0X', '0x'), abi) is contract
+
+
+class TestNFTBatchRead:
+    """Testes das leituras em lote do NFTManager"""
+
+    def test_status_batch_single_round_trip(self, rpc_server):
+        """Testa que getActiveNFT + isActiveNFT de várias carteiras vão em um único POST"""
+        from api.utils.nft import NFTManager, IDENTITY_NFT_ABI
+
+        url, requests_seen = rpc_server
+        registry = Web3Registry()
+        manager = NFTManager.__new__(NFTManager)
+        manager.w3 = registry.get_web3(url)
+        manager.identity_nft_contract = registry.get_contract(manager.w3, '0x' + '11' * 20, IDENTITY_NFT_ABI)
+        manager.proof_registry_contract = None
+
+        wallets = ['0x' + '22' * 19 + '21', '0x' + '22' * 20]
+        statuses = manager.get_nft_status_batch(wallets)
+
+        assert statuses[wallets[0]] == {'nft_id': 7, 'is_active': True}
+        assert statuses[wallets[1]] == {'nft_id': None, 'is_active': False}
+        assert len(requests_seen) == 1 and len(requests_seen[0][1]) == 4
+        assert manager.verify_proofs(['abc']) == {'abc': False}
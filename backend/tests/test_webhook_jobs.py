@@ -0,0 +1,89 @@
+"""
+Testes do processamento de webhooks em background
+"""
+
+import pytest
+from api.utils import nft, audit
+from api.utils.webhook_jobs import WebhookJobRunner, process_sumsub_event, sumsub_dedup_key, WEBHOOK_MINT_POLL_INTERVAL
+
+PAYLOAD = {
+    'type': 'applicantReviewed',
+    'applicantId': 'abc',
+    'externalUserId': '7',
+    'reviewStatus': 'completed',
+    'reviewResult': {'reviewAnswer': 'GREEN'},
+    'createdAtMs': '2026-01-01 00:00:00.000'
+}
+
+
+def test_dedup_key_stable_across_retries():
+    """Testa que reenvios do mesmo evento geram a mesma chave"""
+    assert sumsub_dedup_key(dict(PAYLOAD), b'a') == sumsub_dedup_key(dict(PAYLOAD), b'b')
+    assert sumsub_dedup_key({}, b'a') != sumsub_dedup_key({}, b'b')
+
+
+def test_mint_submitted_once_and_completed_later(monkeypatch):
+    """Testa que o mint é enviado uma vez e concluído em uma reexecução posterior"""
+    calls = {'submit': 0, 'complete': 0}
+    confirmed = {'value': False}
+
+    def submit(user_id, kyc_data, idempotency_key=None):
+        calls['submit'] += 1
+        return {'success': True, 'pending': True, 'tx_id': 1, 'tx_hash': '0x1', 'previous_nft_id': 0, 'wallet_address': '0xw'}
+
+    def complete(user_id, tx_id, previous_nft_id, wallet_address):
+        calls['complete'] += 1
+        if not confirmed['value']:
+            return {'success': False, 'pending': True, 'tx_id': tx_id}
+        return {'success': True, 'nft_id': 1, 'tx_hash': '0x1', 'wallet_address': wallet_address}
+
+    monkeypatch.setattr(nft, 'check_active_nft', lambda user_id: None)
+    monkeypatch.setattr(nft, 'submit_mint_nft', submit)
+    monkeypatch.setattr(nft, 'complete_mint_nft', complete)
+    monkeypatch.setattr(audit, 'log_nft_event', lambda **kwargs: True)
+
+    state = {'kyc_status': 'approved'}
+    saves = []
+    save_state = lambda cur=None: saves.append(dict(state))
+
+    assert process_sumsub_event(1, PAYLOAD, state, save_state) == WEBHOOK_MINT_POLL_INTERVAL
+    confirmed['value'] = True
+    assert process_sumsub_event(1, PAYLOAD, state, save_state) is None
+
+    assert calls == {'submit': 1, 'complete': 2}
+    assert state['mint']['nft_id'] == 1
+    assert 'pending' in saves[0]['mint']
+
+
+def test_mint_wait_has_deadline(monkeypatch):
+    """Testa que um mint pendente além de WEBHOOK_MINT_MAX_WAIT passa a contar como falha"""
+    from api.utils import webhook_jobs as module
+
+    monkeypatch.setattr(nft, 'complete_mint_nft', lambda *args: {'success': False, 'pending': True, 'tx_id': 1})
+
+    mint = {'success': True, 'pending': True, 'tx_id': 1, 'previous_nft_id': 0, 'wallet_address': '0xw'}
+    state = {'kyc_status': 'approved', 'mint': mint, 'mint_submitted_at': module.time.time()}
+    assert process_sumsub_event(1, PAYLOAD, state, lambda cur=None: None) == WEBHOOK_MINT_POLL_INTERVAL
+
+    state['mint_submitted_at'] -= module.WEBHOOK_MINT_MAX_WAIT
+    with pytest.raises(RuntimeError):
+        process_sumsub_event(1, PAYLOAD, state, lambda cur=None: None)
+
+
+def test_failed_job_backs_off(monkeypatch):
+    """Testa que falhas reagendam o evento com backoff e depois o marcam como failed"""
+    from api.utils import webhook_jobs as module
+
+    runner = WebhookJobRunner()
+    finished = []
+    monkeypatch.setattr(runner, '_finish', lambda *args, **kwargs: finished.append(args))
+
+    def failing(event_id, payload, state, save_state):
+        raise RuntimeError('rpc fora do ar')
+
+    runner.register_handler('sumsub', failing)
+    runner._process({'id': 1, 'provider': 'sumsub', 'payload': PAYLOAD, 'state': {}, 'attempts': 0})
+    runner._process({'id': 1, 'provider': 'sumsub', 'payload': PAYLOAD, 'state': {}, 'attempts': module.WEBHOOK_JOB_MAX_ATTEMPTS - 1})
+
+    assert finished[0][:4] == (1, 'pending', 1, module.WEBHOOK_JOB_RETRY_BASE)
+    assert finished[1][:3] == (1, 'failed', module.WEBHOOK_JOB_MAX_ATTEMPTS)
@@ -4,6 +4,7 @@ Deploy no Polygon Mumbai (Testnet)
 """
 
 import os
+import sys
 import json
 from web3 import Web3
 from solcx import compile_standard, install_solc
@@ -22,8 +23,11 @@ if not PRIVATE_KEY:
     logger.info("Configure com: export DEPLOYER_PRIVATE_KEY=0x...")
     exit(1)
 
-# Conectar ao Polygon Mumbai
-w3 = Web3(Web3.HTTPProvider(POLYGON_MUMBAI_RPC))
+# Conectar ao Polygon Mumbai (mesmo registro de conexões do backend: keep-alive e timeouts)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from api.utils.web3_provider import get_web3, get_contract
+
+w3 = get_web3(POLYGON_MUMBAI_RPC)
 
 if not w3.is_connected():
     logger.error("❌ Não foi possível conectar ao Polygon Mumbai")
@@ -133,7 +137,7 @@ def grant_role(contract_address, abi, role_name, role_hash, grantee_address):
     """Concede uma role a um endereço"""
     logger.info(f"🔐 Concedendo {role_name} para {grantee_address}...")
     
-    contract = w3.eth.contract(address=contract_address, abi=abi)
+    contract = get_contract(w3, contract_address, abi)
     
     # Preparar transação
     nonce = w3.eth.get_transaction_count(deployer_address)